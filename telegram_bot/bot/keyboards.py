@@ -1,5 +1,5 @@
 from .translations import translate
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 
 def main_menu_keyboard(lang=None, role=None):
     kb = ReplyKeyboardMarkup(resize_keyboard=True)
@@ -143,4 +143,9 @@ def asic_menu_keyboard(lang=None):
 def asic_ips_cancel_keyboard(lang=None):
     kb = ReplyKeyboardMarkup(resize_keyboard=True)
     kb.add(KeyboardButton(translate(lang, 'cancel_btn')))
-    return kb 
\ No newline at end of file
+    return kb
+
+def rescan_keyboard(scan_type, network, lang=None):
+    kb = InlineKeyboardMarkup()
+    kb.add(InlineKeyboardButton(text=translate(lang, 'rescan_btn'), callback_data=f'rescan:{scan_type}:{network}'))
+    return kb
@@ -7,27 +7,30 @@ from .keyboards import (
     interface_menu_keyboard, security_menu_keyboard, backup_menu_keyboard,
     export_menu_keyboard, help_menu_keyboard, cancel_keyboard,
     scan_main_menu_keyboard, scan_cancel_or_main_keyboard,
-    asic_ips_cancel_keyboard
+    asic_ips_cancel_keyboard, rescan_keyboard
 )
 from ..utils.router_monitor import check_routers_status
-from ..utils.miner_scan import scan_network_for_miners, scan_miners_from_list, get_asic_status
+from ..utils.miner_scan import iter_scan_network_for_miners, scan_miners_from_list, get_asic_status
 from ..utils.background_monitor import BackgroundMonitor
 from ..utils.notifications import NotificationManager, NotificationLevel, NotificationType
 from ..utils.statistics import StatisticsManager
-from ..utils.settings_manager import SettingsManager
+from ..utils.settings_manager import get_settings_manager, BOT_DATA_DIR
 from aiogram.dispatcher import FSMContext
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher.filters.state import State, StatesGroup
 import pandas as pd
 import os
-from ..utils.network_scan import scan_network_devices
+from ..utils.network_scan import iter_scan_network_devices
 import ipaddress
-from ..utils.fast_scan import fast_scan_network
+from ..utils.fast_scan import iter_fast_scan_network
+from ..utils.scan_results import ResultSet
+from ..utils import scan_profiles
 import time
 import asyncio
 from ..utils.help_system import HelpSystem
 from .translations import translate
 from ..utils.scan_manager import ScanManager
+from ..utils.scan_jobs import ScanJobRegistry
 import json
 from telegram_bot.utils.snmp_utils import async_get_snmp_full_info, async_get_snmp_info_subprocess
 import io
@@ -37,8 +40,8 @@ import glob
 
 logging.basicConfig(level=logging.INFO)
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
-settings_manager = SettingsManager(base_dir=BASE_DIR)
+BASE_DIR = BOT_DATA_DIR
+settings_manager = get_settings_manager()
 
 def load_secrets():
     secrets_path = os.path.join(BASE_DIR, 'secrets.json')
@@ -58,6 +61,8 @@ dp = Dispatcher(bot, storage=storage)
 
 # Инициализация ScanManager
 scan_manager = ScanManager(ttl=settings_manager.get_setting('scanning.results_ttl', 3600))
+# Одинаковые одновременные сканы (тип + сеть) выполняются один раз
+scan_jobs = ScanJobRegistry()
 
 # Инициализация новых модулей
 background_monitor = BackgroundMonitor(bot, CHAT_ID)
@@ -520,43 +525,68 @@ async def handle_scan_network(message: Message):
 
 @dp.message_handler(state=ScanDevicesState.waiting_for_network)
 async def process_devices_network_input(message: Message, state: FSMContext):
+    await run_devices_scan(message, state, message.text.strip(), get_lang(message))
+
+async def run_devices_scan(message: Message, state: FSMContext, network: str, lang: str, force: bool = False):
+    """Сканирование устройств сети; force — пересканировать, не используя свежий результат из кэша"""
     import logging
     cleanup_old_results()
     scan_manager.start_scan()
-    network = message.text.strip()
     start_time = time.time()
-    logging.info(f"[SCAN_NETWORK] Пользователь {message.from_user.id} ввёл сеть: {network}")
+    logging.info(f"[SCAN_NETWORK] Пользователь {message.chat.id} ввёл сеть: {network}")
     try:
         net = ipaddress.IPv4Network(network, strict=False)
+        # Одна и та же сеть в разной записи — один ключ скана и один файл результата
+        network = str(net)
     except Exception as e:
         logging.error(f"[SCAN_NETWORK] Некорректная сеть: {network}, ошибка: {e}")
-        await message.answer(translate(get_lang(message), 'network_format_error'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+        await message.answer(translate(lang, 'network_format_error'), reply_markup=main_menu_keyboard(lang=lang))
         scan_manager.finish_scan()
         await state.finish()
         return
-    progress_msg = await message.answer(translate(get_lang(message), 'scanning_network', network=network))
-    async def on_progress(done, total):
-        percent = int(done / total * 100)
-        bar = '█' * (percent // 10) + '-' * (10 - percent // 10)
-        await bot.edit_message_text(
-            translate(get_lang(message), 'scanning_progress', bar=bar, percent=percent, done=done, total=total),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
+    cached = None if force else scan_manager.get_fresh_scan_result(
+        'scan', network, settings_manager.get_setting('scanning.cache_freshness', 300))
+    progress_msg = None
+    if cached is None:
+        known = scan_manager.get_known_hosts('scan', network) if settings_manager.get_setting('scanning.incremental', True) else None
+        progress_msg = await message.answer(translate(lang, 'scanning_network', network=network))
+        job, started = scan_jobs.join(
+            'scan', network, lambda progress: iter_scan_network_devices(network, on_progress=progress, refresh=force, known=known), ResultSet(scan_profiles.plan_for(settings_manager, 'scan').ports),
+            on_complete=lambda found: scan_manager.save_scan_result('scan', network, {'devices': found, 'type': 'devices', 'timestamp': time.time()}),
+            force=force)
+        if not started:
+            await message.answer(translate(lang, 'scan_attached', network=network))
+        devices = job.results
+        async def on_progress(done, total):
+            percent = int(done / total * 100)
+            bar = '█' * (percent // 10) + '-' * (10 - percent // 10)
+            await bot.edit_message_text(
+                translate(lang, 'scanning_progress', bar=bar, percent=percent, done=done, total=total, found=len(devices)),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
     try:
-        logging.info(f"[SCAN_NETWORK] Запуск scan_network_devices для {network}")
-        devices = await scan_network_devices(network, on_progress=on_progress)
-        duration = time.time() - start_time
-        logging.info(f"[SCAN_NETWORK] Завершено scan_network_devices для {network}, найдено устройств: {len(devices)} за {duration:.1f}с")
-        await bot.edit_message_text(
-            translate(get_lang(message), 'scan_completed', count=len(devices)),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
-        statistics_manager.record_scan('network', len(devices), net.num_addresses, duration)
-        await notification_manager.scan_completed('сети', len(devices), duration)
+        if cached is None:
+            logging.info(f"[SCAN_NETWORK] Запуск scan_network_devices для {network}")
+            devices = await job.wait(on_progress)
+            duration = time.time() - start_time
+            logging.info(f"[SCAN_NETWORK] Завершено scan_network_devices для {network}, найдено устройств: {len(devices)} за {duration:.1f}с")
+            await bot.edit_message_text(
+                translate(lang, 'scan_completed', count=len(devices)),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
+            if started:
+                statistics_manager.record_scan('network', len(devices), net.num_addresses, duration)
+                await notification_manager.scan_completed('сети', len(devices), duration)
+        else:
+            # Свежий результат того же скана — отвечаем без обращения к сети
+            devices = ResultSet.pack(cached.get('devices') or [], scan_profiles.plan_for(settings_manager, 'scan').ports)
+            logging.info(f"[SCAN_NETWORK] Результат для {network} взят из кэша: {len(devices)}")
+            await message.answer(translate(lang, 'cached_scan_result', network=network, age=int(time.time() - cached['timestamp'])),
+                                 reply_markup=rescan_keyboard('scan', network, lang=lang))
         if not devices:
-            await message.answer(translate(get_lang(message), 'no_devices_found'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+            await message.answer(translate(lang, 'no_devices_found'), reply_markup=main_menu_keyboard(lang=lang))
             scan_manager.finish_scan()
             await state.finish()
             return
@@ -565,19 +595,18 @@ async def process_devices_network_input(message: Message, state: FSMContext):
             if d.get('type') == 'miner':
                 text += f"{d['ip']}: miner (hashrate: {d.get('hashrate')}, uptime: {d.get('uptime')})\n"
             else:
-                text += f"{d['ip']}: (открытые порты: {', '.join(map(str, d['open_ports']))})\n"
+                text += f"{d['ip']}: (открытые порты: {', '.join(map(str, d['open_ports'])) or '—'})\n"
         text += "\nЕсли хотите получить файл с результатами, напишите 'файл' в ответ или reply на это сообщение."
-        scan_manager.save_scan_result('scan', network, {'devices': devices, 'type': 'devices', 'timestamp': time.time()})
         if len(text) > 4000:
             file_path = scan_manager.get_scan_result_file('scan', network, ext='csv')
             if file_path:
                 kb = InlineKeyboardMarkup()
-                kb.add(InlineKeyboardButton(text=translate(get_lang(message), 'get_ip_list_btn'), callback_data=f'get_ips_file:{file_path}'))
-                await message.answer_document(open(file_path, 'rb'), caption=translate(get_lang(message), 'scan_file_sent'), reply_markup=kb)
+                kb.add(InlineKeyboardButton(text=translate(lang, 'get_ip_list_btn'), callback_data=f'get_ips_file:{file_path}'))
+                await message.answer_document(open(file_path, 'rb'), caption=translate(lang, 'scan_file_sent'), reply_markup=kb)
             else:
-                await message.answer(translate(get_lang(message), 'scan_file_not_found'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+                await message.answer(translate(lang, 'scan_file_not_found'), reply_markup=main_menu_keyboard(lang=lang))
         else:
-            result_msg = await message.answer(text, reply_markup=main_menu_keyboard(lang=get_lang(message)))
+            result_msg = await message.answer(text, reply_markup=main_menu_keyboard(lang=lang))
             scan_manager.add_result(result_msg.message_id, {
                 'devices': devices,
                 'type': 'devices',
@@ -589,12 +618,13 @@ async def process_devices_network_input(message: Message, state: FSMContext):
         await state.finish()
     except Exception as e:
         logging.exception(f"[SCAN_NETWORK] Ошибка при сканировании {network}: {e}")
-        await bot.edit_message_text(
-            translate(get_lang(message), 'scan_error', e=e),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
-        await message.answer(f"[SCAN_NETWORK] Произошла ошибка: {e}", reply_markup=main_menu_keyboard(lang=get_lang(message)))
+        if progress_msg is not None:
+            await bot.edit_message_text(
+                translate(lang, 'scan_error', e=e),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
+        await message.answer(f"[SCAN_NETWORK] Произошла ошибка: {e}", reply_markup=main_menu_keyboard(lang=lang))
         scan_manager.finish_scan()
         await state.finish()
 
@@ -647,39 +677,63 @@ async def handle_scan_miners(message: Message):
 
 @dp.message_handler(state=ScanMinersState.waiting_for_network)
 async def process_miners_network_input(message: Message, state: FSMContext):
+    await run_miners_scan(message, state, message.text.strip(), get_lang(message))
+
+async def run_miners_scan(message: Message, state: FSMContext, network: str, lang: str, force: bool = False):
+    """Поиск майнеров в сети; force — пересканировать, не используя свежий результат из кэша"""
     import logging
     cleanup_old_results()
     scan_manager.start_scan()
-    network = message.text.strip()
-    logging.info(f"[SCAN_MINERS] Пользователь {message.from_user.id} ввёл сеть: {network}")
+    logging.info(f"[SCAN_MINERS] Пользователь {message.chat.id} ввёл сеть: {network}")
     try:
         net = ipaddress.IPv4Network(network, strict=False)
+        # Одна и та же сеть в разной записи — один ключ скана и один файл результата
+        network = str(net)
     except Exception as e:
         logging.error(f"[SCAN_MINERS] Некорректная сеть: {network}, ошибка: {e}")
-        await message.answer(translate(get_lang(message), 'network_format_error'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+        await message.answer(translate(lang, 'network_format_error'), reply_markup=main_menu_keyboard(lang=lang))
         scan_manager.finish_scan()
         await state.finish()
         return
-    progress_msg = await message.answer(translate(get_lang(message), 'scanning_miners', network=network))
-    async def on_progress(done, total):
-        percent = int(done / total * 100)
-        bar = '█' * (percent // 10) + '-' * (10 - percent // 10)
-        await bot.edit_message_text(
-            translate(get_lang(message), 'miners_scanning_progress', bar=bar, percent=percent, done=done, total=total),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
+    cached = None if force else scan_manager.get_fresh_scan_result(
+        'miners', network, settings_manager.get_setting('scanning.cache_freshness', 300))
+    progress_msg = None
+    if cached is None:
+        known = scan_manager.get_known_hosts('miners', network) if settings_manager.get_setting('scanning.incremental', True) else None
+        progress_msg = await message.answer(translate(lang, 'scanning_miners', network=network))
+        job, started = scan_jobs.join(
+            'miners', network, lambda progress: iter_scan_network_for_miners(network, on_progress=progress, refresh=force, known=known), ResultSet(),
+            on_complete=lambda found: scan_manager.save_scan_result('miners', network, {'miners': found, 'type': 'miners', 'timestamp': time.time()}),
+            force=force)
+        if not started:
+            await message.answer(translate(lang, 'scan_attached', network=network))
+        miners = job.results
+        async def on_progress(done, total):
+            percent = int(done / total * 100)
+            bar = '█' * (percent // 10) + '-' * (10 - percent // 10)
+            await bot.edit_message_text(
+                translate(lang, 'miners_scanning_progress', bar=bar, percent=percent, done=done, total=total, found=len(miners)),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
     try:
-        logging.info(f"[SCAN_MINERS] Запуск scan_network_for_miners для {network}")
-        miners = await scan_network_for_miners(network, on_progress=on_progress)
-        logging.info(f"[SCAN_MINERS] Завершено scan_network_for_miners для {network}, найдено майнеров: {len(miners)}")
-        await bot.edit_message_text(
-            translate(get_lang(message), 'scan_completed', count=len(miners)),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
+        if cached is None:
+            logging.info(f"[SCAN_MINERS] Запуск scan_network_for_miners для {network}")
+            miners = await job.wait(on_progress)
+            logging.info(f"[SCAN_MINERS] Завершено scan_network_for_miners для {network}, найдено майнеров: {len(miners)}")
+            await bot.edit_message_text(
+                translate(lang, 'scan_completed', count=len(miners)),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
+        else:
+            # Свежий результат того же скана — отвечаем без обращения к сети
+            miners = ResultSet.pack(cached.get('miners') or [])
+            logging.info(f"[SCAN_MINERS] Результат для {network} взят из кэша: {len(miners)}")
+            await message.answer(translate(lang, 'cached_scan_result', network=network, age=int(time.time() - cached['timestamp'])),
+                                 reply_markup=rescan_keyboard('miners', network, lang=lang))
         if not miners:
-            await message.answer(translate(get_lang(message), 'no_miners_found'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+            await message.answer(translate(lang, 'no_miners_found'), reply_markup=main_menu_keyboard(lang=lang))
             scan_manager.finish_scan()
             await state.finish()
             return
@@ -688,17 +742,16 @@ async def process_miners_network_input(message: Message, state: FSMContext):
         for m in miners:
             text += f"{m['ip']}: miner (hashrate: {m.get('hashrate')}, uptime: {m.get('uptime')})\n"
         text += "\nЕсли хотите получить файл с результатами, напишите 'файл' в ответ или reply на это сообщение."
-        scan_manager.save_scan_result('miners', network, {'miners': miners, 'type': 'miners', 'timestamp': time.time()})
         if len(text) > 4000:
             file_path = scan_manager.get_scan_result_file('miners', network, ext='csv')
             if file_path:
                 kb = InlineKeyboardMarkup()
-                kb.add(InlineKeyboardButton(text=translate(get_lang(message), 'get_ip_list_btn'), callback_data=f'get_ips_file:{file_path}'))
-                await message.answer_document(open(file_path, 'rb'), caption=translate(get_lang(message), 'scan_file_sent'), reply_markup=kb)
+                kb.add(InlineKeyboardButton(text=translate(lang, 'get_ip_list_btn'), callback_data=f'get_ips_file:{file_path}'))
+                await message.answer_document(open(file_path, 'rb'), caption=translate(lang, 'scan_file_sent'), reply_markup=kb)
             else:
-                await message.answer(translate(get_lang(message), 'scan_file_not_found'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+                await message.answer(translate(lang, 'scan_file_not_found'), reply_markup=main_menu_keyboard(lang=lang))
         else:
-            result_msg = await message.answer(text, reply_markup=main_menu_keyboard(lang=get_lang(message)))
+            result_msg = await message.answer(text, reply_markup=main_menu_keyboard(lang=lang))
             scan_manager.add_result(result_msg.message_id, {
                 'miners': miners,
                 'type': 'miners',
@@ -710,12 +763,13 @@ async def process_miners_network_input(message: Message, state: FSMContext):
         await state.finish()
     except Exception as e:
         logging.exception(f"[SCAN_MINERS] Ошибка при сканировании {network}: {e}")
-        await bot.edit_message_text(
-            translate(get_lang(message), 'scan_error', e=e),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
-        await message.answer(f"[SCAN_MINERS] Произошла ошибка: {e}", reply_markup=main_menu_keyboard(lang=get_lang(message)))
+        if progress_msg is not None:
+            await bot.edit_message_text(
+                translate(lang, 'scan_error', e=e),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
+        await message.answer(f"[SCAN_MINERS] Произошла ошибка: {e}", reply_markup=main_menu_keyboard(lang=lang))
         scan_manager.finish_scan()
         await state.finish()
 
@@ -726,39 +780,63 @@ async def handle_fast_scan(message: Message):
 
 @dp.message_handler(state=FastScanState.waiting_for_network)
 async def process_fast_scan_network_input(message: Message, state: FSMContext):
+    await run_fast_scan(message, state, message.text.strip(), get_lang(message))
+
+async def run_fast_scan(message: Message, state: FSMContext, network: str, lang: str, force: bool = False):
+    """Быстрое сканирование сети; force — пересканировать, не используя свежий результат из кэша"""
     import logging
     cleanup_old_results()
     scan_manager.start_scan()
-    network = message.text.strip()
-    logging.info(f"[FAST_SCAN] Пользователь {message.from_user.id} ввёл сеть: {network}")
+    logging.info(f"[FAST_SCAN] Пользователь {message.chat.id} ввёл сеть: {network}")
     try:
         net = ipaddress.IPv4Network(network, strict=False)
+        # Одна и та же сеть в разной записи — один ключ скана и один файл результата
+        network = str(net)
     except Exception as e:
         logging.error(f"[FAST_SCAN] Некорректная сеть: {network}, ошибка: {e}")
-        await message.answer(translate(get_lang(message), 'network_format_error'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+        await message.answer(translate(lang, 'network_format_error'), reply_markup=main_menu_keyboard(lang=lang))
         scan_manager.finish_scan()
         await state.finish()
         return
-    progress_msg = await message.answer(translate(get_lang(message), 'fast_scanning', network=network))
-    async def on_progress(done, total):
-        percent = int(done / total * 100)
-        bar = '█' * (percent // 10) + '-' * (10 - percent // 10)
-        await bot.edit_message_text(
-            translate(get_lang(message), 'fast_scanning_progress', bar=bar, percent=percent, done=done, total=total),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
+    cached = None if force else scan_manager.get_fresh_scan_result(
+        'fast_scan', network, settings_manager.get_setting('scanning.cache_freshness', 300))
+    progress_msg = None
+    if cached is None:
+        known = scan_manager.get_known_hosts('fast_scan', network) if settings_manager.get_setting('scanning.incremental', True) else None
+        progress_msg = await message.answer(translate(lang, 'fast_scanning', network=network))
+        job, started = scan_jobs.join(
+            'fast_scan', network, lambda progress: iter_fast_scan_network(network, on_progress=progress, refresh=force, known=known), ResultSet(scan_profiles.plan_for(settings_manager, 'fast_scan').ports),
+            on_complete=lambda found: scan_manager.save_scan_result('fast_scan', network, {'devices': found, 'type': 'fast_scan', 'timestamp': time.time()}),
+            force=force)
+        if not started:
+            await message.answer(translate(lang, 'scan_attached', network=network))
+        devices = job.results
+        async def on_progress(done, total):
+            percent = int(done / total * 100)
+            bar = '█' * (percent // 10) + '-' * (10 - percent // 10)
+            await bot.edit_message_text(
+                translate(lang, 'fast_scanning_progress', bar=bar, percent=percent, done=done, total=total, found=len(devices)),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
     try:
-        logging.info(f"[FAST_SCAN] Запуск fast_scan_network для {network}")
-        devices = await fast_scan_network(network, on_progress=on_progress)
-        logging.info(f"[FAST_SCAN] Завершено fast_scan_network для {network}, найдено устройств: {len(devices)}")
-        await bot.edit_message_text(
-            translate(get_lang(message), 'fast_scan_completed', count=len(devices)),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
+        if cached is None:
+            logging.info(f"[FAST_SCAN] Запуск fast_scan_network для {network}")
+            devices = await job.wait(on_progress)
+            logging.info(f"[FAST_SCAN] Завершено fast_scan_network для {network}, найдено устройств: {len(devices)}")
+            await bot.edit_message_text(
+                translate(lang, 'fast_scan_completed', count=len(devices)),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
+        else:
+            # Свежий результат того же скана — отвечаем без обращения к сети
+            devices = ResultSet.pack(cached.get('devices') or [], scan_profiles.plan_for(settings_manager, 'fast_scan').ports)
+            logging.info(f"[FAST_SCAN] Результат для {network} взят из кэша: {len(devices)}")
+            await message.answer(translate(lang, 'cached_scan_result', network=network, age=int(time.time() - cached['timestamp'])),
+                                 reply_markup=rescan_keyboard('fast_scan', network, lang=lang))
         if not devices:
-            await message.answer(translate(get_lang(message), 'no_devices_found'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+            await message.answer(translate(lang, 'no_devices_found'), reply_markup=main_menu_keyboard(lang=lang))
             scan_manager.finish_scan()
             await state.finish()
             return
@@ -768,19 +846,18 @@ async def process_fast_scan_network_input(message: Message, state: FSMContext):
             if d.get('type') == 'miner':
                 text += f"{d['ip']}: miner (hashrate: {d.get('hashrate')}, uptime: {d.get('uptime')})\n"
             else:
-                text += f"{d['ip']}: {d.get('type', 'unknown')} (открытые порты: {', '.join(map(str, d['open_ports']))})\n"
+                text += f"{d['ip']}: {d.get('type', 'unknown')} (открытые порты: {', '.join(map(str, d['open_ports'])) or '—'})\n"
         text += "\nЕсли хотите получить файл с результатами, напишите 'файл' в ответ или reply на это сообщение."
-        scan_manager.save_scan_result('fast_scan', network, {'devices': devices, 'type': 'fast_scan', 'timestamp': time.time()})
         if len(text) > 4000:
             file_path = scan_manager.get_scan_result_file('fast_scan', network, ext='csv')
             if file_path:
                 kb = InlineKeyboardMarkup()
-                kb.add(InlineKeyboardButton(text=translate(get_lang(message), 'get_ip_list_btn'), callback_data=f'get_ips_file:{file_path}'))
-                await message.answer_document(open(file_path, 'rb'), caption=translate(get_lang(message), 'scan_file_sent'), reply_markup=kb)
+                kb.add(InlineKeyboardButton(text=translate(lang, 'get_ip_list_btn'), callback_data=f'get_ips_file:{file_path}'))
+                await message.answer_document(open(file_path, 'rb'), caption=translate(lang, 'scan_file_sent'), reply_markup=kb)
             else:
-                await message.answer(translate(get_lang(message), 'scan_file_not_found'), reply_markup=main_menu_keyboard(lang=get_lang(message)))
+                await message.answer(translate(lang, 'scan_file_not_found'), reply_markup=main_menu_keyboard(lang=lang))
         else:
-            result_msg = await message.answer(text, reply_markup=main_menu_keyboard(lang=get_lang(message)))
+            result_msg = await message.answer(text, reply_markup=main_menu_keyboard(lang=lang))
             scan_manager.add_result(result_msg.message_id, {
                 'fast_scan': devices,
                 'type': 'fast_scan',
@@ -792,12 +869,13 @@ async def process_fast_scan_network_input(message: Message, state: FSMContext):
         await state.finish()
     except Exception as e:
         logging.exception(f"[FAST_SCAN] Ошибка при сканировании {network}: {e}")
-        await bot.edit_message_text(
-            translate(get_lang(message), 'fast_scan_error', e=e),
-            chat_id=progress_msg.chat.id,
-            message_id=progress_msg.message_id
-        )
-        await message.answer(f"[FAST_SCAN] Произошла ошибка: {e}", reply_markup=main_menu_keyboard(lang=get_lang(message)))
+        if progress_msg is not None:
+            await bot.edit_message_text(
+                translate(lang, 'fast_scan_error', e=e),
+                chat_id=progress_msg.chat.id,
+                message_id=progress_msg.message_id
+            )
+        await message.answer(f"[FAST_SCAN] Произошла ошибка: {e}", reply_markup=main_menu_keyboard(lang=lang))
         scan_manager.finish_scan()
         await state.finish()
 
@@ -1871,6 +1949,17 @@ async def process_asic_ips_input(message: Message, state: FSMContext):
     await message.answer(translate(lang, 'asic_ips_set', value=', '.join(ip_list)), reply_markup=settings_main_menu_keyboard(lang=lang, role=get_user_role(message)))
     await state.finish()
 
+@dp.callback_query_handler(lambda c: c.data and c.data.startswith('rescan:'), state='*')
+async def handle_rescan_callback(call: CallbackQuery, state: FSMContext):
+    _, scan_type, network = call.data.split(':', 2)
+    runners = {'scan': run_devices_scan, 'miners': run_miners_scan, 'fast_scan': run_fast_scan}
+    await call.answer()
+    runner = runners.get(scan_type)
+    if runner is None:
+        return
+    logging.info(f"[RESCAN] Пользователь {call.from_user.id} запросил пересканирование {scan_type} {network}")
+    await runner(call.message, state, network, get_lang(call), force=True)
+
 @dp.callback_query_handler(lambda c: c.data and c.data.startswith('get_ips_file:'))
 async def handle_get_ips_file_callback(call: CallbackQuery):
     lang = get_lang(call.message)
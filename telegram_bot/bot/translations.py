@@ -188,9 +188,10 @@ TRANSLATIONS = {
         'checking_router_status': '⏳ Проверяю статус роутеров...',
         'router_status_header': '🌐 <b>Статус роутеров:</b>',
         'open_ports': 'открытые порты',
-        'fast_scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'miners_scanning_progress': '{bar} {percent}% ({done}/{total})',
+        'fast_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'miners_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scan_attached': '🔗 Сканирование {network} уже идёт — подключаю вас к нему, результат будет общим.',
         'backup_auto_prompt': 'Автоматическое резервное копирование: {value}. Изменить? (да/нет)',
         'scan_file_sent': 'Файл с результатами отправлен.',
         'scan_file_not_found': 'Файл с результатами не найден. Попробуйте ответить на сообщение с результатами или повторить запрос.',
@@ -249,6 +250,8 @@ TRANSLATIONS = {
         'scan_file_no_ips': 'IP-адреса не найдены в файле.',
         'scan_file_read_error': 'Ошибка при чтении файла: {e}',
         'get_ip_list_btn': 'Получить список IP',
+        'rescan_btn': '🔄 Пересканировать',
+        'cached_scan_result': '📦 Результат сканирования {network} из кэша ({age} с назад). Нажмите «Пересканировать», чтобы проверить сеть заново.',
         'file_not_found': 'Файл не найден.',
         'file_format_error': 'Формат файла не поддерживается.',
         'no_ips_found': 'IP-адреса не найдены в файле.',
@@ -448,9 +451,10 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'checking_router_status': '⏳ Checking router status...',
         'router_status_header': '🌐 <b>Router status:</b>',
         'open_ports': 'open ports',
-        'fast_scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'miners_scanning_progress': '{bar} {percent}% ({done}/{total})',
+        'fast_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'miners_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scan_attached': '🔗 A scan of {network} is already running — attaching you to it, the result will be shared.',
         'backup_auto_prompt': 'Automatic backup: {value}. Change? (yes/no)',
         'scan_file_sent': 'Result file sent.',
         'scan_file_not_found': 'Result file not found. Please reply to the result message or try again.',
@@ -509,6 +513,8 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'scan_file_no_ips': 'No IP addresses found in the file.',
         'scan_file_read_error': 'Error reading file: {e}',
         'get_ip_list_btn': 'Get IP list',
+        'rescan_btn': '🔄 Rescan',
+        'cached_scan_result': '📦 Cached scan result for {network} ({age} s ago). Press «Rescan» to scan the network again.',
         'file_not_found': 'File not found.',
         'file_format_error': 'File format not supported.',
         'no_ips_found': 'No IP addresses found in the file.',
@@ -708,9 +714,10 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'checking_router_status': '⏳ Checking router status...',
         'router_status_header': '🌐 <b>Router status:</b>',
         'open_ports': 'open ports',
-        'fast_scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'miners_scanning_progress': '{bar} {percent}% ({done}/{total})',
+        'fast_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'miners_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scan_attached': '🔗 Ein Scan von {network} läuft bereits — Sie werden angehängt, das Ergebnis wird geteilt.',
         'backup_auto_prompt': 'Automatic backup: {value}. Change? (yes/no)',
         'scan_file_sent': 'Result file sent.',
         'scan_file_not_found': 'Result file not found. Please reply to the result message or try again.',
@@ -769,6 +776,8 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'scan_file_no_ips': 'No IP addresses found in the file.',
         'scan_file_read_error': 'Error reading file: {e}',
         'get_ip_list_btn': 'IP-Adressen abrufen',
+        'rescan_btn': '🔄 Erneut scannen',
+        'cached_scan_result': '📦 Zwischengespeichertes Scan-Ergebnis für {network} (vor {age} s). Drücken Sie «Erneut scannen», um das Netzwerk neu zu scannen.',
         'file_not_found': 'Datei nicht gefunden.',
         'file_format_error': 'Dateiformat nicht unterstützt.',
         'no_ips_found': 'IP-Adressen nicht im Datei gefunden.',
@@ -968,9 +977,10 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'checking_router_status': '⏳ Checking router status...',
         'router_status_header': '🌐 <b>Router status:</b>',
         'open_ports': 'open ports',
-        'fast_scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'miners_scanning_progress': '{bar} {percent}% ({done}/{total})',
+        'fast_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'miners_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scan_attached': '🔗 Er loopt al een scan van {network} — u wordt gekoppeld, het resultaat wordt gedeeld.',
         'backup_auto_prompt': 'Automatic backup: {value}. Change? (yes/no)',
         'scan_file_sent': 'Result file sent.',
         'scan_file_not_found': 'Result file not found. Please reply to the result message or try again.',
@@ -1029,6 +1039,8 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'scan_file_no_ips': 'No IP addresses found in the file.',
         'scan_file_read_error': 'Error reading file: {e}',
         'get_ip_list_btn': 'IP-adressen ophalen',
+        'rescan_btn': '🔄 Opnieuw scannen',
+        'cached_scan_result': '📦 Gecachet scanresultaat voor {network} ({age} s geleden). Druk op «Opnieuw scannen» om het netwerk opnieuw te scannen.',
         'file_not_found': 'Bestand niet gevonden.',
         'file_format_error': 'Bestandsformaat niet ondersteund.',
         'no_ips_found': 'IP-adressen niet gevonden in het bestand.',
@@ -1228,9 +1240,10 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'checking_router_status': '⏳ Проверяю статус роутеров...',
         'router_status_header': '🌐 <b>Статус роутеров:</b>',
         'open_ports': 'открытые порты',
-        'fast_scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'scanning_progress': '{bar} {percent}% ({done}/{total})',
-        'miners_scanning_progress': '{bar} {percent}% ({done}/{total})',
+        'fast_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'miners_scanning_progress': '{bar} {percent}% ({done}/{total}) 🔎 {found}',
+        'scan_attached': '🔗 {network} 的扫描已在进行中 — 已为您加入，结果将共享。',
         'backup_auto_prompt': 'Автоматическое резервное копирование: {value}. Изменить? (да/нет)',
         'scan_file_sent': 'Result file sent.',
         'scan_file_not_found': 'Result file not found. Please reply to the result message or try again.',
@@ -1289,6 +1302,8 @@ If you have questions, type /help or use the "Help" button in the main menu.''',
         'scan_file_no_ips': 'No IP addresses found in the file.',
         'scan_file_read_error': 'Error reading file: {e}',
         'get_ip_list_btn': '获取IP列表',
+        'rescan_btn': '🔄 重新扫描',
+        'cached_scan_result': '📦 {network} 的缓存扫描结果（{age} 秒前）。点击“重新扫描”重新扫描网络。',
         'file_not_found': '文件未找到。',
         'file_format_error': '文件格式不支持。',
         'no_ips_found': 'IP地址未在文件中找到。',
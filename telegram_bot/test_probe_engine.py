@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Тестирование асинхронного движка TCP-проб
+"""
+
+import asyncio
+import socket
+import sys
+import time
+import os
+
+# Добавляем корневую директорию проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram_bot.utils import probe
+
+def _free_port() -> int:
+    """Возвращает свободный локальный порт (никто не слушает)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def _start_server():
+    server = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+def test_check_port_open_and_closed():
+    """Открытый порт определяется как открытый, закрытый — как закрытый"""
+    print("🧪 Тестирование check_port...")
+
+    async def run():
+        server, port = await _start_server()
+        try:
+            probe.stats.reset()
+            assert await probe.check_port('127.0.0.1', port, timeout=1.0) is True
+            assert await probe.check_port('127.0.0.1', _free_port(), timeout=1.0) is False
+            counters = probe.stats.as_dict()
+            assert counters['attempts'] == 2
+            assert counters['open'] == 1
+            assert counters['refused'] == 1
+            assert counters['in_flight'] == 0
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+    print("✅ check_port работает корректно")
+
+def test_check_port_many_in_flight():
+    """Сотни одновременных проб выполняются без пула потоков"""
+    print("🧪 Тестирование параллельных проб...")
+
+    async def run():
+        server, port = await _start_server()
+        try:
+            probe.stats.reset()
+            results = await asyncio.gather(*[probe.check_port('127.0.0.1', port, timeout=2.0) for _ in range(200)])
+            assert all(results)
+            assert probe.stats.max_in_flight > 1
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+    print("✅ Параллельные пробы работают корректно")
+
+def test_check_ports_preserves_order():
+    """Открытые порты возвращаются в порядке исходного списка"""
+    print("🧪 Тестирование check_ports...")
+
+    async def run():
+        server_a, port_a = await _start_server()
+        server_b, port_b = await _start_server()
+        try:
+            ports = [port_b, _free_port(), port_a]
+            open_ports = await probe.check_ports('127.0.0.1', ports, timeout=1.0, max_concurrent=2)
+            assert open_ports == [port_b, port_a]
+        finally:
+            for server in (server_a, server_b):
+                server.close()
+                await server.wait_closed()
+
+    asyncio.run(run())
+    print("✅ check_ports работает корректно")
+
+def test_probe_host_liveness():
+    """RST считается признаком жизни, молчание первых портов — отказом от хоста"""
+    print("🧪 Тестирование probe_host...")
+
+    async def run():
+        server, port = await _start_server()
+        try:
+            assert await probe.probe_port('127.0.0.1', _free_port(), timeout=1.0) == probe.CLOSED
+            open_ports, alive = await probe.probe_host('127.0.0.1', [_free_port(), port], timeout=1.0)
+            assert open_ports == [port] and alive
+            open_ports, alive = await probe.probe_host('127.0.0.1', [_free_port(), _free_port()], timeout=1.0)
+            assert open_ports == [] and alive
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+    probed = []
+
+    async def silent_probe(ip, port, timeout=1.0, session=None, on_open=None):
+        probed.append(port)
+        return probe.NO_RESPONSE
+
+    original = probe.probe_port
+    probe.probe_port = silent_probe
+    try:
+        open_ports, alive = asyncio.run(probe.probe_host('10.0.0.1', list(range(1, 11)), sentinel_count=3))
+    finally:
+        probe.probe_port = original
+    assert (open_ports, alive) == ([], False)
+    assert sorted(probed) == [1, 2, 3]
+    # sentinel_count=0: хост с отвечающими только дальними портами не отбрасывается
+    probed.clear()
+    probe.probe_port = silent_probe
+    try:
+        asyncio.run(probe.probe_host('10.0.0.1', list(range(1, 11)), sentinel_count=0))
+    finally:
+        probe.probe_port = original
+    assert sorted(probed) == list(range(1, 11))
+    print("✅ probe_host работает корректно")
+
+def test_rtt_estimator():
+    """Таймаут сжимается на быстрой сети и растёт на медленной в заданных границах"""
+    print("🧪 Тестирование RttEstimator...")
+    rtt = probe.RttEstimator(initial_timeout=0.5, min_timeout=0.1, max_timeout=5.0)
+    assert rtt.timeout == 0.5
+    for _ in range(20):
+        rtt.observe(0.002)
+    assert rtt.timeout == 0.1
+
+    slow = probe.RttEstimator(initial_timeout=0.5, min_timeout=0.1, max_timeout=5.0)
+    for sample in (0.6, 0.9, 0.7, 1.1):
+        slow.observe(sample)
+    assert 1.0 < slow.timeout <= 5.0
+
+    capped = probe.RttEstimator(initial_timeout=0.5, min_timeout=0.1, max_timeout=2.0)
+    capped.observe(3.0)
+    assert capped.timeout == 2.0
+
+    # Нижняя граница по умолчанию и из настроек: быстрые первые ответы не сжимают таймаут ниже неё
+    class Settings:
+        def __init__(self, values):
+            self.values = values
+
+        def get_setting(self, path, default=None):
+            return self.values.get(path, default)
+
+    floor = probe.RttEstimator.from_settings(Settings({}), 1.0)
+    for _ in range(20):
+        floor.observe(0.0005)
+    assert floor.timeout == probe.MIN_TIMEOUT >= 0.3
+    tuned = probe.RttEstimator.from_settings(Settings({'scanning.min_timeout': 0.2, 'scanning.default_timeout': 3}), 1.0)
+    tuned.observe(0.0005)
+    assert tuned.timeout == 0.2 and tuned.max_timeout == 3
+
+    async def run():
+        server, port = await _start_server()
+        try:
+            session = probe.ScanSession('test', probe.RttEstimator(initial_timeout=1.0))
+            await probe.probe_host('127.0.0.1', [port, _free_port()], session=session)
+            assert session.rtt.samples == 2
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+    print("✅ RttEstimator работает корректно")
+
+def test_probe_limiter_caps_and_fairness():
+    """Лимитер держит потолок соединений и делит его поровну между сканами"""
+    print("🧪 Тестирование ProbeLimiter...")
+
+    async def run():
+        limiter = probe.ProbeLimiter(probes_per_second=0, max_in_flight=4)
+        state = {'active': 0, 'peak': 0}
+        order = []
+
+        async def one_probe(key):
+            await limiter.acquire(key)
+            try:
+                order.append(key)
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+                await asyncio.sleep(0.005)
+                state['active'] -= 1
+            finally:
+                limiter.release()
+
+        # Скан 'a' ставит в очередь 40 проб раньше, чем скан 'b' свои 8
+        tasks = [asyncio.ensure_future(one_probe('a')) for _ in range(40)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(one_probe('b')) for _ in range(8)]
+        await asyncio.gather(*tasks)
+        assert state['peak'] <= 4
+        assert limiter.in_flight == 0
+        # Пробы 'b' не ждут окончания всех проб 'a'
+        assert max(i for i, key in enumerate(order) if key == 'b') < 30
+
+        rated = probe.ProbeLimiter(probes_per_second=200, max_in_flight=100)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(40):
+            await rated.acquire('c')
+            rated.release()
+        assert loop.time() - started >= 0.08
+
+    asyncio.run(run())
+    print("✅ ProbeLimiter работает корректно")
+
+def test_resource_budget_and_errors():
+    """Окно проб ограничено ресурсами ОС, нехватка дескрипторов не выдаётся за закрытый порт"""
+    print("🧪 Тестирование бюджета ресурсов...")
+    # Импорт модуля не трогает RLIMIT_NOFILE: бюджет считается при первой пробе
+    import subprocess
+    check = ("import resource; before = resource.getrlimit(resource.RLIMIT_NOFILE); "
+             "import telegram_bot.utils.probe as p; "
+             "assert resource.getrlimit(resource.RLIMIT_NOFILE) == before, 'limit raised on import'; "
+             "assert p._inflight_budget is None; p.limiter.max_in_flight; assert p._inflight_budget")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', check], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    budget = probe.inflight_budget()
+    assert budget >= 16
+    limiter = probe.ProbeLimiter(probes_per_second=0, max_in_flight=10 ** 6)
+    assert limiter.max_in_flight == budget
+
+    original_socket = probe.socket.socket
+
+    def exhausted_socket(*args, **kwargs):
+        raise OSError(probe.errno.EMFILE, 'Too many open files')
+
+    async def run():
+        session = probe.ScanSession('test')
+        probe.stats.reset()
+        probe.socket.socket = exhausted_socket
+        try:
+            state = await probe.probe_port('127.0.0.1', 80, timeout=0.5, session=session)
+        finally:
+            probe.socket.socket = original_socket
+        assert state == probe.ERROR
+        assert probe.stats.resource_errors == 1 and probe.stats.refused == 0 and probe.stats.errors == 0
+        assert session.resource_errors == 1
+
+    asyncio.run(run())
+    print("✅ Бюджет ресурсов работает корректно")
+
+def test_on_open_handler_reuses_connection():
+    """Обработчик открытого порта работает на соединении пробы, второго подключения нет"""
+    print("🧪 Тестирование обработчика открытого порта...")
+    from telegram_bot.utils import miner_scan
+
+    async def run():
+        connections = []
+
+        async def fake_cgminer(reader, writer):
+            connections.append(1)
+            request = await reader.readline()
+            assert b'summary' in request
+            writer.write(b'{"SUMMARY": [{"MHS av": 95000.5, "Elapsed": 3600}]}\x00')
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(fake_cgminer, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            replies = {}
+            open_ports, alive = await probe.probe_host('127.0.0.1', [_free_port(), port],
+                                                       on_open={port: miner_scan.summary_handler(replies, timeout=1.0)})
+            assert open_ports == [port] and alive
+            info = miner_scan.miner_info_from_reply('127.0.0.1', replies['summary'])
+            assert info['hashrate'] == 95000.5 and info['uptime'] == 3600
+            miner = await miner_scan.discover_miner('127.0.0.1', port=port, timeout=1.0)
+            assert miner == {'ip': '127.0.0.1', 'hashrate': 95000.5, 'uptime': 3600, 'type': 'miner'}
+            assert len(connections) == 2
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+    print("✅ Обработчик открытого порта работает корректно")
+
+def test_fingerprint_banners():
+    """Баннеры SSH и HTTP снимаются на соединении пробы, молчащий порт не выходит за бюджет"""
+    print("🧪 Тестирование снятия баннеров...")
+    from telegram_bot.utils import fingerprint
+
+    async def ssh_server(reader, writer):
+        writer.write(b'SSH-2.0-ROSSSH\r\n')
+        await writer.drain()
+        writer.close()
+
+    async def http_server(reader, writer):
+        await reader.readuntil(b'\r\n\r\n')
+        writer.write(b'HTTP/1.1 200 OK\r\nServer: App-webs/\r\nContent-Length: 0\r\n\r\n')
+        await writer.drain()
+        writer.close()
+
+    async def silent_server(reader, writer):
+        await asyncio.sleep(5)
+        writer.close()
+
+    async def run():
+        servers = [await asyncio.start_server(handler, '127.0.0.1', 0)
+                   for handler in (ssh_server, http_server, silent_server)]
+        ssh_port, http_port, silent_port = [s.sockets[0].getsockname()[1] for s in servers]
+        original = dict(fingerprint.PORT_PROBES)
+        fingerprint.PORT_PROBES.update({ssh_port: fingerprint._probe_ssh, http_port: fingerprint._probe_http,
+                                        silent_port: fingerprint._probe_ssh})
+        try:
+            fp = fingerprint.Fingerprinter('127.0.0.1', budget=0.5)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            ports = [ssh_port, http_port, silent_port]
+            open_ports, _ = await probe.probe_host('127.0.0.1', ports, on_open=fp.handlers(ports))
+            assert open_ports == ports
+            assert loop.time() - started < 2.0
+            assert fp.port_type(ssh_port) == 'router'
+            assert fp.port_type(http_port) == 'camera'
+            assert fp.port_type(silent_port) is None
+            assert fp.results[http_port]['product'] == 'App-webs/'
+        finally:
+            fingerprint.PORT_PROBES.clear()
+            fingerprint.PORT_PROBES.update(original)
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+
+    asyncio.run(run())
+    print("✅ Снятие баннеров работает корректно")
+
+def test_negative_cache():
+    """Повторная проба закрытого порта в рамках скана берётся из кэша, refresh его обходит,
+    тишина переиспользуется только пробами с таймаутом не длиннее закэшированного"""
+    print("🧪 Тестирование кэша отрицательных результатов...")
+    port = _free_port()
+
+    async def run():
+        probe.negative_cache.clear()
+        probe.stats.reset()
+        session = probe.ScanSession('test')
+        assert await probe.probe_port('127.0.0.1', port, session=session) == probe.CLOSED
+        assert await probe.probe_port('127.0.0.1', port, session=session) == probe.CLOSED
+        assert probe.stats.attempts == 1 and probe.stats.cache_hits == 1
+        # Без сессии (мониторинг) и с refresh кэш не используется
+        await probe.probe_port('127.0.0.1', port)
+        await probe.probe_port('127.0.0.1', port, session=probe.ScanSession('test', refresh=True))
+        assert probe.stats.attempts == 3 and probe.stats.cache_hits == 1
+        probe.negative_cache.clear()
+
+    asyncio.run(run())
+
+    cache = probe.NegativeCache(ttl=0.05, max_entries=8)
+    cache.put('10.0.0.1', 80, probe.NO_RESPONSE)
+    assert cache.get('10.0.0.1', 80) == probe.NO_RESPONSE
+    time.sleep(0.06)
+    assert cache.get('10.0.0.1', 80) is None
+    cache.ttl = 60
+    # Тишина за короткий таймаут не отменяет пробу с более длинным, CLOSED от таймаута не зависит
+    cache.put('10.0.0.1', 80, probe.NO_RESPONSE, 0.5)
+    cache.put('10.0.0.1', 81, probe.CLOSED, 0.5)
+    assert cache.get('10.0.0.1', 80, 0.5) == probe.NO_RESPONSE and cache.get('10.0.0.1', 80, 0.3) == probe.NO_RESPONSE
+    assert cache.get('10.0.0.1', 80, 1.5) is None
+    assert cache.get('10.0.0.1', 81, 1.5) == probe.CLOSED
+    for i in range(20):
+        cache.put('10.0.0.2', i, probe.CLOSED)
+    assert len(cache) <= 8 and cache.get('10.0.0.2', 19) == probe.CLOSED
+    print("✅ Кэш отрицательных результатов работает корректно")
+
+def test_snmp_sweep():
+    """SNMP-свип с одного UDP-сокета: ответ сопоставляется по request-id, тип — по sysObjectID"""
+    print("🧪 Тестирование SNMP-свипа...")
+    from telegram_bot.utils import snmp_sweep as snmp
+
+    request = snmp.build_get(1234567, 'public')
+    assert snmp.parse_response(request) is None
+    assert snmp.snmp_type('RouterOS RB4011', '') == 'router'
+    assert snmp.snmp_type('', '1.3.6.1.4.1.9.1.516') == 'switch'
+    assert snmp.snmp_type('Linux nas 5.10', '1.3.6.1.4.1.8072.3.2.10') is None
+
+    class Agent(asyncio.DatagramProtocol):
+        """Агент отвечает на GET, подставляя request-id запроса"""
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            _, message, _ = snmp._read_tlv(data, 0)
+            pdu = snmp._read_all(snmp._read_all(message)[2][1])
+            request_id = int.from_bytes(pdu[0][1], 'big', signed=True)
+            varbinds = (snmp._tlv(0x30, snmp._encode_oid(snmp.SYS_DESCR) + snmp._tlv(0x04, b'Cisco IOS Software, C2960'))
+                        + snmp._tlv(0x30, snmp._encode_oid(snmp.SYS_OBJECT_ID) + snmp._encode_oid('1.3.6.1.4.1.9.1.716')))
+            body = snmp._encode_int(request_id) + snmp._encode_int(0) + snmp._encode_int(0) + snmp._tlv(0x30, varbinds)
+            reply = snmp._tlv(0x30, snmp._encode_int(1) + snmp._tlv(0x04, b'public') + snmp._tlv(0xa2, body))
+            self.transport.sendto(reply, addr)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(Agent, local_addr=('127.0.0.1', 0))
+        port = transport.get_extra_info('sockname')[1]
+        try:
+            found = await snmp.snmp_sweep(['127.0.0.1', '127.0.0.2'], timeout=0.3, port=port)
+        finally:
+            transport.close()
+        assert list(found) == ['127.0.0.1']
+        assert found['127.0.0.1']['descr'] == 'Cisco IOS Software, C2960'
+        assert found['127.0.0.1']['object_id'] == '1.3.6.1.4.1.9.1.716'
+        assert found['127.0.0.1']['type'] == 'switch'
+
+    async def run_prober():
+        # Опрос отдельных хостов вместе с TCP-пробами: ждёт только свой ответ, не хранит ничего лишнего
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(Agent, local_addr=('127.0.0.1', 0))
+        port = transport.get_extra_info('sockname')[1]
+        prober = snmp.SnmpProber(timeout=0.3, port=port)
+        try:
+            agent, silent = await asyncio.gather(prober.query('127.0.0.1'), prober.query('127.0.0.2'))
+            # Хост без агента держит воркер не дольше переданного таймаута TCP-проб
+            start = time.monotonic()
+            assert await prober.query('127.0.0.2', timeout=0.05) is None
+            assert time.monotonic() - start < 0.2
+        finally:
+            prober.close()
+            transport.close()
+        assert agent['type'] == 'switch' and silent is None
+        assert prober.found == 1 and not prober._waiters
+
+    asyncio.run(run())
+    asyncio.run(run_prober())
+    # request-id выводится из адреса и укладывается в неотрицательный INT32
+    assert snmp._request_id(12345, '10.0.0.1') != snmp._request_id(12345, '10.0.0.2')
+    assert 0 <= snmp._request_id(0x7fffffff, '255.255.255.255') <= 0x7fffffff
+    print("✅ SNMP-свип работает корректно")
+
+if __name__ == '__main__':
+    test_check_port_open_and_closed()
+    test_check_port_many_in_flight()
+    test_check_ports_preserves_order()
+    test_probe_host_liveness()
+    test_rtt_estimator()
+    test_probe_limiter_caps_and_fairness()
+    test_resource_budget_and_errors()
+    test_on_open_handler_reuses_connection()
+    test_fingerprint_banners()
+    test_negative_cache()
+    test_snmp_sweep()
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+Тестирование конвейера параллельного сканирования хостов
+"""
+
+import asyncio
+import ipaddress
+import socket
+import sys
+import tempfile
+import time
+import os
+
+# Добавляем корневую директорию проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram_bot.utils import scan_engine, ping_sweep, probe, neighbors, oui, nmap_backend, scan_profiles
+from telegram_bot.utils.scan_results import ResultSet
+from telegram_bot.utils.scan_jobs import ScanJobRegistry
+from telegram_bot.utils.scan_manager import ScanManager
+from telegram_bot.utils.settings_manager import get_settings_manager, BOT_DATA_DIR
+
+def test_scan_hosts_order_and_progress():
+    """Результаты идут в порядке хостов, прогресс доходит до конца"""
+    print("🧪 Тестирование scan_hosts...")
+    hosts = [f"10.0.0.{i}" for i in range(1, 41)]
+    state = {'active': 0, 'peak': 0}
+    progress_calls = []
+
+    async def scan_one(ip):
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+        # Чётные хосты «отвечают» быстрее нечётных, чтобы перемешать порядок завершения
+        await asyncio.sleep(0.001 if int(ip.rsplit('.', 1)[1]) % 2 else 0.005)
+        state['active'] -= 1
+        if int(ip.rsplit('.', 1)[1]) % 3 == 0:
+            return {'ip': ip, 'type': 'test'}
+        return None
+
+    async def on_progress(done, total):
+        progress_calls.append((done, total))
+
+    results = asyncio.run(scan_engine.scan_hosts(hosts, scan_one, max_workers=8, on_progress=on_progress))
+    assert [r['ip'] for r in results] == [ip for ip in hosts if int(ip.rsplit('.', 1)[1]) % 3 == 0]
+    assert 1 < state['peak'] <= 8
+    assert progress_calls[-1] == (40, 40)
+    assert [done for done, _ in progress_calls] == sorted(done for done, _ in progress_calls)
+    print("✅ scan_hosts работает корректно")
+
+class _Settings:
+    def __init__(self, values):
+        self.values = values
+
+    def get_setting(self, path, default=None):
+        return self.values.get(path, default)
+
+def test_ping_sweep_prune_hosts():
+    """Пинг-свип оставляет ответившие и ping-blocked хосты либо откатывается к полному списку"""
+    print("🧪 Тестирование пинг-свипа...")
+    hosts = ['127.0.0.1', '10.255.255.1']
+    disabled = _Settings({'scanning.ping_sweep': False})
+    assert asyncio.run(ping_sweep.prune_hosts(hosts, disabled)) == hosts
+
+    networks = ping_sweep.parse_networks(['10.255.255.0/24', 'not-a-network'])
+    assert [str(n) for n in networks] == ['10.255.255.0/24']
+
+    enabled = _Settings({'scanning.ping_sweep': True, 'scanning.ping_timeout': 0.3,
+                         'scanning.ping_blocked': ['10.255.255.0/24']})
+    pruned = asyncio.run(ping_sweep.prune_hosts(hosts, enabled))
+    # Без прав на ICMP возвращается исходный список, иначе — loopback и ping-blocked хост
+    assert pruned == hosts
+    print("✅ Пинг-свип работает корректно")
+
+def test_iter_scan_hosts_streams_and_stops():
+    """Результаты приходят по мере готовности, досрочный выход отменяет воркеры"""
+    print("🧪 Тестирование iter_scan_hosts...")
+    hosts = [f"10.0.1.{i}" for i in range(1, 101)]
+    scanned = []
+
+    async def scan_one(ip):
+        scanned.append(ip)
+        await asyncio.sleep(0.002)
+        return {'ip': ip, 'type': 'test'}
+
+    async def run():
+        received = []
+        async for device in scan_engine.iter_scan_hosts(hosts, scan_one, max_workers=4):
+            received.append(device['ip'])
+            if len(received) == 5:
+                break
+        await asyncio.sleep(0.02)
+        return received
+
+    received = asyncio.run(run())
+    assert len(received) == 5
+    assert len(scanned) < len(hosts)
+    print("✅ iter_scan_hosts работает корректно")
+
+def test_aimd_controller():
+    """Лимит растёт при стабильной доле таймаутов и делится пополам при всплеске или EMFILE"""
+    print("🧪 Тестирование AimdController...")
+    controller = scan_engine.AimdController(max_limit=256, initial=64, window=10, increase=4)
+
+    def feed(timeouts, total=10):
+        for i in range(total):
+            controller.record(probe.NO_RESPONSE if i < timeouts else probe.CLOSED)
+
+    # «Пустая» сеть: 90% таймаутов — это норма, а не перегрузка
+    for _ in range(3):
+        feed(9)
+    assert controller.limit == 76
+    # Всплеск таймаутов относительно базового уровня
+    feed(9)
+    feed(10)
+    assert controller.limit == 40
+    # Плотная сеть: падение доли ответов с 90% до 60% — тоже всплеск
+    dense = scan_engine.AimdController(max_limit=256, initial=64, window=10, increase=4)
+    for timeouts in (1, 1, 4):
+        for i in range(10):
+            dense.record(probe.NO_RESPONSE if i < timeouts else probe.OPEN)
+    assert dense.limit == 36
+    # Нехватка дескрипторов — немедленное снижение
+    controller.record(probe.CLOSED)
+    controller.record(probe.ERROR, resource_error=True)
+    assert controller.limit == 20
+    assert controller.decreases == 2
+
+    # Плотные известные хосты в начале, дальше пустые адреса: после shift_windows окон
+    # базовый уровень переезжает на новую долю, лимит возвращается и дальше только растёт
+    shifting = scan_engine.AimdController(max_limit=256, initial=64, window=100, increase=4)
+    for timeouts in [11] * 5 + [95] * 30:
+        for i in range(100):
+            shifting.record(probe.NO_RESPONSE if i < timeouts else probe.OPEN)
+    assert shifting.shifts == 1 and shifting.decreases == 2
+    assert abs(shifting.baseline - 0.05) < 0.01
+    assert shifting.limit == 84 + 4 * 27
+    # Короткий всплеск на новом уровне по-прежнему делит лимит пополам
+    for i in range(100):
+        shifting.record(probe.NO_RESPONSE)
+    assert shifting.limit == (84 + 4 * 27) // 2
+    print("✅ AimdController работает корректно")
+
+def test_host_range_is_lazy():
+    """HostRange совпадает с net.hosts(), а скан /12 не разворачивает список адресов"""
+    print("🧪 Тестирование HostRange...")
+    for cidr in ('192.168.1.0/24', '10.0.0.0/30', '10.0.0.0/31', '10.0.0.5/32'):
+        assert list(scan_engine.HostRange(cidr)) == [str(ip) for ip in ipaddress.IPv4Network(cidr).hosts()]
+    big = scan_engine.HostRange('10.0.0.0/12')
+    assert len(big) == 2 ** 20 - 2
+
+    async def scan_one(ip):
+        await asyncio.sleep(0)
+        return {'ip': ip, 'type': 'test'}
+
+    progress_calls = []
+
+    async def on_progress(done, total):
+        progress_calls.append((done, total))
+
+    async def run():
+        received = []
+        async for device in scan_engine.iter_scan_hosts(big, scan_one, max_workers=8, on_progress=on_progress):
+            received.append(device['ip'])
+            if len(received) == 3:
+                break
+        return received
+
+    received = asyncio.run(run())
+    assert received[0] == '10.0.0.1'
+    assert all(total == len(big) for _, total in progress_calls)
+    print("✅ HostRange работает корректно")
+
+def test_result_set_roundtrip():
+    """ResultSet отдаёт те же словари, что получил, и сортирует по IP"""
+    print("🧪 Тестирование ResultSet...")
+    devices = [
+        {'ip': '10.0.0.20', 'open_ports': [80, 4028], 'type': 'miner', 'hashrate': 95.5, 'uptime': 3600},
+        {'ip': '10.0.0.3', 'open_ports': [], 'type': 'alive'},
+        {'ip': '10.0.0.100', 'open_ports': [22, 80], 'type': 'ssh, web'},
+    ]
+    results = ResultSet([22, 80, 443, 4028])
+    for device in devices:
+        results.append(device)
+    assert len(results) == 3 and results[0] == devices[0]
+    results.sort()
+    assert [d['ip'] for d in results] == ['10.0.0.3', '10.0.0.20', '10.0.0.100']
+    assert results.to_dicts() == [devices[1], devices[0], devices[2]]
+    # Поля майнеров без open_ports/type и порты вне профиля
+    miners = ResultSet.pack([{'ip': '10.0.0.7', 'status': 'online', 'hashrate': None, 'uptime': None}])
+    assert list(miners) == [{'ip': '10.0.0.7', 'status': 'online', 'hashrate': None, 'uptime': None}]
+    wide = ResultSet(range(1, 71), [{'ip': '10.0.0.1', 'open_ports': [1, 70, 9999], 'type': 'x'}])
+    assert wide[0]['open_ports'] == [1, 70, 9999]
+    assert ResultSet.pack(wide) is wide
+    print("✅ ResultSet работает корректно")
+
+async def _sharded_scan(hosts, on_progress=None, use_ping=None, max_workers=None):
+    """Сканер-заглушка для процессов-шардов: «находит» каждый 100-й адрес"""
+    for done, ip in enumerate(hosts, 1):
+        if int(ip.rsplit('.', 1)[1]) % 100 == 0:
+            yield {'ip': ip, 'type': 'test', 'max_workers': max_workers,
+                   'bot_loaded': any(name.startswith('telegram_bot.bot') for name in sys.modules)}
+        if on_progress and done % 256 == 0:
+            await on_progress(done, len(hosts))
+
+def test_sharded_scan():
+    """Шарды покрывают диапазон без пропусков, результаты и прогресс сводятся вместе"""
+    print("🧪 Тестирование шардирования по процессам...")
+    hosts = scan_engine.HostRange('10.1.0.0/22')
+    shards = hosts.split(3)
+    assert sum(len(shard) for shard in shards) == len(hosts)
+    assert [ip for shard in shards for ip in shard] == list(hosts)
+    assert scan_engine.shard_count(_Settings({'scanning.workers': 4}), 100) == 1
+
+    progress_calls = []
+
+    async def on_progress(done, total):
+        progress_calls.append((done, total))
+
+    # Шард импортирует модуль сканера по полному имени (при запуске скриптом __name__ == '__main__')
+    results = asyncio.run(scan_engine.collect(scan_engine.iter_sharded(
+        hosts, 'telegram_bot.test_scan_engine', '_sharded_scan', 2, on_progress=on_progress,
+        options={'max_workers': 7})))
+    expected = [ip for ip in hosts if int(ip.rsplit('.', 1)[1]) % 100 == 0]
+    assert [r['ip'] for r in results] == expected
+    # Параметры вызывающего доходят до шарда, а сам шард не поднимает бота
+    assert all(r['max_workers'] == 7 and not r['bot_loaded'] for r in results)
+    assert progress_calls[-1] == (len(hosts), len(hosts))
+    print("✅ Шардирование работает корректно")
+
+def test_scan_jobs_singleflight():
+    """Одинаковые одновременные сканы выполняются один раз, результат и прогресс общие"""
+    print("🧪 Тестирование объединения сканов...")
+    runs = []
+    saved = []
+
+    def scan(on_progress):
+        async def stream():
+            runs.append(1)
+            for i in range(1, 5):
+                await asyncio.sleep(0.01)
+                await on_progress(i, 4)
+                yield {'ip': f'10.0.0.{5 - i}', 'type': 'test'}
+        return stream()
+
+    async def run():
+        jobs = ScanJobRegistry()
+        first, started_first = jobs.join('fast_scan', '10.0.0.0/24', scan, [], on_complete=saved.append)
+        second, started_second = jobs.join('fast_scan', '10.0.0.77/24', scan, [], on_complete=saved.append)
+        other, started_other = jobs.join('scan', '10.0.0.0/24', scan, [])
+        assert started_first and not started_second and started_other
+        assert first is second and other is not first
+        progress_a, progress_b = [], []
+
+        async def on_progress_a(done, total):
+            progress_a.append(done)
+
+        async def on_progress_b(done, total):
+            progress_b.append(done)
+
+        results_a, results_b, _ = await asyncio.gather(first.wait(on_progress_a), second.wait(on_progress_b),
+                                                       other.wait())
+        assert results_a is results_b and len(results_a) == 4
+        assert progress_a[-1] == progress_b[-1] == 4
+        assert jobs.active() == 0
+        again, started_again = jobs.join('fast_scan', '10.0.0.0/24', scan, [])
+        assert started_again
+        # Принудительный скан не подключается к обычному, а обычный запрос — к принудительному подключается
+        forced, started_forced = jobs.join('fast_scan', '10.0.0.0/24', scan, [], force=True)
+        plain, started_plain = jobs.join('fast_scan', '10.0.0.0/24', scan, [])
+        assert started_forced and forced is not again and forced.force
+        assert not started_plain and plain is forced
+        await asyncio.gather(again.wait(), forced.wait())
+        assert jobs.active() == 0
+
+    asyncio.run(run())
+    assert len(runs) == 4
+    assert len(saved) == 1
+    print("✅ Объединение сканов работает корректно")
+
+def test_fresh_scan_result():
+    """Сохранённый результат отдаётся в пределах окна свежести и не отдаётся после него"""
+    print("🧪 Тестирование кэша результатов сканирования...")
+    manager = ScanManager(results_dir=tempfile.mkdtemp())
+    devices = ResultSet([80], [{'ip': '10.0.0.1', 'open_ports': [80], 'type': 'web'}])
+    manager.save_scan_result('fast_scan', '10.0.0.0/24', {'devices': devices, 'type': 'fast_scan',
+                                                          'timestamp': time.time() - 100})
+    cached = manager.get_fresh_scan_result('fast_scan', '10.0.0.0/24', 300)
+    assert cached['devices'] == [{'ip': '10.0.0.1', 'open_ports': [80], 'type': 'web'}]
+    assert manager.get_fresh_scan_result('fast_scan', '10.0.0.0/24', 60) is None
+    assert manager.get_fresh_scan_result('fast_scan', '10.0.0.0/24', 0) is None
+    assert manager.get_fresh_scan_result('scan', '10.0.0.0/24', 300) is None
+    print("✅ Кэш результатов сканирования работает корректно")
+
+def test_prioritized_hosts():
+    """Известные по прошлому результату хосты сканируются первыми, остальные — без повторов"""
+    print("🧪 Тестирование инкрементального порядка целей...")
+    known = ['10.0.0.200', '10.0.0.7', '192.168.1.1']
+    hosts = scan_engine.prioritize(scan_engine.targets('10.0.0.0/24'), known)
+    order = list(hosts)
+    assert order[:2] == ['10.0.0.7', '10.0.0.200']
+    assert len(order) == len(hosts) == 254
+    assert sorted(order, key=ipaddress.IPv4Address) == [str(ip) for ip in ipaddress.IPv4Network('10.0.0.0/24').hosts()]
+    shards = hosts.split(2)
+    assert [list(shard)[0] for shard in shards] == ['10.0.0.7', '10.0.0.200']
+    assert sum(len(shard) for shard in shards) == 254
+    assert scan_engine.prioritize(['10.0.0.1', '10.0.0.7'], known) == ['10.0.0.7', '10.0.0.1']
+    print("✅ Инкрементальный порядок целей работает корректно")
+
+def test_neighbor_table():
+    """Разбор /proc/net/arp и /proc/net/route: только разрешённые записи и подсети без шлюза"""
+    print("🧪 Тестирование таблицы соседей...")
+    workdir = tempfile.mkdtemp()
+    arp_path = os.path.join(workdir, 'arp')
+    route_path = os.path.join(workdir, 'route')
+    with open(arp_path, 'w') as f:
+        f.write("IP address       HW type     Flags       HW address            Mask     Device\n"
+                "10.0.0.1         0x1         0x2         AA:BB:CC:00:00:01     *        eth0\n"
+                "10.0.0.9         0x1         0x0         00:00:00:00:00:00     *        eth0\n"
+                "192.168.5.5      0x1         0x2         aa:bb:cc:00:00:02     *        eth1\n"
+                "10.0.0.2         0x1         0x6         aa:bb:cc:00:00:03     *        eth0\n")
+    with open(route_path, 'w') as f:
+        f.write("Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+                "eth0\t00000000\t0100000A\t0003\t0\t0\t0\t00000000\t0\t0\t0\n"
+                "eth0\t0000000A\t00000000\t0001\t0\t0\t0\t00FFFFFF\t0\t0\t0\n")
+    table = neighbors._read_proc_arp(arp_path)
+    assert table == {'10.0.0.1': 'aa:bb:cc:00:00:01', '192.168.5.5': 'aa:bb:cc:00:00:02',
+                     '10.0.0.2': 'aa:bb:cc:00:00:03'}
+    # /proc/net/arp не различает REACHABLE и STALE: подтверждены только статические записи
+    assert table.confirmed == {'10.0.0.2'}
+    assert neighbors.attached_networks(route_path) == [ipaddress.IPv4Network('10.0.0.0/24')]
+    hosts = scan_engine.targets('10.0.0.0/24')
+    subset = table.subset(hosts)
+    assert sorted(subset) == ['10.0.0.1', '10.0.0.2'] and subset.confirmed == {'10.0.0.2'}
+    assert '10.0.0.0' not in hosts and 'bad' not in hosts
+
+    neigh = neighbors._parse_ip_neigh(
+        "10.0.0.1 dev eth0 lladdr aa:bb:cc:00:00:01 REACHABLE\n"
+        "10.0.0.5 dev eth0 lladdr aa:bb:cc:00:00:05 STALE\n"
+        "10.0.0.6 dev eth0  FAILED\n")
+    assert sorted(neigh) == ['10.0.0.1', '10.0.0.5'] and neigh.confirmed == {'10.0.0.1'}
+    # Устаревшая запись без ответа на пробы — не устройство; подтверждённая — живой хост
+    from telegram_bot.utils import fast_scan
+    assert fast_scan.fast_device_result('10.0.0.5', [], False, mac=neigh['10.0.0.5']) is None
+    assert fast_scan.fast_device_result('10.0.0.1', [], True, mac=neigh['10.0.0.1'])['mac'] == 'aa:bb:cc:00:00:01'
+    print("✅ Таблица соседей работает корректно")
+
+def test_oui_index():
+    """Производитель и тип по MAC из встроенного индекса и из реестра IEEE в формате CSV"""
+    print("🧪 Тестирование индекса производителей...")
+    index = oui.OuiIndex()
+    assert index.lookup('4C:5E:0C:12:34:56') == ('Routerboard.com (MikroTik)', 'router')
+    assert index.lookup('44-19-b6-00-00-01')[1] == 'camera'
+    assert index.lookup('02:00:00:00:00:01') == (None, None)
+    assert index.lookup('') == (None, None)
+    prefixes = list(index._prefixes)
+    assert prefixes == sorted(prefixes) and len(index) == len(prefixes)
+    path = os.path.join(tempfile.mkdtemp(), 'oui.csv')
+    with open(path, 'w') as f:
+        f.write('Registry,Assignment,Organization Name,Organization Address\n'
+                'MA-L,A1B2C3,"Bitmain Technologies, Inc.",Beijing CN\n'
+                'MA-L,0000AA,XEROX CORPORATION,M/S 105-50C WEBSTER NY US 14580\n')
+    ieee = oui.OuiIndex(path)
+    assert ieee.lookup('a1:b2:c3:00:00:01') == ('Bitmain Technologies, Inc.', 'miner')
+    assert ieee.vendor('00:00:aa:01:02:03') == 'XEROX CORPORATION'
+    print("✅ Индекс производителей работает корректно")
+
+NMAP_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE nmaprun>
+<nmaprun scanner="nmap" args="nmap -oX -">
+<host><status state="up" reason="syn-ack"/><address addr="10.0.0.5" addrtype="ipv4"/>
+<address addr="4C:5E:0C:00:00:05" addrtype="mac" vendor="Routerboard.com"/>
+<ports><port protocol="tcp" portid="22"><state state="open"/></port>
+<port protocol="tcp" portid="80"><state state="closed"/></port></ports></host>
+<taskprogress task="Connect Scan" percent="50.00"/>
+<host><status state="down"/><address addr="10.0.0.6" addrtype="ipv4"/></host>
+<host><status state="up"/><address addr="10.0.0.9" addrtype="ipv4"/><ports/></host>
+</nmaprun>
+"""
+
+def _install_fake_nmap(xml: bytes) -> str:
+    """Кладёт в начало PATH подставной nmap, печатающий готовый XML; возвращает прежний PATH"""
+    bindir = tempfile.mkdtemp()
+    with open(os.path.join(bindir, 'xml'), 'wb') as f:
+        f.write(xml)
+    script = os.path.join(bindir, 'nmap')
+    with open(script, 'w') as f:
+        f.write(f"#!/bin/sh\ncat {os.path.join(bindir, 'xml')}\n")
+    os.chmod(script, 0o755)
+    original_path = os.environ.get('PATH', '')
+    os.environ['PATH'] = bindir + os.pathsep + original_path
+    return original_path
+
+def test_nmap_backend():
+    """XML nmap разбирается по кускам, хосты отдаются по мере готовности, без nmap — свой движок"""
+    print("🧪 Тестирование бэкенда nmap...")
+    stream = nmap_backend.NmapXmlStream()
+    events = []
+    for i in range(0, len(NMAP_XML), 37):
+        events.extend(stream.feed(NMAP_XML[i:i + 37]))
+    assert events == [('host', {'ip': '10.0.0.5', 'open_ports': [22], 'mac': '4c:5e:0c:00:00:05'}),
+                      ('progress', 50.0),
+                      ('host', {'ip': '10.0.0.9', 'open_ports': []})]
+    settings = _Settings({'scanning.backend': 'auto'})
+    assert not nmap_backend.selected(settings, '10.0.0.0/24', 254)
+    assert not nmap_backend.selected(settings, scan_engine.HostRange('10.0.0.0/16'), 65534, backend='nmap')
+
+    original_path = _install_fake_nmap(NMAP_XML)
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append((done, total))
+
+    async def build(ip, open_ports, alive, agent, mac):
+        return {'ip': ip, 'open_ports': open_ports, 'alive': alive, 'mac': mac}
+
+    async def slow_build(ip, open_ports, alive, agent, mac):
+        # Как summary майнера: медленная сборка не должна выполняться по очереди
+        await asyncio.sleep(0.3)
+        return {'ip': ip}
+
+    try:
+        assert nmap_backend.selected(_Settings({'scanning.backend': 'nmap'}), '10.0.0.0/24', 254)
+        hosts = scan_engine.targets('10.0.0.0/24')
+        devices = asyncio.run(scan_engine.collect(nmap_backend.iter_devices(
+            '10.0.0.0/24', hosts, [22, 80], build, _Settings({'scanning.snmp_sweep': False}),
+            macs=neighbors.NeighborTable({'10.0.0.77': 'aa:bb:cc:dd:ee:ff', '10.0.0.78': 'aa:bb:cc:dd:ee:fe'},
+                                         confirmed=['10.0.0.77']),
+            on_progress=on_progress)))
+        start = time.monotonic()
+        slow = asyncio.run(scan_engine.collect(nmap_backend.iter_devices(
+            '10.0.0.0/24', hosts, [22, 80], slow_build, _Settings({'scanning.snmp_sweep': False}),
+            max_workers=4)))
+        elapsed = time.monotonic() - start
+    finally:
+        os.environ['PATH'] = original_path
+    assert devices == [
+        {'ip': '10.0.0.5', 'open_ports': [22], 'alive': True, 'mac': '4c:5e:0c:00:00:05'},
+        {'ip': '10.0.0.9', 'open_ports': [], 'alive': True, 'mac': None},
+        {'ip': '10.0.0.77', 'open_ports': [], 'alive': True, 'mac': 'aa:bb:cc:dd:ee:ff'},
+    ]
+    assert progress == [(127, 254), (254, 254)]
+    assert sorted(device['ip'] for device in slow) == ['10.0.0.5', '10.0.0.9'] and elapsed < 0.5
+    print("✅ Бэкенд nmap работает корректно")
+
+def test_miner_sweep():
+    """Поиск майнеров: summary запрашивается на соединении, доказавшем открытость порта;
+    закрытый порт и не отвечающий JSON сервер майнерами не считаются"""
+    print("🧪 Тестирование поиска майнеров...")
+    from telegram_bot.utils import miner_scan
+    requests = []
+
+    async def handle(reader, writer):
+        requests.append(await reader.readline())
+        writer.write(b'{"STATUS": [{"STATUS": "S"}], "SUMMARY": [{"MHS av": 110000.0, "Elapsed": 42}]}\x00')
+        await writer.drain()
+        writer.close()
+
+    async def silent(reader, writer):
+        writer.close()
+
+    async def uptime_only(reader, writer):
+        await reader.readline()
+        writer.write(b'{"SUMMARY": [{"GHS av": 95.5, "Uptime": 7}]}\x00')
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        mute = await asyncio.start_server(silent, '127.0.0.1', 0)
+        mute_port = mute.sockets[0].getsockname()[1]
+        other = await asyncio.start_server(uptime_only, '127.0.0.1', 0)
+        other_port = other.sockets[0].getsockname()[1]
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            closed_port = s.getsockname()[1]
+        session = probe.ScanSession('test', probe.RttEstimator(initial_timeout=1.0))
+        original_settings = miner_scan.settings_manager
+        miner_scan.settings_manager = _Settings({'scanning.profiles': {'miners': {'ports': [closed_port, port]}}})
+        try:
+            found = await miner_scan.discover_miner_on_ports('127.0.0.1', [closed_port, port], timeout=1.0,
+                                                             session=session)
+            closed = await miner_scan.discover_miner('127.0.0.1', closed_port, timeout=1.0, session=session)
+            not_miner = await miner_scan.discover_miner('127.0.0.1', mute_port, timeout=1.0, session=session)
+            by_uptime = await miner_scan.discover_miner('127.0.0.1', other_port, timeout=1.0, session=session)
+            swept = await scan_engine.collect(miner_scan.iter_scan_network_for_miners('127.0.0.1/32', refresh=True))
+        finally:
+            miner_scan.settings_manager = original_settings
+            server.close()
+            mute.close()
+            other.close()
+            await server.wait_closed()
+            await mute.wait_closed()
+            await other.wait_closed()
+        return found, closed, not_miner, by_uptime, swept
+
+    found, closed, not_miner, by_uptime, swept = asyncio.run(run())
+    expected = {'ip': '127.0.0.1', 'hashrate': 110000.0, 'uptime': 42, 'type': 'miner'}
+    assert found == expected and swept == [expected]
+    assert closed is None and not_miner is None
+    # Прошивки без Elapsed отдают время работы в Uptime — разбор общий с остальными сканами
+    assert by_uptime == {'ip': '127.0.0.1', 'hashrate': 95.5, 'uptime': 7, 'type': 'miner'}
+    assert requests == [b'{"command": "summary"}\n'] * 2
+    print("✅ Поиск майнеров работает корректно")
+
+def test_miner_scan_nmap_backend():
+    """Профиль miners с backend nmap: nmap находит порт, summary запрашивается у найденного хоста"""
+    print("🧪 Тестирование поиска майнеров через nmap...")
+    from telegram_bot.utils import miner_scan
+
+    async def handle(reader, writer):
+        await reader.readline()
+        writer.write(b'{"SUMMARY": [{"GHS av": 95.5, "Elapsed": 3600}]}\x00')
+        await writer.drain()
+        writer.close()
+
+    async def run(settings):
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        xml = (b'<?xml version="1.0"?><nmaprun><host><status state="up"/>'
+               b'<address addr="127.0.0.1" addrtype="ipv4"/><ports><port protocol="tcp" portid="%d">'
+               b'<state state="open"/></port></ports></host></nmaprun>' % port)
+        original_path = _install_fake_nmap(xml)
+        original_settings = miner_scan.settings_manager
+        miner_scan.settings_manager = settings
+        try:
+            return await scan_engine.collect(miner_scan.iter_scan_network_for_miners('127.0.0.0/30'))
+        finally:
+            miner_scan.settings_manager = original_settings
+            os.environ['PATH'] = original_path
+            server.close()
+            await server.wait_closed()
+
+    settings = _Settings({'scanning.profiles': {'miners': {'backend': 'nmap'}}, 'scanning.neighbors': False})
+    miners = asyncio.run(run(settings))
+    assert miners == [{'ip': '127.0.0.1', 'hashrate': 95.5, 'uptime': 3600, 'type': 'miner'}]
+    print("✅ Поиск майнеров через nmap работает корректно")
+
+def test_scan_profiles():
+    """Профили компилируются в план проб: встроенные, переопределённые в настройках и custom"""
+    print("🧪 Тестирование профилей сканирования...")
+    settings = _Settings({})
+    fast = scan_profiles.plan_for(settings, 'fast_scan')
+    assert fast.name == 'fast' and fast.ports[:3] == (80, 8080, 22) and fast.timeout == 0.5
+    assert 161 in fast.ports and 161 not in fast.tcp_ports
+    assert fast.probe_ports(True) == fast.tcp_ports and fast.probe_ports(False) == fast.ports
+    assert scan_profiles.plan_for(settings, 'fast_scan') is fast
+    # Быстрый скан не ждёт SNMP, полный — опрашивает агентов
+    assert not fast.snmp_sweep and scan_profiles.plan_for(settings, 'scan').snmp_sweep
+    miners = scan_profiles.plan_for(settings, 'miners')
+    assert miners.ports == (4028,) and not miners.snmp_sweep
+    assert scan_profiles.plan_for(settings, 'scan', 'unknown').name == 'full'
+    assert fast.sentinel_ports == 0
+    assert scan_profiles.plan_for(_Settings({'scanning.sentinel_ports': 3}), 'fast_scan').sentinel_ports == 3
+
+    overridden = _Settings({'scanning.profiles': {'cameras': {'ports': [554, 554, 8000], 'max_workers': 32,
+                                                              'sentinel_ports': 1}},
+                            'scanning.scan_profile': {'scan': 'cameras'}})
+    cameras = scan_profiles.plan_for(overridden, 'scan')
+    assert cameras.ports == (554, 8000) and cameras.max_workers == 32 and cameras.timeout == 1.0
+    assert cameras.sentinel_ports == 1
+    assert scan_profiles.plan_for(overridden, 'fast_scan').name == 'fast'
+
+    custom = scan_profiles.get_plan(_Settings({'scanning.default_ports': [22, 161], 'scanning.default_timeout': 2,
+                                               'scanning.snmp_sweep': True, 'scanning.backend': 'nmap'}), 'custom')
+    assert custom.ports == (22, 161) and custom.timeout == 2.0 and custom.snmp_sweep and custom.backend == 'nmap'
+    print("✅ Профили сканирования работают корректно")
+
+def test_shared_settings():
+    """Сканеры читают тот же settings.json, что и интерфейс бота"""
+    print("🧪 Тестирование общих настроек сканеров...")
+    from telegram_bot.utils import fast_scan, network_scan, miner_scan
+    shared = get_settings_manager()
+    assert fast_scan.settings_manager is shared
+    assert network_scan.settings_manager is shared and miner_scan.settings_manager is shared
+    assert shared.config_file == os.path.join(BOT_DATA_DIR, 'settings.json')
+    assert BOT_DATA_DIR.endswith(os.path.join('telegram_bot', 'data'))
+    print("✅ Сканеры используют общие настройки бота")
+
+if __name__ == '__main__':
+    test_scan_hosts_order_and_progress()
+    test_ping_sweep_prune_hosts()
+    test_iter_scan_hosts_streams_and_stops()
+    test_aimd_controller()
+    test_host_range_is_lazy()
+    test_result_set_roundtrip()
+    test_sharded_scan()
+    test_scan_jobs_singleflight()
+    test_fresh_scan_result()
+    test_prioritized_hosts()
+    test_neighbor_table()
+    test_oui_index()
+    test_nmap_backend()
+    test_miner_sweep()
+    test_miner_scan_nmap_backend()
+    test_scan_profiles()
+    test_shared_settings()
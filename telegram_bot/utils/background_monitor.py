@@ -2,11 +2,10 @@ import asyncio
 import logging
 from typing import Dict, List
 from telegram_bot.utils.router_monitor import check_routers_status
-from telegram_bot.utils.settings_manager import SettingsManager
+from telegram_bot.utils.settings_manager import get_settings_manager
 from telegram_bot.bot.translations import translate
-import os
 
-settings_manager = SettingsManager(base_dir=os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data')))
+settings_manager = get_settings_manager()
 
 class BackgroundMonitor:
     def __init__(self, bot, chat_id):
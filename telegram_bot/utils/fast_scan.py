@@ -1,15 +1,16 @@
 import asyncio
-import ipaddress
-import socket
-from typing import List, Dict, Optional
-from telegram_bot.utils.settings_manager import SettingsManager
-import os
+import functools
+import logging
+from typing import List, Dict, Optional, AsyncIterator, Iterable
+from telegram_bot.utils.settings_manager import get_settings_manager
+from telegram_bot.utils import probe, scan_engine, ping_sweep, snmp_sweep, neighbors, oui, nmap_backend, scan_profiles
+from telegram_bot.utils.fingerprint import Fingerprinter
 
-settings_manager = SettingsManager(base_dir=os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data')))
+settings_manager = get_settings_manager()
 # Используйте settings_manager.get_setting('...') для получения нужных параметров.
 
-# Порты для быстрой проверки (можно расширить)
-FAST_PORTS = [80, 8080, 22, 161, 443, 554, 4028, 62078, 5555]
+# Порты для быстрой проверки — профиль fast (переопределяется в scanning.profiles)
+FAST_PORTS = scan_profiles.BUILTIN_PROFILES['fast']['ports']
 
 PORT_TO_TYPE = {
     80: 'web',
@@ -24,58 +25,120 @@ PORT_TO_TYPE = {
 }
 
 async def check_port(ip: str, port: int, timeout: float = 0.5) -> bool:
-    loop = asyncio.get_event_loop()
-    try:
-        return await loop.run_in_executor(
-            None,
-            lambda: _check_port_sync(ip, port, timeout)
-        )
-    except Exception:
-        return False
+    return await probe.check_port(ip, port, timeout)
 
-def _check_port_sync(ip: str, port: int, timeout: float) -> bool:
-    try:
-        with socket.create_connection((ip, port), timeout=timeout):
-            return True
-    except Exception:
-        return False
+async def fast_scan_device(ip: str, session: Optional[probe.ScanSession] = None,
+                           snmp: Optional[snmp_sweep.SnmpProber] = None,
+                           macs: Optional[neighbors.NeighborTable] = None,
+                           plan: Optional[scan_profiles.ProbePlan] = None) -> Optional[Dict]:
+    """snmp — SNMP-опрос по UDP параллельно TCP-пробам (None — SNMP-этап выключен, 161 проверяется по TCP),
+    macs — таблица соседей: MAC найденного хоста, подтверждённо доступный хост живой и без ответа на пробы,
+    plan — план проб профиля скана (по умолчанию профиль быстрого скана из настроек)"""
+    if plan is None:
+        plan = scan_profiles.plan_for(settings_manager, 'fast_scan')
+    # Агенты SNMP слушают UDP: при SNMP-этапе TCP 161 не проверяется
+    ports = plan.probe_ports(snmp is not None)
+    fingerprinter = Fingerprinter.from_settings(settings_manager, ip)
+    on_open = fingerprinter.handlers(ports) if fingerprinter else None
+    probes = probe.probe_host(ip, ports, timeout=plan.timeout, sentinel_count=plan.sentinel_ports,
+                              session=session, on_open=on_open)
+    if snmp is not None:
+        # Ответ SNMP ждём не дольше TCP-проб: иначе каждый хост без агента занимал бы воркер на snmp_timeout
+        wait = session.rtt.timeout if session is not None else plan.timeout
+        (open_ports, alive), agent = await asyncio.gather(probes, snmp.query(ip, key=session, timeout=wait))
+    else:
+        (open_ports, alive), agent = await probes, None
+    if macs is not None and macs.is_reachable(ip):
+        alive = True
+    return fast_device_result(ip, open_ports, alive, fingerprinter=fingerprinter,
+                              agent=agent, mac=macs.get(ip) if macs else None)
 
-async def fast_scan_device(ip: str) -> Optional[Dict]:
-    open_ports = []
+def fast_device_result(ip: str, open_ports: List[int], alive: bool, fingerprinter: Optional[Fingerprinter] = None,
+                       agent: Optional[Dict] = None, mac: Optional[str] = None) -> Optional[Dict]:
+    """Словарь устройства по итогам проб (своего движка или nmap); None — хост не найден"""
+    vendor, by_vendor = oui.get_index(settings_manager).lookup(mac) if mac else (None, None)
     types = set()
-    for port in FAST_PORTS:
-        if await check_port(ip, port):
-            open_ports.append(port)
-            t = PORT_TO_TYPE.get(port)
-            if t:
-                types.add(t)
+    for port in open_ports:
+        # Баннер точнее производителя по MAC, производитель точнее статической таблицы портов
+        t = (fingerprinter and fingerprinter.port_type(port)) or by_vendor or PORT_TO_TYPE.get(port)
+        if t:
+            types.add(t)
+    if agent:
+        open_ports = open_ports + [snmp_sweep.SNMP_PORT]
+        types.add(agent['type'] or by_vendor or PORT_TO_TYPE[snmp_sweep.SNMP_PORT])
     if open_ports:
-        return {
+        result = {
             'ip': ip,
             'open_ports': open_ports,
             'type': ', '.join(types) if types else 'unknown',
         }
-    return None
+        if fingerprinter and fingerprinter.results:
+            result['services'] = fingerprinter.services()
+        if agent and agent['descr']:
+            result['snmp'] = agent['descr']
+    elif alive:
+        # Хост ответил RST или подтверждён таблицей соседей, но открытых портов нет
+        result = {'ip': ip, 'open_ports': [], 'type': by_vendor or 'alive'}
+    else:
+        return None
+    if mac:
+        result['mac'] = mac
+    if vendor:
+        result['vendor'] = vendor
+    return result
 
-async def fast_scan_network(network: str, on_progress=None, max_concurrent: int = 50) -> List[Dict]:
-    net = ipaddress.IPv4Network(network, strict=False)
-    hosts = [str(ip) for ip in net.hosts()]
-    results = []
-    total = len(hosts)
-    sem = asyncio.Semaphore(max_concurrent)
-    progress = {'done': 0}
+async def _nmap_device(ip: str, open_ports: List[int], alive: bool, agent: Optional[Dict],
+                       mac: Optional[str]) -> Optional[Dict]:
+    return fast_device_result(ip, open_ports, alive, agent=agent, mac=mac)
 
-    async def scan_and_report(ip):
-        async with sem:
-            res = await fast_scan_device(ip)
-            progress['done'] += 1
-            if on_progress and (progress['done'] % max(1, total // 20) == 0 or progress['done'] == total):
-                await on_progress(progress['done'], total)
-            return res
+async def iter_fast_scan_network(network: str, on_progress=None, max_concurrent: Optional[int] = None,
+                                 use_ping: Optional[bool] = None, refresh: bool = False,
+                                 known: Optional[Iterable[str]] = None,
+                                 profile: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Потоковое быстрое сканирование сети: отдаёт устройства по мере обнаружения.
+    profile — профиль скана (по умолчанию из scanning.scan_profile, иначе fast)"""
+    plan = scan_profiles.plan_for(settings_manager, 'fast_scan', profile)
+    hosts = scan_engine.targets(network)
+    # Живые по таблице соседей хосты сканируются первыми вместе с известными по прошлому результату
+    macs = await neighbors.discover(hosts, settings_manager, prime=not scan_engine.in_shard(), tag='FAST_SCAN')
+    if nmap_backend.selected(settings_manager, network, len(hosts), backend=plan.backend):
+        async for device in nmap_backend.iter_devices(network, hosts, plan.ports, _nmap_device, settings_manager,
+                                                      macs=macs, on_progress=on_progress,
+                                                      use_snmp=plan.snmp_sweep, max_workers=plan.max_workers,
+                                                      tag='FAST_SCAN'):
+            yield device
+        return
+    hosts = scan_engine.prioritize(hosts, set(known or ()) | set(macs or ()))
+    hosts = await ping_sweep.prune_hosts(hosts, settings_manager,
+                                         enabled=plan.ping_sweep if use_ping is None else use_ping, tag='FAST_SCAN')
+    processes = scan_engine.shard_count(settings_manager, len(hosts))
+    if processes > 1:
+        async for device in scan_engine.iter_sharded(hosts, __name__, 'iter_fast_scan_network', processes,
+                                                     on_progress=on_progress, tag='FAST_SCAN',
+                                                     options={'profile': plan.name, 'max_concurrent': max_concurrent,
+                                                              'refresh': refresh}):
+            yield device
+        return
+    if max_concurrent is None:
+        max_concurrent = plan.max_workers
+    session = probe.ScanSession.from_settings(settings_manager, 'FAST_SCAN', initial_timeout=plan.timeout,
+                                              refresh=refresh)
+    snmp = snmp_sweep.prober(settings_manager, enabled=plan.snmp_sweep)
+    scan_one = functools.partial(fast_scan_device, session=session, snmp=snmp, macs=macs, plan=plan)
+    try:
+        async for device in scan_engine.iter_scan_hosts(hosts, scan_one, max_workers=max_concurrent,
+                                                        on_progress=on_progress, tag='FAST_SCAN', session=session):
+            yield device
+    finally:
+        if snmp is not None:
+            snmp.close()
+    if snmp is not None:
+        logging.info(f"[FAST_SCAN] SNMP: ответили {snmp.found} агентов")
+    logging.info(f"[FAST_SCAN] {session}")
 
-    tasks = [scan_and_report(ip) for ip in hosts]
-    scan_results = await asyncio.gather(*tasks)
-    for res in scan_results:
-        if res:
-            results.append(res)
-    return results 
\ No newline at end of file
+async def fast_scan_network(network: str, on_progress=None, max_concurrent: Optional[int] = None,
+                            use_ping: Optional[bool] = None, refresh: bool = False,
+                            known: Optional[Iterable[str]] = None, profile: Optional[str] = None) -> List[Dict]:
+    return await scan_engine.collect(iter_fast_scan_network(network, on_progress=on_progress,
+                                                           max_concurrent=max_concurrent, use_ping=use_ping,
+                                                           refresh=refresh, known=known, profile=profile))
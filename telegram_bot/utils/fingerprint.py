@@ -0,0 +1,154 @@
+"""
+Определение сервисов по баннерам на уже открытых соединениях движка проб.
+SSH отдаёт строку версии сам, для HTTP отправляется HEAD, для RTSP — OPTIONS.
+Чтение ограничено по размеру, все обработчики хоста укладываются в общий бюджет времени.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Dict, Iterable, Optional
+
+from telegram_bot.utils import probe
+
+# Бюджет времени на снятие баннеров с одного хоста, сек
+DEFAULT_BUDGET = 1.0
+# Сколько байт ответа читаем не больше
+BANNER_LIMIT = 1024
+
+# Подсказки типа устройства по заголовку Server / строке версии SSH (подстрока в нижнем регистре)
+SERVER_HINTS = [
+    ('hikvision', 'camera'),
+    ('dahua', 'camera'),
+    ('dnvrs-webs', 'camera'),
+    ('app-webs', 'camera'),
+    ('uc-httpd', 'camera'),
+    ('ipcam', 'camera'),
+    ('webcam', 'camera'),
+    ('mikrotik', 'router'),
+    ('routeros', 'router'),
+    ('rosssh', 'router'),
+    ('openwrt', 'router'),
+    ('luci', 'router'),
+    ('keenetic', 'router'),
+    ('zyxel', 'router'),
+    ('tp-link', 'router'),
+    ('micro_httpd', 'router'),
+    ('mini_httpd', 'router'),
+    ('cisco', 'switch'),
+    ('procurve', 'switch'),
+    ('jetdirect', 'printer'),
+]
+
+# Тип по умолчанию для распознанного протокола без подсказки
+SERVICE_TYPES = {
+    'ssh': 'ssh',
+    'http': 'web',
+    'rtsp': 'camera',
+}
+
+_SERVER_RE = re.compile(rb'^server:\s*(.+?)\s*$', re.IGNORECASE | re.MULTILINE)
+
+def device_hint(product: str) -> Optional[str]:
+    """Тип устройства по строке продукта (заголовок Server, версия SSH, sysDescr SNMP)"""
+    lowered = product.lower()
+    for needle, dtype in SERVER_HINTS:
+        if needle in lowered:
+            return dtype
+    return None
+
+async def _read_until(sock, terminator: bytes, limit: int = BANNER_LIMIT) -> bytes:
+    loop = asyncio.get_running_loop()
+    data = b''
+    while len(data) < limit and terminator not in data:
+        chunk = await loop.sock_recv(sock, limit - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+async def _probe_ssh(sock, ip: str, port: int) -> Optional[Dict]:
+    # Сервер SSH первым присылает строку версии: SSH-2.0-OpenSSH_8.4p1
+    data = await _read_until(sock, b'\n', 255)
+    if not data.startswith(b'SSH-'):
+        return None
+    parts = data.split(b'\n', 1)[0].decode(errors='ignore').strip().split('-', 2)
+    product = parts[2] if len(parts) > 2 else ''
+    return {'service': 'ssh', 'product': product}
+
+async def _probe_http(sock, ip: str, port: int) -> Optional[Dict]:
+    loop = asyncio.get_running_loop()
+    await loop.sock_sendall(sock, f'HEAD / HTTP/1.0\r\nHost: {ip}\r\nUser-Agent: network_monitor_bot\r\n\r\n'.encode())
+    data = await _read_until(sock, b'\r\n\r\n')
+    if not data.startswith(b'HTTP/'):
+        return None
+    match = _SERVER_RE.search(data)
+    return {'service': 'http', 'product': match.group(1).decode(errors='ignore') if match else ''}
+
+async def _probe_rtsp(sock, ip: str, port: int) -> Optional[Dict]:
+    loop = asyncio.get_running_loop()
+    await loop.sock_sendall(sock, f'OPTIONS rtsp://{ip}:{port}/ RTSP/1.0\r\nCSeq: 1\r\n\r\n'.encode())
+    data = await _read_until(sock, b'\r\n\r\n')
+    if not data.startswith(b'RTSP/'):
+        return None
+    match = _SERVER_RE.search(data)
+    return {'service': 'rtsp', 'product': match.group(1).decode(errors='ignore') if match else ''}
+
+# Какие пробы выполняются на каких портах (443 — TLS, баннер без рукопожатия не снять)
+PORT_PROBES = {
+    22: _probe_ssh,
+    80: _probe_http,
+    8080: _probe_http,
+    554: _probe_rtsp,
+}
+
+class Fingerprinter:
+    """Снятие баннеров с одного хоста. handlers() отдаёт обработчики для probe.probe_host(on_open=...),
+    результаты по портам копятся в results. Бюджет отсчитывается от первого открытого порта
+    и общий для всех портов хоста."""
+
+    def __init__(self, ip: str, budget: float = DEFAULT_BUDGET):
+        self.ip = ip
+        self.budget = budget
+        self.results = {}
+        self._deadline = None
+
+    @classmethod
+    def from_settings(cls, settings_manager, ip: str) -> Optional['Fingerprinter']:
+        """Возвращает Fingerprinter, если этап включён в scanning.fingerprint, иначе None"""
+        if not settings_manager.get_setting('scanning.fingerprint', False):
+            return None
+        return cls(ip, settings_manager.get_setting('scanning.fingerprint_budget', DEFAULT_BUDGET))
+
+    def handlers(self, ports: Iterable[int]) -> Dict[int, probe.PayloadHandler]:
+        def make(port, run_probe):
+            async def handler(sock):
+                await self._run(port, run_probe, sock)
+            return handler
+        return {port: make(port, PORT_PROBES[port]) for port in ports if port in PORT_PROBES}
+
+    async def _run(self, port: int, run_probe, sock):
+        loop = asyncio.get_running_loop()
+        if self._deadline is None:
+            self._deadline = loop.time() + self.budget
+        remaining = self._deadline - loop.time()
+        if remaining <= 0:
+            return
+        try:
+            result = await asyncio.wait_for(run_probe(sock, self.ip, port), timeout=remaining)
+        except (asyncio.TimeoutError, OSError) as e:
+            logging.debug(f"[FINGERPRINT] {self.ip}:{port}: баннер не получен ({e or 'таймаут'})")
+            return
+        if result:
+            result['type'] = device_hint(result['product']) or SERVICE_TYPES[result['service']]
+            self.results[port] = result
+
+    def port_type(self, port: int) -> Optional[str]:
+        """Тип устройства по баннеру порта (None — баннер не снят)"""
+        result = self.results.get(port)
+        return result['type'] if result else None
+
+    def services(self) -> str:
+        """Краткая сводка сервисов для результата скана: '22 ssh OpenSSH_8.4; 80 http lighttpd'"""
+        return '; '.join(f"{port} {r['service']} {r['product']}".strip()
+                         for port, r in sorted(self.results.items()))
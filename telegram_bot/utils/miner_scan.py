@@ -1,32 +1,76 @@
 import asyncio
-import socket
+import functools
 import json
 import logging
-from typing import List, Dict, Optional
-import ipaddress
-import os
-from telegram_bot.utils.settings_manager import SettingsManager
+from typing import List, Dict, Optional, AsyncIterator, Iterable
+from telegram_bot.utils.settings_manager import get_settings_manager
+from telegram_bot.utils import probe, scan_engine, ping_sweep, scan_profiles, nmap_backend
 
 MINER_PORT = 4028
-settings_manager = SettingsManager(base_dir=os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data')))
+settings_manager = get_settings_manager()
 # Используйте settings_manager.get_setting('...') для получения нужных параметров.
 
 async def check_port(ip: str, port: int, timeout: float = 2.0) -> bool:
-    loop = asyncio.get_event_loop()
-    try:
-        return await loop.run_in_executor(
-            None,
-            lambda: _check_port_sync(ip, port, timeout)
-        )
-    except Exception:
-        return False
+    return await probe.check_port(ip, port, timeout)
+
+# Максимальный размер ответа на summary, который читаем с сокета
+SUMMARY_REPLY_LIMIT = 16384
+
+def _parse_summary(data: bytes) -> Dict:
+    """Разбирает ответ cgminer API; бросает исключение, если это не JSON"""
+    text = data.decode(errors='ignore')
+    # Иногда ответ невалидный JSON, пробуем найти {...}
+    start = text.find('{')
+    end = text.rfind('}')
+    if start != -1 and end != -1:
+        text = text[start:end+1]
+    return json.loads(text)
 
-def _check_port_sync(ip: str, port: int, timeout: float) -> bool:
+def miner_info_from_reply(ip: str, data: Optional[bytes]) -> Dict:
     try:
-        with socket.create_connection((ip, port), timeout=timeout):
-            return True
+        info = _parse_summary(data)
+        # Универсальный парсинг для разных моделей
+        hashrate = None
+        uptime = None
+        status = 'online'
+        if 'SUMMARY' in info:
+            s = info['SUMMARY'][0]
+            hashrate = s.get('MHS av') or s.get('GHS av') or s.get('hashrate')
+            uptime = s.get('Elapsed') or s.get('Uptime')
+        return {
+            'ip': ip,
+            'status': status,
+            'hashrate': hashrate,
+            'uptime': uptime
+        }
     except Exception:
-        return False
+        return {'ip': ip, 'status': 'online', 'hashrate': None, 'uptime': None}
+
+async def request_summary(sock, timeout: float = 3.0) -> bytes:
+    """Отправляет команду summary в уже открытый неблокирующий сокет и читает ответ
+    до закрытия соединения или завершающего нуль-байта cgminer"""
+    loop = asyncio.get_running_loop()
+
+    async def exchange():
+        await loop.sock_sendall(sock, b'{"command": "summary"}\n')
+        data = b''
+        while len(data) < SUMMARY_REPLY_LIMIT:
+            chunk = await loop.sock_recv(sock, 4096)
+            if not chunk:
+                break
+            data += chunk
+            if chunk.endswith(b'\x00'):
+                break
+        return data
+
+    return await asyncio.wait_for(exchange(), timeout=timeout)
+
+def summary_handler(replies: Dict, timeout: float = 3.0) -> probe.PayloadHandler:
+    """Обработчик открытого порта 4028 для движка проб: выполняет summary на том же соединении
+    и кладёт сырой ответ в replies['summary']"""
+    async def handler(sock):
+        replies['summary'] = await request_summary(sock, timeout)
+    return handler
 
 async def get_miner_info(ip: str, port: int = MINER_PORT, timeout: float = 3.0) -> Optional[Dict]:
     # Пробуем получить информацию через API майнера (Antminer, Avalon, Whatsminer)
@@ -38,49 +82,85 @@ async def get_miner_info(ip: str, port: int = MINER_PORT, timeout: float = 3.0)
         data = await asyncio.wait_for(reader.read(4096), timeout=timeout)
         writer.close()
         await writer.wait_closed()
-        # Попытка декодировать ответ
-        try:
-            text = data.decode(errors='ignore')
-            # Иногда ответ невалидный JSON, пробуем найти {...}
-            start = text.find('{')
-            end = text.rfind('}')
-            if start != -1 and end != -1:
-                text = text[start:end+1]
-            info = json.loads(text)
-            # Универсальный парсинг для разных моделей
-            hashrate = None
-            uptime = None
-            status = 'online'
-            if 'SUMMARY' in info:
-                s = info['SUMMARY'][0]
-                hashrate = s.get('MHS av') or s.get('GHS av') or s.get('hashrate')
-                uptime = s.get('Elapsed') or s.get('Uptime')
-            return {
-                'ip': ip,
-                'status': status,
-                'hashrate': hashrate,
-                'uptime': uptime
-            }
-        except Exception:
-            return {'ip': ip, 'status': 'online', 'hashrate': None, 'uptime': None}
+        return miner_info_from_reply(ip, data)
     except Exception:
         return None
 
-async def scan_network_for_miners(network: str, on_progress=None) -> List[Dict]:
-    net = ipaddress.IPv4Network(network, strict=False)
-    hosts = [str(ip) for ip in net.hosts()]
-    results = []
-    total = len(hosts)
-    for idx, ip in enumerate(hosts, 1):
-        logging.info(f"[SCAN_MINERS] Проверяю {ip} ({idx}/{total})")
-        res = await scan_miner(ip)
-        if res:
-            logging.info(f"[SCAN_MINERS] Найден майнер: {ip}")
-            results.append(res)
-        if on_progress and (idx % max(1, total // 20) == 0 or idx == total):
-            await on_progress(idx, total)
-        await asyncio.sleep(0)
-    return results
+async def iter_scan_network_for_miners(network: str, on_progress=None, max_workers: Optional[int] = None,
+                                       use_ping: Optional[bool] = None, refresh: bool = False,
+                                       known: Optional[Iterable[str]] = None,
+                                       profile: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Потоковый поиск майнеров в сети: отдаёт майнеры по мере обнаружения.
+    profile — профиль скана (по умолчанию из scanning.scan_profile, иначе miners)"""
+    plan = scan_profiles.plan_for(settings_manager, 'miners', profile)
+    hosts = scan_engine.targets(network)
+    if max_workers is None:
+        max_workers = plan.max_workers
+    if nmap_backend.selected(settings_manager, network, len(hosts), backend=plan.backend):
+        build = functools.partial(_nmap_miner, timeout=plan.timeout)
+        async for device in nmap_backend.iter_devices(network, hosts, plan.tcp_ports, build, settings_manager,
+                                                      on_progress=on_progress, use_snmp=False,
+                                                      max_workers=max_workers, tag='SCAN_MINERS'):
+            yield device
+        return
+    hosts = scan_engine.prioritize(hosts, known)
+    hosts = await ping_sweep.prune_hosts(hosts, settings_manager,
+                                         enabled=plan.ping_sweep if use_ping is None else use_ping, tag='SCAN_MINERS')
+    processes = scan_engine.shard_count(settings_manager, len(hosts))
+    if processes > 1:
+        async for device in scan_engine.iter_sharded(hosts, __name__, 'iter_scan_network_for_miners', processes,
+                                                     on_progress=on_progress, tag='SCAN_MINERS',
+                                                     options={'profile': plan.name, 'max_workers': max_workers,
+                                                              'refresh': refresh}):
+            yield device
+        return
+    logging.info(f"[SCAN_MINERS] Всего хостов для проверки: {len(hosts)}, воркеров: {max_workers}")
+    session = probe.ScanSession.from_settings(settings_manager, 'SCAN_MINERS', initial_timeout=plan.timeout,
+                                              refresh=refresh)
+    scan_one = functools.partial(discover_miner_on_ports, ports=plan.tcp_ports, timeout=plan.timeout, session=session)
+    async for device in scan_engine.iter_scan_hosts(hosts, scan_one,
+                                                    max_workers=max_workers, on_progress=on_progress, tag='SCAN_MINERS',
+                                                    session=session):
+        yield device
+    logging.info(f"[SCAN_MINERS] {session}")
+
+async def scan_network_for_miners(network: str, on_progress=None, max_workers: Optional[int] = None,
+                                  use_ping: Optional[bool] = None, refresh: bool = False,
+                                  known: Optional[Iterable[str]] = None, profile: Optional[str] = None) -> List[Dict]:
+    return await scan_engine.collect(iter_scan_network_for_miners(network, on_progress=on_progress,
+                                                                 max_workers=max_workers, use_ping=use_ping,
+                                                                 refresh=refresh, known=known, profile=profile))
+
+async def discover_miner(ip: str, port: int = MINER_PORT, timeout: float = 1.5,
+                         session: Optional[probe.ScanSession] = None) -> Optional[Dict]:
+    # Команда summary выполняется на том же соединении, что доказало открытость порта
+    replies = {}
+    if not await probe.check_port(ip, port, timeout, session=session, on_open=summary_handler(replies, timeout)):
+        return None
+    try:
+        _parse_summary(replies['summary'])
+    except Exception as e:
+        logging.debug(f"[SCAN_MINERS] {ip}: не майнер или не отвечает ({e})")
+        return None
+    # Поля майнера извлекает тот же разбор, что и в остальных сканах
+    miner = miner_info_from_reply(ip, replies['summary'])
+    del miner['status']
+    miner['type'] = 'miner'
+    return miner
+
+async def discover_miner_on_ports(ip: str, ports: Iterable[int] = (MINER_PORT,), timeout: float = 1.5,
+                                  session: Optional[probe.ScanSession] = None) -> Optional[Dict]:
+    """Ищет API майнера на портах профиля по очереди (обычно это только 4028)"""
+    for port in ports:
+        miner = await discover_miner(ip, port, timeout, session=session)
+        if miner:
+            return miner
+    return None
+
+async def _nmap_miner(ip: str, open_ports: List[int], alive: bool, agent: Optional[Dict],
+                      mac: Optional[str], timeout: float = 1.5) -> Optional[Dict]:
+    # nmap только находит открытые порты, summary запрашивается отдельным соединением
+    return await discover_miner_on_ports(ip, open_ports, timeout=timeout)
 
 async def scan_miner(ip: str, port: int = 4028, timeout: float = 1.5) -> Optional[Dict]:
     try:
@@ -0,0 +1,170 @@
+"""
+Обнаружение хостов по таблице соседей ядра (ip neigh, /proc/net/arp) — без сетевых проб.
+Живым без ответа на пробы считается только хост в состоянии REACHABLE/PERMANENT: запись STALE
+может жить часами после отключения устройства, такие хосты лишь сканируются первыми.
+Для напрямую подключённых подсетей таблицу можно предварительно наполнить ARP-запросами:
+ядро разрешает адрес при отправке любого датаграммного пакета на хост своей подсети.
+"""
+
+import asyncio
+import ipaddress
+import itertools
+import logging
+import socket
+import struct
+from typing import Iterable, List, Optional
+
+ARP_PATH = '/proc/net/arp'
+ROUTE_PATH = '/proc/net/route'
+
+# Флаги /proc/net/arp: ATF_COM — запись разрешена (MAC известен), ATF_PERM — статическая запись.
+# Состояния REACHABLE/STALE файл не различает, поэтому подтверждёнными считаются только статические
+_ATF_COM = 0x2
+_ATF_PERM = 0x4
+# Состояния ip neigh, в которых MAC актуален или недавно был актуален
+_NEIGH_STATES = {'REACHABLE', 'STALE', 'DELAY', 'PROBE', 'PERMANENT', 'NOARP'}
+# Состояния, подтверждающие, что хост сейчас доступен
+_CONFIRMED_STATES = {'REACHABLE', 'PERMANENT'}
+
+# Порт discard: пакет нужен только для того, чтобы ядро разрешило адрес по ARP
+PRIME_PORT = 9
+PRIME_RATE = 2000
+BATCH_INTERVAL = 0.02
+# Сколько ждать ответов ARP после рассылки, сек
+DEFAULT_PRIME_WAIT = 0.5
+
+class NeighborTable(dict):
+    """Таблица соседей {ip: mac}. confirmed — адреса, доступность которых ядро подтвердило
+    (REACHABLE/PERMANENT); остальные записи годятся только для порядка скана и MAC найденных хостов."""
+
+    def __init__(self, entries=(), confirmed: Iterable[str] = ()):
+        super().__init__(entries)
+        self.confirmed = set(confirmed)
+
+    def is_reachable(self, ip: str) -> bool:
+        return ip in self.confirmed
+
+    def subset(self, hosts) -> 'NeighborTable':
+        """Записи только для адресов из hosts (HostRange, список)"""
+        found = {ip: mac for ip, mac in self.items() if ip in hosts}
+        return NeighborTable(found, (ip for ip in self.confirmed if ip in found))
+
+def _read_proc_arp(path: str = ARP_PATH) -> Optional[NeighborTable]:
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return None
+    table = NeighborTable()
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        try:
+            flags = int(fields[2], 16)
+        except ValueError:
+            continue
+        if flags & _ATF_COM and fields[3] != '00:00:00:00:00:00':
+            table[fields[0]] = fields[3].lower()
+            if flags & _ATF_PERM:
+                table.confirmed.add(fields[0])
+    return table
+
+def _parse_ip_neigh(output: str) -> NeighborTable:
+    table = NeighborTable()
+    for line in output.splitlines():
+        # 10.0.0.1 dev eth0 lladdr aa:bb:cc:dd:ee:ff REACHABLE
+        fields = line.split()
+        if 'lladdr' in fields and fields[-1] in _NEIGH_STATES:
+            table[fields[0]] = fields[fields.index('lladdr') + 1].lower()
+            if fields[-1] in _CONFIRMED_STATES:
+                table.confirmed.add(fields[0])
+    return table
+
+async def _read_ip_neigh() -> Optional[NeighborTable]:
+    try:
+        process = await asyncio.create_subprocess_exec('ip', '-4', 'neigh', 'show',
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        output, _ = await process.communicate()
+    except OSError as e:
+        logging.debug(f"[NEIGHBORS] ip neigh недоступен: {e}")
+        return None
+    if process.returncode != 0:
+        return None
+    return _parse_ip_neigh(output.decode(errors='ignore'))
+
+async def read_neighbors() -> NeighborTable:
+    """Таблица соседей ядра для разрешённых записей. ip neigh знает состояние записи
+    (REACHABLE/STALE), /proc/net/arp — запасной вариант без состояний."""
+    table = await _read_ip_neigh()
+    if table is None:
+        table = _read_proc_arp()
+    return table if table is not None else NeighborTable()
+
+def attached_networks(path: str = ROUTE_PATH) -> List[ipaddress.IPv4Network]:
+    """Напрямую подключённые подсети (маршруты без шлюза, кроме маршрута по умолчанию)"""
+    networks = []
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return networks
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 8:
+            continue
+        try:
+            destination, gateway, mask = (int(fields[i], 16) for i in (1, 2, 7))
+        except ValueError:
+            continue
+        if gateway or not mask:
+            continue
+        address = socket.inet_ntoa(struct.pack('<I', destination))
+        netmask = socket.inet_ntoa(struct.pack('<I', mask))
+        networks.append(ipaddress.IPv4Network(f'{address}/{netmask}', strict=False))
+    return networks
+
+async def prime_arp(hosts: Iterable[str], rate: int = PRIME_RATE, wait: float = DEFAULT_PRIME_WAIT) -> int:
+    """Рассылает по пустой UDP-датаграмме хостам напрямую подключённых подсетей,
+    чтобы ядро разрешило их адреса по ARP. Возвращает число отправленных пакетов."""
+    networks = attached_networks()
+    if not networks:
+        return 0
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    batch_size = max(1, int(rate * BATCH_INTERVAL))
+    sent = 0
+    try:
+        targets = (ip for ip in hosts if any(ipaddress.IPv4Address(ip) in net for net in networks))
+        while True:
+            batch = list(itertools.islice(targets, batch_size))
+            if not batch:
+                break
+            for ip in batch:
+                try:
+                    sock.sendto(b'', (ip, PRIME_PORT))
+                    sent += 1
+                except OSError as e:
+                    # EAGAIN/EHOSTUNREACH: запись для хоста ядро создаст и без этого пакета
+                    logging.debug(f"[NEIGHBORS] {ip}: пакет не отправлен ({e})")
+            await asyncio.sleep(BATCH_INTERVAL)
+        if sent:
+            await asyncio.sleep(wait)
+    finally:
+        sock.close()
+    return sent
+
+async def discover(hosts, settings_manager, prime: bool = True, tag: str = 'NEIGHBORS') -> Optional[NeighborTable]:
+    """Соседи среди целей скана: {ip: mac} и подтверждённо доступные (confirmed). None — этап выключен.
+    hosts должен поддерживать `in` (HostRange, список). ARP-рассылка (scanning.arp_prime)
+    выполняется только при prime=True."""
+    if not settings_manager.get_setting('scanning.neighbors', True):
+        return None
+    if prime and settings_manager.get_setting('scanning.arp_prime', False):
+        sent = await prime_arp(hosts)
+        logging.info(f"[{tag}] ARP-рассылка: {sent} пакетов")
+    found = (await read_neighbors()).subset(hosts)
+    logging.info(f"[{tag}] Таблица соседей: {len(found)} хостов в целях скана, "
+                 f"из них подтверждённо доступных {len(found.confirmed)}")
+    return found
@@ -1,93 +1,154 @@
 import asyncio
-import socket
-import ipaddress
-from typing import List, Dict, Optional
+import functools
+from typing import List, Dict, Optional, AsyncIterator, Iterable
 import logging
-from .miner_scan import get_miner_info
-import time
-from telegram_bot.utils.settings_manager import SettingsManager
-import os
+from .miner_scan import MINER_PORT, summary_handler, miner_info_from_reply, get_miner_info
+from telegram_bot.utils.settings_manager import get_settings_manager
+from telegram_bot.utils import probe, scan_engine, ping_sweep, snmp_sweep, neighbors, oui, nmap_backend, scan_profiles
+from telegram_bot.utils.fingerprint import Fingerprinter
 
-settings_manager = SettingsManager(base_dir=os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data')))
+settings_manager = get_settings_manager()
 # Используйте settings_manager.get_setting('...') для получения нужных параметров.
 
-# Порты для определения типа устройства
-DEVICE_PORTS = {
-    'router': [80, 8080, 443, 23, 22],
-    'switch': [161, 23, 22],
-    'miner': [4028],
-    'camera': [554, 80, 8080],
-    'phone': [62078, 5555],
-}
+# Порты для определения типа устройства (общие с профилем full)
+DEVICE_PORTS = scan_profiles.DEVICE_PORTS
 
 PORT_TO_TYPE = {}
 for dtype, ports in DEVICE_PORTS.items():
     for port in ports:
         PORT_TO_TYPE.setdefault(port, []).append(dtype)
 
-COMMON_PORTS = list(set([p for ports in DEVICE_PORTS.values() for p in ports]))
+COMMON_PORTS = scan_profiles.BUILTIN_PROFILES['full']['ports']
 
 async def check_port(ip: str, port: int, timeout: float = 1.5) -> bool:
-    loop = asyncio.get_event_loop()
-    try:
-        return await loop.run_in_executor(
-            None,
-            lambda: _check_port_sync(ip, port, timeout)
-        )
-    except Exception:
-        return False
+    return await probe.check_port(ip, port, timeout)
 
-def _check_port_sync(ip: str, port: int, timeout: float) -> bool:
-    try:
-        with socket.create_connection((ip, port), timeout=timeout):
-            return True
-    except Exception:
-        return False
+async def scan_device(ip: str, session: Optional[probe.ScanSession] = None,
+                      snmp: Optional[snmp_sweep.SnmpProber] = None,
+                      macs: Optional[neighbors.NeighborTable] = None,
+                      plan: Optional[scan_profiles.ProbePlan] = None) -> Optional[Dict]:
+    """snmp — SNMP-опрос по UDP параллельно TCP-пробам (None — SNMP-этап выключен, 161 проверяется по TCP),
+    macs — таблица соседей: MAC найденного хоста, подтверждённо доступный хост живой и без ответа на пробы,
+    plan — план проб профиля скана (по умолчанию профиль скана устройств из настроек)"""
+    if plan is None:
+        plan = scan_profiles.plan_for(settings_manager, 'scan')
+    ports = plan.probe_ports(snmp is not None)
+    # Команда summary майнера выполняется на соединении, доказавшем открытость 4028
+    replies = {}
+    on_open = {MINER_PORT: summary_handler(replies)}
+    fingerprinter = Fingerprinter.from_settings(settings_manager, ip)
+    if fingerprinter:
+        on_open.update(fingerprinter.handlers(ports))
+    probes = probe.probe_host(ip, ports, timeout=plan.timeout, sentinel_count=plan.sentinel_ports,
+                              session=session, on_open=on_open)
+    if snmp is not None:
+        # Ответ SNMP ждём не дольше TCP-проб: иначе каждый хост без агента занимал бы воркер на snmp_timeout
+        wait = session.rtt.timeout if session is not None else plan.timeout
+        (open_ports, alive), agent = await asyncio.gather(probes, snmp.query(ip, key=session, timeout=wait))
+    else:
+        (open_ports, alive), agent = await probes, None
+    if macs is not None and macs.is_reachable(ip):
+        alive = True
+    miner_info = miner_info_from_reply(ip, replies['summary']) if 'summary' in replies else None
+    return device_result(ip, open_ports, alive, fingerprinter=fingerprinter, miner_info=miner_info,
+                         agent=agent, mac=macs.get(ip) if macs else None)
 
-async def scan_device(ip: str) -> Optional[Dict]:
-    open_ports = []
-    is_miner = False
-    hashrate = None
-    uptime = None
-    for port in COMMON_PORTS:
-        if await check_port(ip, port):
-            open_ports.append(port)
-            if port == 4028:
-                is_miner = True
+def device_result(ip: str, open_ports: List[int], alive: bool, fingerprinter: Optional[Fingerprinter] = None,
+                  miner_info: Optional[Dict] = None, agent: Optional[Dict] = None,
+                  mac: Optional[str] = None) -> Optional[Dict]:
+    """Словарь устройства по итогам проб (своего движка или nmap); None — хост не найден"""
+    vendor, by_vendor = oui.get_index(settings_manager).lookup(mac) if mac else (None, None)
+    if agent:
+        open_ports = open_ports + [snmp_sweep.SNMP_PORT]
+    is_miner = MINER_PORT in open_ports
     result = {
         'ip': ip,
         'open_ports': open_ports,
         'type': '',
     }
+    if fingerprinter and fingerprinter.results:
+        types = {fingerprinter.port_type(port) for port in fingerprinter.results}
+        result['type'] = ', '.join(sorted(types))
+        result['services'] = fingerprinter.services()
+    if agent:
+        result['type'] = result['type'] or agent['type'] or by_vendor or 'switch'
+        if agent['descr']:
+            result['snmp'] = agent['descr']
     if is_miner:
         result['type'] = 'miner'
-        miner_info = await get_miner_info(ip)
         if miner_info:
             result['hashrate'] = miner_info.get('hashrate')
             result['uptime'] = miner_info.get('uptime')
         else:
             result['hashrate'] = None
             result['uptime'] = None
-    return result if open_ports else None
+    if not open_ports and alive:
+        # Хост ответил RST или подтверждён таблицей соседей, но открытых портов нет
+        result['type'] = by_vendor or 'alive'
+    elif not result['type'] and by_vendor:
+        result['type'] = by_vendor
+    if mac:
+        result['mac'] = mac
+    if vendor:
+        result['vendor'] = vendor
+    return result if open_ports or alive else None
+
+async def _nmap_device(ip: str, open_ports: List[int], alive: bool, agent: Optional[Dict],
+                       mac: Optional[str]) -> Optional[Dict]:
+    # nmap только находит открытый 4028, summary запрашивается отдельным соединением
+    miner_info = await get_miner_info(ip) if MINER_PORT in open_ports else None
+    return device_result(ip, open_ports, alive, miner_info=miner_info, agent=agent, mac=mac)
+
+async def iter_scan_network_devices(network: str, on_progress=None, max_workers: Optional[int] = None,
+                                    use_ping: Optional[bool] = None, refresh: bool = False,
+                                    known: Optional[Iterable[str]] = None,
+                                    profile: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Потоковое сканирование устройств сети: отдаёт устройства по мере обнаружения.
+    profile — профиль скана (по умолчанию из scanning.scan_profile, иначе full)"""
+    plan = scan_profiles.plan_for(settings_manager, 'scan', profile)
+    hosts = scan_engine.targets(network)
+    # Живые по таблице соседей хосты сканируются первыми вместе с известными по прошлому результату
+    macs = await neighbors.discover(hosts, settings_manager, prime=not scan_engine.in_shard(), tag='SCAN')
+    if nmap_backend.selected(settings_manager, network, len(hosts), backend=plan.backend):
+        async for device in nmap_backend.iter_devices(network, hosts, plan.ports, _nmap_device, settings_manager,
+                                                      macs=macs, on_progress=on_progress,
+                                                      use_snmp=plan.snmp_sweep, max_workers=plan.max_workers,
+                                                      tag='SCAN'):
+            yield device
+        return
+    hosts = scan_engine.prioritize(hosts, set(known or ()) | set(macs or ()))
+    hosts = await ping_sweep.prune_hosts(hosts, settings_manager,
+                                         enabled=plan.ping_sweep if use_ping is None else use_ping, tag='SCAN')
+    processes = scan_engine.shard_count(settings_manager, len(hosts))
+    if processes > 1:
+        async for device in scan_engine.iter_sharded(hosts, __name__, 'iter_scan_network_devices', processes,
+                                                     on_progress=on_progress, tag='SCAN',
+                                                     options={'profile': plan.name, 'max_workers': max_workers,
+                                                              'refresh': refresh}):
+            yield device
+        return
+    if max_workers is None:
+        max_workers = plan.max_workers
+    logging.info(f"[SCAN] Всего хостов для сканирования: {len(hosts)}, воркеров: {max_workers}")
+    session = probe.ScanSession.from_settings(settings_manager, 'SCAN', initial_timeout=plan.timeout,
+                                              refresh=refresh)
+    snmp = snmp_sweep.prober(settings_manager, enabled=plan.snmp_sweep)
+    scan_one = functools.partial(scan_device, session=session, snmp=snmp, macs=macs, plan=plan)
+    try:
+        async for device in scan_engine.iter_scan_hosts(hosts, scan_one,
+                                                        max_workers=max_workers, on_progress=on_progress, tag='SCAN',
+                                                        session=session):
+            yield device
+    finally:
+        if snmp is not None:
+            snmp.close()
+    if snmp is not None:
+        logging.info(f"[SCAN] SNMP: ответили {snmp.found} агентов")
+    logging.info(f"[SCAN] {session}")
 
-async def scan_network_devices(network: str, on_progress=None) -> List[Dict]:
-    net = ipaddress.IPv4Network(network, strict=False)
-    hosts = [str(ip) for ip in net.hosts()]
-    logging.info(f"[SCAN] Всего хостов для сканирования: {len(hosts)}")
-    results = []
-    total = len(hosts)
-    start_time = time.time()
-    for idx, ip in enumerate(hosts, 1):
-        logging.info(f"[SCAN] Сканирую {ip} ({idx}/{total}) - найдено устройств: {len(results)}")
-        res = await scan_device(ip)
-        if res:
-            results.append(res)
-            logging.info(f"[SCAN] Найдено устройство: {ip} - {res.get('type', 'unknown')}")
-        if on_progress and (idx % max(1, total // 20) == 0 or idx == total):
-            elapsed = time.time() - start_time
-            logging.info(f"[SCAN] Вызов on_progress: {idx}/{total} - время: {elapsed:.1f}с")
-            await on_progress(idx, total)
-        await asyncio.sleep(0)
-    total_time = time.time() - start_time
-    logging.info(f"[SCAN] Сканирование завершено за {total_time:.1f}с, найдено: {len(results)}")
-    return results 
\ No newline at end of file
+async def scan_network_devices(network: str, on_progress=None, max_workers: Optional[int] = None,
+                               use_ping: Optional[bool] = None, refresh: bool = False,
+                               known: Optional[Iterable[str]] = None, profile: Optional[str] = None) -> List[Dict]:
+    return await scan_engine.collect(iter_scan_network_devices(network, on_progress=on_progress,
+                                                              max_workers=max_workers, use_ping=use_ping,
+                                                              refresh=refresh, known=known, profile=profile))
@@ -0,0 +1,238 @@
+"""
+Бэкенд сканирования через nmap (для очень больших сетей).
+nmap запускается подпроцессом с выводом XML в stdout, вывод разбирается по мере поступления:
+хосты отдаются сразу после того, как nmap закончил с ними, прогресс берётся из <taskprogress>.
+Если nmap не установлен, сканеры используют собственный asyncio-движок.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import shutil
+import time
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram_bot.utils import neighbors, snmp_sweep
+from telegram_bot.utils.scan_results import ip_to_int
+
+# Бэкенды скана (scanning.backend): asyncio — свой движок, nmap — всегда nmap, auto — nmap для больших сетей
+BACKENDS = ('asyncio', 'nmap', 'auto')
+# В режиме auto nmap используется начиная с этого числа хостов
+AUTO_MIN_HOSTS = 4096
+# Аргументы по умолчанию: быстрый шаблон времени, одна повторная попытка
+DEFAULT_ARGS = ['-T4', '--max-retries', '1']
+# Как часто nmap сообщает прогресс
+STATS_INTERVAL = '2s'
+READ_CHUNK = 65536
+
+def available() -> bool:
+    return shutil.which('nmap') is not None
+
+def selected(settings_manager, network, hosts_count: int, backend: Optional[str] = None) -> bool:
+    """Сканировать ли сеть через nmap. Шард (диапазон вместо CIDR-строки) всегда сканирует свой движок."""
+    if backend is None:
+        backend = settings_manager.get_setting('scanning.backend', 'asyncio')
+    if backend == 'asyncio' or not isinstance(network, str):
+        return False
+    if backend == 'auto' and hosts_count < AUTO_MIN_HOSTS:
+        return False
+    if not available():
+        logging.warning(f"[NMAP] Бэкенд {backend} выбран, но nmap не установлен — используется asyncio-движок")
+        return False
+    return True
+
+def build_command(network: str, ports: Iterable[int], args: Optional[List[str]] = None) -> List[str]:
+    return (['nmap', '-n', '-oX', '-', '--stats-every', STATS_INTERVAL, '-p', ','.join(str(p) for p in ports)]
+            + list(DEFAULT_ARGS if args is None else args)
+            + [str(ipaddress.IPv4Network(network, strict=False))])
+
+def _parse_host(elem) -> Optional[Dict]:
+    status = elem.find('status')
+    if status is None or status.get('state') != 'up':
+        return None
+    host = {'ip': None, 'open_ports': []}
+    for address in elem.findall('address'):
+        if address.get('addrtype') == 'ipv4':
+            host['ip'] = address.get('addr')
+        elif address.get('addrtype') == 'mac':
+            host['mac'] = address.get('addr', '').lower()
+    if host['ip'] is None:
+        return None
+    for port in elem.iter('port'):
+        state = port.find('state')
+        if port.get('protocol') == 'tcp' and state is not None and state.get('state') == 'open':
+            host['open_ports'].append(int(port.get('portid')))
+    return host
+
+class NmapXmlStream:
+    """Инкрементальный разбор XML-вывода nmap. feed() принимает очередной кусок stdout
+    и возвращает события: ('host', {'ip', 'open_ports', 'mac'?}) и ('progress', процент).
+    Разобранные элементы хостов очищаются, поэтому память не растёт с размером сети."""
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+
+    def feed(self, data: bytes) -> List[Tuple[str, object]]:
+        self._parser.feed(data)
+        events = []
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = elem
+                continue
+            if elem.tag == 'host':
+                host = _parse_host(elem)
+                if host:
+                    events.append(('host', host))
+                try:
+                    self._root.remove(elem)
+                except ValueError:
+                    elem.clear()
+            elif elem.tag == 'taskprogress':
+                try:
+                    events.append(('progress', float(elem.get('percent', 0))))
+                except ValueError:
+                    pass
+        return events
+
+async def iter_scan(network: str, ports: Iterable[int], total: int, on_progress=None,
+                    args: Optional[List[str]] = None, tag: str = 'NMAP') -> AsyncIterator[Dict]:
+    """Сканирует сеть nmap-ом и отдаёт живые хосты по мере готовности:
+    {'ip', 'open_ports', 'mac'?} (MAC nmap знает только в своей подсети и с правами root)."""
+    command = build_command(network, ports, args)
+    logging.info(f"[{tag}] Сканирование через nmap: {' '.join(command)}")
+    start_time = time.time()
+    process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE)
+    # stderr читается параллельно, чтобы nmap не заблокировался на заполненном канале
+    stderr_task = asyncio.ensure_future(process.stderr.read())
+    stream = NmapXmlStream()
+    found = 0
+    reported = 0
+    try:
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            for kind, payload in stream.feed(chunk):
+                if kind == 'host':
+                    found += 1
+                    yield payload
+                elif on_progress:
+                    done = min(total, int(total * payload / 100))
+                    if done > reported:
+                        reported = done
+                        await on_progress(done, total)
+        stderr = await stderr_task
+        returncode = await process.wait()
+        if returncode != 0:
+            raise RuntimeError(f"nmap завершился с кодом {returncode}: {stderr.decode(errors='ignore').strip()[:500]}")
+        if on_progress and reported < total:
+            await on_progress(total, total)
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if not stderr_task.done():
+            stderr_task.cancel()
+        logging.info(f"[{tag}] nmap: найдено {found} хостов за {time.time() - start_time:.1f}с")
+
+async def _iter_built(hits: AsyncIterator[Dict], build_one: Callable[[Dict], Awaitable[Optional[Dict]]],
+                      workers: int, tag: str = 'NMAP') -> AsyncIterator[Dict]:
+    """Собирает устройства по находкам nmap пулом из workers задач и отдаёт их по готовности.
+    Вывод nmap читается независимо от сборки, поэтому медленная сборка (summary майнера)
+    не задерживает ни nmap, ни остальные хосты."""
+    todo = asyncio.Queue()
+    ready = asyncio.Queue()
+    finished = object()
+
+    async def read():
+        try:
+            async for hit in hits:
+                todo.put_nowait(hit)
+        finally:
+            for _ in range(workers):
+                todo.put_nowait(finished)
+
+    async def work():
+        while True:
+            hit = await todo.get()
+            if hit is finished:
+                return
+            try:
+                device = await build_one(hit)
+            except Exception as e:
+                logging.warning(f"[{tag}] Ошибка сканирования {hit['ip']}: {e}")
+                device = None
+            if device:
+                ready.put_nowait(device)
+
+    async def run():
+        try:
+            await asyncio.gather(read(), *[work() for _ in range(workers)])
+        finally:
+            ready.put_nowait(finished)
+
+    runner = asyncio.ensure_future(run())
+    try:
+        while True:
+            device = await ready.get()
+            if device is finished:
+                break
+            yield device
+        # Ошибка nmap (ненулевой код выхода) пробрасывается вызывающему
+        await runner
+    finally:
+        if not runner.done():
+            runner.cancel()
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
+
+async def iter_devices(network: str, hosts, ports: Iterable[int],
+                       build: Callable[..., Awaitable[Optional[Dict]]], settings_manager,
+                       macs: Optional[neighbors.NeighborTable] = None, on_progress=None,
+                       use_snmp: Optional[bool] = None, max_workers: int = 64,
+                       tag: str = 'NMAP') -> AsyncIterator[Dict]:
+    """Скан сети через nmap в формате устройств сканера.
+    build(ip, open_ports, alive, agent, mac) собирает словарь устройства так же, как свой движок;
+    сборки идут параллельно, не больше max_workers одновременно.
+    SNMP-этап выполняется UDP-свипом параллельно nmap, TCP 161 тогда nmap не проверяет;
+    SNMP-агенты и подтверждённо доступные хосты из таблицы соседей (macs.confirmed),
+    которых nmap не счёл живыми, отдаются в конце."""
+    if use_snmp is None:
+        use_snmp = settings_manager.get_setting('scanning.snmp_sweep', True)
+    sweep = None
+    if use_snmp:
+        sweep = asyncio.ensure_future(snmp_sweep.discover(hosts, settings_manager, enabled=True, tag=tag))
+        ports = [port for port in ports if port != snmp_sweep.SNMP_PORT]
+    macs = macs if macs is not None else neighbors.NeighborTable()
+    args = settings_manager.get_setting('scanning.nmap_args', DEFAULT_ARGS)
+    seen = set()
+
+    async def agents() -> Dict[str, Dict]:
+        # Свип рассылает запросы быстрее, чем nmap находит хосты: его результат ждут один раз
+        return (await sweep or {}) if sweep is not None else {}
+
+    async def build_hit(host: Dict) -> Optional[Dict]:
+        ip = host['ip']
+        seen.add(ip)
+        snmp = await agents()
+        return await build(ip, host['open_ports'], True, snmp.get(ip), host.get('mac') or macs.get(ip))
+
+    hits = iter_scan(network, ports, len(hosts), on_progress=on_progress, args=args, tag=tag)
+    try:
+        async for device in _iter_built(hits, build_hit, max(1, max_workers), tag=tag):
+            yield device
+        snmp = await agents()
+    finally:
+        if sweep is not None and not sweep.done():
+            sweep.cancel()
+    for ip in sorted((set(snmp) | macs.confirmed) - seen, key=ip_to_int):
+        if ip in hosts:
+            device = await build(ip, [], macs.is_reachable(ip), snmp.get(ip), macs.get(ip))
+            if device:
+                yield device
@@ -3,9 +3,8 @@ import logging
 from typing import List, Dict, Optional
 from enum import Enum
 from datetime import datetime
-from telegram_bot.utils.settings_manager import SettingsManager
+from telegram_bot.utils.settings_manager import get_settings_manager
 from telegram_bot.bot.translations import translate
-import os
 
 class NotificationLevel(Enum):
     INFO = "info"
@@ -20,7 +19,7 @@ class NotificationType(Enum):
     SYSTEM_ALERT = "system_alert"
     DAILY_REPORT = "daily_report"
 
-settings_manager = SettingsManager(base_dir=os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data')))
+settings_manager = get_settings_manager()
 
 class NotificationManager:
     def __init__(self, bot, chat_id):
@@ -0,0 +1,114 @@
+"""
+Определение производителя по MAC-адресу (OUI — первые 3 байта) и тип устройства по производителю.
+Индекс загружается лениво при первом поиске: префиксы лежат в отсортированном array('I'),
+поиск — бинарный (bisect), названия производителей хранятся один раз.
+"""
+
+import bisect
+import logging
+import os
+import re
+from array import array
+from typing import List, Optional, Tuple
+
+BUNDLED_PATH = os.path.join(os.path.dirname(__file__), 'oui.txt')
+
+# Тип устройства по подстроке в названии производителя (в нижнем регистре)
+VENDOR_TYPES = [
+    ('bitmain', 'miner'),
+    ('canaan', 'miner'),
+    ('microbt', 'miner'),
+    ('routerboard', 'router'),
+    ('mikrotik', 'router'),
+    ('ubiquiti', 'router'),
+    ('tp-link', 'router'),
+    ('zyxel', 'router'),
+    ('keenetic', 'router'),
+    ('juniper', 'router'),
+    ('cisco', 'switch'),
+    ('netgear', 'switch'),
+    ('d-link', 'switch'),
+    ('hikvision', 'camera'),
+    ('dahua', 'camera'),
+    ('axis communications', 'camera'),
+]
+
+# Собственный формат (AABBCC<TAB>производитель), oui.txt IEEE (AA-BB-CC   (hex)  производитель)
+# и oui.csv IEEE (MA-L,AABBCC,производитель,адрес)
+_LINE_RE = re.compile(r'^(?:MA-L,)?([0-9A-Fa-f]{2})[-:]?([0-9A-Fa-f]{2})[-:]?([0-9A-Fa-f]{2})'
+                      r'(?:\s+\(hex\))?[\s,]+(?:"([^"]+)"|(?=[^\s(])([^",\t]+))')
+
+def vendor_type(vendor: str) -> Optional[str]:
+    """Тип устройства по названию производителя (None — не определён)"""
+    lowered = vendor.lower()
+    for needle, dtype in VENDOR_TYPES:
+        if needle in lowered:
+            return dtype
+    return None
+
+class OuiIndex:
+    """Индекс OUI -> производитель. Файл читается при первом поиске."""
+
+    def __init__(self, path: str = BUNDLED_PATH):
+        self.path = path
+        self._prefixes = None
+        self._vendor_ids = None
+        self._vendors: List[str] = []
+
+    def _load(self):
+        rows = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    if line.startswith('#'):
+                        continue
+                    match = _LINE_RE.match(line)
+                    if match:
+                        rows[int(''.join(match.group(1, 2, 3)), 16)] = (match.group(4) or match.group(5)).strip()
+        except OSError as e:
+            logging.warning(f"[OUI] Не удалось прочитать индекс производителей {self.path}: {e}")
+        vendor_index = {}
+        self._prefixes = array('I')
+        self._vendor_ids = array('H')
+        for prefix in sorted(rows):
+            vendor = rows[prefix]
+            idx = vendor_index.get(vendor)
+            if idx is None:
+                idx = vendor_index[vendor] = len(self._vendors)
+                self._vendors.append(vendor)
+            self._prefixes.append(prefix)
+            self._vendor_ids.append(idx)
+        logging.info(f"[OUI] Загружено префиксов: {len(self._prefixes)}, производителей: {len(self._vendors)}")
+
+    def vendor(self, mac: str) -> Optional[str]:
+        """Производитель по MAC ('aa:bb:cc:dd:ee:ff' или 'AA-BB-CC-...'), None — не найден"""
+        digits = re.sub(r'[^0-9A-Fa-f]', '', mac or '')
+        if len(digits) < 6:
+            return None
+        if self._prefixes is None:
+            self._load()
+        prefix = int(digits[:6], 16)
+        pos = bisect.bisect_left(self._prefixes, prefix)
+        if pos < len(self._prefixes) and self._prefixes[pos] == prefix:
+            return self._vendors[self._vendor_ids[pos]]
+        return None
+
+    def lookup(self, mac: str) -> Tuple[Optional[str], Optional[str]]:
+        """(производитель, тип устройства) по MAC"""
+        vendor = self.vendor(mac)
+        return vendor, vendor_type(vendor) if vendor else None
+
+    def __len__(self):
+        if self._prefixes is None:
+            self._load()
+        return len(self._prefixes)
+
+_indexes = {}
+
+def get_index(settings_manager=None) -> OuiIndex:
+    """Индекс из scanning.oui_file (полный реестр IEEE), по умолчанию — встроенный"""
+    path = (settings_manager.get_setting('scanning.oui_file', '') if settings_manager else '') or BUNDLED_PATH
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = OuiIndex(path)
+    return index
@@ -0,0 +1,133 @@
+"""
+Предварительный ICMP-свип: отсеивает неотвечающие хосты до TCP-проб
+"""
+
+import asyncio
+import ipaddress
+import itertools
+import logging
+import os
+import socket
+import struct
+from typing import List, Optional, Iterable, Set
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# Сколько echo-запросов отправляется за один проход и пауза между проходами
+DEFAULT_BATCH_SIZE = 256
+BATCH_INTERVAL = 0.02
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def _build_echo(ident: int, seq: int) -> bytes:
+    payload = b'network_monitor_bot'
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+def _open_icmp_socket():
+    """Открывает ICMP-сокет: сначала непривилегированный (DGRAM), затем RAW.
+    Возвращает (sock, is_raw) или (None, False), если ICMP недоступен."""
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            sock.setblocking(False)
+            return sock, sock_type == socket.SOCK_RAW
+        except OSError:
+            continue
+    return None, False
+
+def parse_networks(entries: Iterable) -> List[ipaddress.IPv4Network]:
+    """Преобразует список IP/CIDR из настроек в сети, некорректные записи пропускаются"""
+    networks = []
+    for entry in entries or []:
+        try:
+            networks.append(ipaddress.IPv4Network(str(entry).strip(), strict=False))
+        except ValueError:
+            logging.warning(f"[PING] Некорректная запись ping_blocked: {entry}")
+    return networks
+
+async def ping_sweep(hosts: Iterable[str], timeout: float = 1.0, batch_size: int = DEFAULT_BATCH_SIZE) -> Optional[Set[str]]:
+    """Рассылает echo-запросы пачками с одного сокета и возвращает множество ответивших хостов.
+    Хосты читаются лениво, в памяти держатся только ответившие.
+    Возвращает None, если ICMP-сокет открыть нельзя (нет прав на raw-сокеты)."""
+    sock, is_raw = _open_icmp_socket()
+    if sock is None:
+        logging.warning("[PING] ICMP недоступен (нет прав на raw-сокеты), пинг-свип пропущен")
+        return None
+    loop = asyncio.get_running_loop()
+    ident = os.getpid() & 0xffff
+    alive = set()
+
+    def on_readable():
+        while True:
+            try:
+                data, addr = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if is_raw:
+                # RAW-сокет отдаёт пакет вместе с IP-заголовком
+                data = data[(data[0] & 0x0f) * 4:]
+            if len(data) < 8 or data[0] != ICMP_ECHO_REPLY:
+                continue
+            # Для DGRAM-сокета ядро само подставляет и фильтрует идентификатор
+            if is_raw and struct.unpack('!H', data[4:6])[0] != ident:
+                continue
+            # Посторонние адреса отсеет вызывающий код при сопоставлении со своим списком
+            alive.add(addr[0])
+
+    loop.add_reader(sock.fileno(), on_readable)
+    try:
+        targets = iter(hosts)
+        seq = 0
+        while True:
+            batch = list(itertools.islice(targets, batch_size))
+            if not batch:
+                break
+            for ip in batch:
+                seq += 1
+                packet = _build_echo(ident, seq & 0xffff)
+                try:
+                    sock.sendto(packet, (ip, 0))
+                except BlockingIOError:
+                    await asyncio.sleep(BATCH_INTERVAL)
+                    try:
+                        sock.sendto(packet, (ip, 0))
+                    except OSError as e:
+                        logging.debug(f"[PING] {ip}: не удалось отправить echo ({e})")
+                except OSError as e:
+                    logging.debug(f"[PING] {ip}: не удалось отправить echo ({e})")
+            await asyncio.sleep(BATCH_INTERVAL)
+        await asyncio.sleep(timeout)
+    finally:
+        loop.remove_reader(sock.fileno())
+        sock.close()
+    return alive
+
+async def prune_hosts(hosts: Iterable[str], settings_manager, enabled: Optional[bool] = None,
+                      tag: str = 'PING') -> Iterable[str]:
+    """Оставляет только ответившие на ping хосты и хосты из scanning.ping_blocked.
+    hosts обходится дважды, поэтому нужен список или повторно обходимый диапазон (HostRange).
+    Если свип выключен или ICMP недоступен — возвращает исходные hosts."""
+    if enabled is None:
+        enabled = settings_manager.get_setting('scanning.ping_sweep', False)
+    if not enabled or not len(hosts):
+        return hosts
+    timeout = settings_manager.get_setting('scanning.ping_timeout', 1.0)
+    alive = await ping_sweep(hosts, timeout=timeout)
+    if alive is None:
+        return hosts
+    blocked = parse_networks(settings_manager.get_setting('scanning.ping_blocked', []))
+    result = [ip for ip in hosts
+              if ip in alive or any(ipaddress.IPv4Address(ip) in net for net in blocked)]
+    logging.info(f"[{tag}] Пинг-свип: ответили {len(alive)} из {len(hosts)}, к TCP-сканированию: {len(result)}")
+    return result
@@ -0,0 +1,532 @@
+"""
+Асинхронный движок TCP-проб, общий для всех сканеров
+"""
+
+import asyncio
+import errno
+import ipaddress
+import socket
+import logging
+import struct
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Iterable, Tuple, Optional, Hashable, Callable, Awaitable
+
+class ProbeStats:
+    """Счётчики проб движка (общие для всех сканеров)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает все счётчики"""
+        self.attempts = 0
+        self.open = 0
+        self.refused = 0
+        self.timeouts = 0
+        self.unreachable = 0
+        self.errors = 0
+        self.resource_errors = 0
+        self.hosts_skipped = 0
+        self.cache_hits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Возвращает счётчики в виде словаря"""
+        return {
+            'attempts': self.attempts,
+            'open': self.open,
+            'refused': self.refused,
+            'timeouts': self.timeouts,
+            'unreachable': self.unreachable,
+            'errors': self.errors,
+            'resource_errors': self.resource_errors,
+            'hosts_skipped': self.hosts_skipped,
+            'cache_hits': self.cache_hits,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+        }
+
+# Результаты пробы порта
+OPEN = 'open'
+CLOSED = 'closed'            # RST: порт закрыт, но хост жив
+NO_RESPONSE = 'no_response'  # таймаут или хост недоступен
+ERROR = 'error'              # локальная ошибка, о хосте ничего не известно
+
+_UNREACHABLE_ERRNOS = {errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN}
+# Нехватка локальных ресурсов: дескрипторов, эфемерных портов, буферов
+_RESOURCE_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.EADDRNOTAVAIL, errno.ENOBUFS}
+
+# Сколько портов одного хоста проверяется одновременно
+PER_HOST_CONCURRENCY = 16
+# Сколько первых портов пробуется до решения, жив ли хост (0 — досрочного отказа нет).
+# Сканеры берут значение из профиля скана: хост, у которого отвечают только дальние порты
+# (камера на 554, майнер на 4028), при досрочном отказе теряется
+SENTINEL_PORTS = 3
+
+# Границы адаптивного таймаута соединения, сек. Нижняя граница с запасом на устройства Wi-Fi
+# в энергосбережении (отвечают за 100-300 мс), даже если первые ответы пришли за доли миллисекунды
+MIN_TIMEOUT = 0.5
+MAX_TIMEOUT = 5.0
+
+# Запас дескрипторов под бота, логи и БД и запас эфемерных портов под остальные соединения хоста
+FD_RESERVE = 128
+PORT_RESERVE = 1024
+LOCAL_PORT_RANGE_PATH = '/proc/sys/net/ipv4/ip_local_port_range'
+
+# SO_LINGER с нулевым таймаутом: close() шлёт RST и сразу освобождает порт (без TIME_WAIT)
+_LINGER_ABORT = struct.pack('ii', 1, 0)
+
+# Обработчик «первого запроса»: получает сокет, доказавший открытость порта, и работает с ним сам.
+# Сокет закрывает движок после возврата из обработчика.
+PayloadHandler = Callable[[socket.socket], Awaitable[None]]
+
+stats = ProbeStats()
+
+def _raise_nofile_limit() -> Optional[int]:
+    """Поднимает мягкий RLIMIT_NOFILE до жёсткого и возвращает итоговый лимит (None — неизвестен)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard != resource.RLIM_INFINITY and soft < hard:
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+                soft = hard
+            except (ValueError, OSError):
+                pass
+        return None if soft == resource.RLIM_INFINITY else soft
+    except (ValueError, OSError):
+        return None
+
+def _local_port_span() -> Optional[int]:
+    """Размер диапазона эфемерных портов из ip_local_port_range (None — неизвестен)"""
+    try:
+        with open(LOCAL_PORT_RANGE_PATH, 'r') as f:
+            low, high = (int(part) for part in f.read().split()[:2])
+        return high - low + 1
+    except (OSError, ValueError):
+        return None
+
+_inflight_budget = None
+
+def inflight_budget() -> int:
+    """Потолок одновременных проб по ресурсам ОС: дескрипторы и эфемерные порты минус запас.
+    Считается один раз при первом обращении."""
+    global _inflight_budget
+    if _inflight_budget is None:
+        nofile = _raise_nofile_limit()
+        port_span = _local_port_span()
+        limits = []
+        if nofile is not None:
+            limits.append(nofile - FD_RESERVE)
+        if port_span is not None:
+            limits.append(port_span - PORT_RESERVE)
+        _inflight_budget = max(16, min(limits)) if limits else DEFAULT_MAX_IN_FLIGHT
+        logging.info(f"[PROBE] Бюджет одновременных проб: {_inflight_budget} "
+                     f"(RLIMIT_NOFILE={nofile}, эфемерных портов={port_span})")
+    return _inflight_budget
+
+class RttEstimator:
+    """Оценка RTT в рамках одного скана (SRTT/RTTVAR, как RTO в TCP) и адаптивный таймаут"""
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, initial_timeout: float = 1.0, min_timeout: float = MIN_TIMEOUT,
+                 max_timeout: float = MAX_TIMEOUT):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max(max_timeout, min_timeout)
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+
+    @classmethod
+    def from_settings(cls, settings_manager, initial_timeout: float) -> 'RttEstimator':
+        """Создаёт оценщик: нижняя граница таймаута — scanning.min_timeout,
+        верхняя — scanning.default_timeout"""
+        min_timeout = settings_manager.get_setting('scanning.min_timeout', MIN_TIMEOUT)
+        max_timeout = settings_manager.get_setting('scanning.default_timeout', MAX_TIMEOUT)
+        return cls(initial_timeout=initial_timeout, min_timeout=min_timeout, max_timeout=max_timeout)
+
+    def observe(self, rtt: float):
+        """Учитывает замер RTT (ответ SYN/ACK или RST)"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.samples += 1
+
+    @property
+    def timeout(self) -> float:
+        """Текущий таймаут соединения: до первых ответов — начальный, затем SRTT + K*RTTVAR"""
+        if self.srtt is None:
+            value = self.initial_timeout
+        else:
+            value = self.srtt + self.K * self.rttvar
+        return min(max(value, self.min_timeout), self.max_timeout)
+
+    def __repr__(self):
+        if self.srtt is None:
+            return f"RttEstimator(нет замеров, timeout={self.timeout:.3f}s)"
+        return (f"RttEstimator(srtt={self.srtt * 1000:.1f}ms, rttvar={self.rttvar * 1000:.1f}ms, "
+                f"samples={self.samples}, timeout={self.timeout:.3f}s)")
+
+# Глобальные лимиты проб по умолчанию (scanning.rate_limit)
+DEFAULT_PROBES_PER_SECOND = 2000
+DEFAULT_MAX_IN_FLIGHT = 1024
+
+class ProbeLimiter:
+    """Общий для процесса лимит проб: token bucket (проб/сек) и потолок одновременных соединений.
+    Ожидающие сканы обслуживаются по кругу, поэтому каждый получает равную долю лимита."""
+
+    def __init__(self, probes_per_second: float = DEFAULT_PROBES_PER_SECOND,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.in_flight = 0
+        # Доля процесса в общих лимитах: при шардировании по процессам каждый получает 1/N
+        self.share = 1.0
+        self._queues = OrderedDict()
+        self._timer = None
+        self._timer_loop = None
+        self.configure(probes_per_second, max_in_flight)
+        self._tokens = self._burst
+        self._last_refill = time.monotonic()
+
+    def configure(self, probes_per_second: float, max_in_flight: int):
+        """Меняет лимиты на лету; probes_per_second <= 0 — без ограничения скорости"""
+        self.rate = float(probes_per_second or 0) * self.share
+        # Окно одновременных проб считается при первом обращении: бюджет ресурсов ОС (и подъём
+        # RLIMIT_NOFILE) не нужен процессу, который только импортировал модуль
+        self._requested_in_flight = max_in_flight
+        self._max_in_flight = None
+        # Запас токенов — не больше 1/10 секундного лимита, чтобы не было залпов
+        self._burst = max(1.0, self.rate / 10) if self.rate > 0 else 0.0
+
+    @property
+    def max_in_flight(self) -> int:
+        """Окно одновременных проб: не больше бюджета дескрипторов и эфемерных портов"""
+        if self._max_in_flight is None:
+            self._max_in_flight = max(1, int(min(self._requested_in_flight, inflight_budget()) * self.share))
+        return self._max_in_flight
+
+    def configure_from_settings(self, settings_manager):
+        """Подхватывает лимиты из scanning.rate_limit"""
+        limits = settings_manager.get_setting('scanning.rate_limit', {}) or {}
+        self.configure(limits.get('probes_per_second', DEFAULT_PROBES_PER_SECOND),
+                       limits.get('max_in_flight', DEFAULT_MAX_IN_FLIGHT))
+
+    def waiting(self) -> int:
+        """Число проб, ожидающих разрешения"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _has_token(self) -> bool:
+        return self.rate <= 0 or self._tokens >= 1
+
+    def _take(self):
+        if self.rate > 0:
+            self._tokens -= 1
+        self.in_flight += 1
+
+    async def acquire(self, key: Hashable = None):
+        """Ждёт разрешения на одну пробу; key — идентификатор скана для справедливой очереди"""
+        self._refill()
+        if not self._queues and self.in_flight < self.max_in_flight and self._has_token():
+            self._take()
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(fut)
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                queue = self._queues.get(key)
+                if queue is not None and fut in queue:
+                    queue.remove(fut)
+                    if not queue:
+                        del self._queues[key]
+            raise
+
+    def release(self):
+        """Освобождает слот после завершения пробы"""
+        self.in_flight = max(0, self.in_flight - 1)
+        self._dispatch()
+
+    def _dispatch(self):
+        self._refill()
+        while self._queues and self.in_flight < self.max_in_flight:
+            if not self._has_token():
+                self._schedule((1 - self._tokens) / self.rate)
+                return
+            # Берём очередного ожидающего из первого скана и переносим скан в конец круга
+            key, queue = self._queues.popitem(last=False)
+            fut = queue.popleft()
+            if queue:
+                self._queues[key] = queue
+            if fut.done():
+                continue
+            self._take()
+            fut.set_result(None)
+
+    def _schedule(self, delay: float):
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            return
+        self._timer_loop = loop
+        self._timer = loop.call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+limiter = ProbeLimiter()
+
+# Время жизни отрицательных результатов по умолчанию (scanning.negative_cache_ttl), сек
+DEFAULT_NEGATIVE_TTL = 120
+# Потолок записей кэша, чтобы скан /12 не съел память
+NEGATIVE_CACHE_MAX = 262144
+
+class NegativeCache:
+    """Кэш отрицательных исходов проб (NO_RESPONSE и CLOSED) по ip:port с коротким TTL.
+    Общий для всех сканеров процесса: повторный скан той же сети в пределах TTL
+    не ждёт таймауты на заведомо пустых адресах. NO_RESPONSE хранится вместе с таймаутом пробы:
+    тишина за 0.5с быстрого скана не заменяет пробу полного скана с таймаутом 1.5с."""
+
+    def __init__(self, ttl: float = DEFAULT_NEGATIVE_TTL, max_entries: int = NEGATIVE_CACHE_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def get(self, ip: str, port: int, timeout: Optional[float] = None) -> Optional[str]:
+        """Закэшированный исход или None. NO_RESPONSE отдаётся, только если текущий timeout
+        не больше таймаута закэшированной пробы; CLOSED (RST) от таймаута не зависит."""
+        entry = self._entries.get((ip, port))
+        if entry is None:
+            return None
+        state, expires, probe_timeout = entry
+        if expires < time.monotonic():
+            del self._entries[(ip, port)]
+            return None
+        if state == NO_RESPONSE and timeout is not None and probe_timeout is not None and timeout > probe_timeout:
+            return None
+        return state
+
+    def put(self, ip: str, port: int, state: str, timeout: Optional[float] = None):
+        """timeout — таймаут пробы, давшей исход (для NO_RESPONSE)"""
+        if self.ttl <= 0:
+            return
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+        # Переставляем ключ в конец, чтобы порядок словаря оставался порядком истечения
+        self._entries.pop((ip, port), None)
+        self._entries[(ip, port)] = (state, time.monotonic() + self.ttl, timeout)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = []
+        for key, (_, expires, _) in self._entries.items():
+            if expires >= now:
+                break
+            expired.append(key)
+        for key in expired:
+            del self._entries[key]
+        # Если истёкших нет — выбрасываем самую старую четверть
+        if len(self._entries) >= self.max_entries:
+            for key in list(self._entries)[:self.max_entries // 4]:
+                del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+negative_cache = NegativeCache()
+
+class ScanSession:
+    """Состояние одного скана: оценка RTT и доля в глобальном лимите проб"""
+
+    def __init__(self, name: str, rtt: Optional[RttEstimator] = None, refresh: bool = False):
+        self.name = name
+        self.rtt = rtt or RttEstimator()
+        # refresh=True — не доверять кэшу отрицательных результатов (принудительное обновление)
+        self.refresh = refresh
+        # Регулятор параллельности (scan_engine.AimdController), подключается движком скана
+        self.controller = None
+        # Пробы, не выполненные из-за нехватки дескрипторов/эфемерных портов
+        self.resource_errors = 0
+
+    def record(self, state: str, resource_error: bool = False):
+        """Учитывает исход пробы и передаёт его регулятору параллельности"""
+        if resource_error:
+            self.resource_errors += 1
+        if self.controller is not None:
+            self.controller.record(state, resource_error)
+
+    @classmethod
+    def from_settings(cls, settings_manager, name: str, initial_timeout: float,
+                      refresh: bool = False) -> 'ScanSession':
+        """Создаёт сессию скана и обновляет глобальные лимиты и TTL кэша из настроек"""
+        limiter.configure_from_settings(settings_manager)
+        negative_cache.ttl = settings_manager.get_setting('scanning.negative_cache_ttl', DEFAULT_NEGATIVE_TTL)
+        return cls(name, RttEstimator.from_settings(settings_manager, initial_timeout), refresh=refresh)
+
+    def __repr__(self):
+        return f"ScanSession({self.name}, {self.rtt}, нехватка ресурсов: {self.resource_errors})"
+
+async def _resolve(ip: str, port: int):
+    """Возвращает (family, sockaddr); для IP-литералов без обращения к резолверу"""
+    try:
+        addr = ipaddress.ip_address(ip)
+        family = socket.AF_INET6 if addr.version == 6 else socket.AF_INET
+        return family, (ip, port)
+    except ValueError:
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(ip, port, type=socket.SOCK_STREAM)
+        family, _, _, _, sockaddr = infos[0]
+        return family, sockaddr
+
+async def probe_port(ip: str, port: int, timeout: float = 1.0, session: Optional[ScanSession] = None,
+                     on_open: Optional[PayloadHandler] = None) -> str:
+    """Неблокирующая проба TCP-порта без пула потоков в рамках глобального лимита проб.
+    Если передана сессия, таймаут берётся из её оценщика RTT, а время ответа учитывается в нём.
+    Если порт открыт и передан on_open, обработчик работает на том же соединении (без второго handshake).
+    Пробы сканов (с сессией) пользуются кэшем отрицательных результатов, если сессия не refresh.
+    Возвращает OPEN, CLOSED (RST — хост жив), NO_RESPONSE (таймаут/недоступен) или ERROR."""
+    if session is not None:
+        # Кэш сравнивает таймауты, поэтому эффективный таймаут пробы известен до обращения к нему
+        timeout = session.rtt.timeout
+    if session is not None and not session.refresh:
+        cached = negative_cache.get(ip, port, timeout)
+        if cached is not None:
+            stats.cache_hits += 1
+            return cached
+    await limiter.acquire(session)
+    try:
+        state, resource_error = await _probe_port(ip, port, timeout, session, on_open)
+    finally:
+        limiter.release()
+    if session is not None:
+        session.record(state, resource_error)
+        if state in (NO_RESPONSE, CLOSED):
+            negative_cache.put(ip, port, state, timeout)
+    return state
+
+async def _probe_port(ip: str, port: int, timeout: float, session: Optional[ScanSession],
+                      on_open: Optional[PayloadHandler] = None) -> Tuple[str, bool]:
+    """Возвращает (состояние порта, признак нехватки локальных ресурсов)"""
+    loop = asyncio.get_running_loop()
+    rtt = session.rtt if session is not None else None
+    if rtt is not None:
+        timeout = rtt.timeout
+    stats.attempts += 1
+    stats.in_flight += 1
+    stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+    sock = None
+    try:
+        family, sockaddr = await _resolve(ip, port)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_ABORT)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, sockaddr), timeout=timeout)
+            state = OPEN
+            stats.open += 1
+        except ConnectionRefusedError:
+            state = CLOSED
+            stats.refused += 1
+        # И SYN/ACK, и RST — полноценный замер времени ответа хоста
+        if rtt is not None:
+            rtt.observe(time.monotonic() - started)
+        if state == OPEN and on_open is not None:
+            try:
+                await on_open(sock)
+            except Exception as e:
+                # Сбой обработчика не меняет результат пробы: порт открыт
+                logging.debug(f"[PROBE] {ip}:{port}: ошибка обработчика открытого порта ({e})")
+        return state, False
+    except asyncio.TimeoutError:
+        stats.timeouts += 1
+        return NO_RESPONSE, False
+    except OSError as e:
+        if e.errno in _UNREACHABLE_ERRNOS:
+            stats.unreachable += 1
+            return NO_RESPONSE, False
+        if e.errno in _RESOURCE_ERRNOS:
+            # Нехватка дескрипторов/портов — это не «порт закрыт», о хосте ничего не известно
+            stats.resource_errors += 1
+            logging.debug(f"[PROBE] {ip}:{port}: нехватка локальных ресурсов ({e})")
+            return ERROR, True
+        stats.errors += 1
+        logging.debug(f"[PROBE] {ip}:{port}: ошибка соединения ({e})")
+        return ERROR, False
+    finally:
+        stats.in_flight -= 1
+        if sock is not None:
+            sock.close()
+
+async def check_port(ip: str, port: int, timeout: float = 1.0, session: Optional[ScanSession] = None,
+                     on_open: Optional[PayloadHandler] = None) -> bool:
+    """Проверяет, открыт ли TCP-порт"""
+    return await probe_port(ip, port, timeout, session=session, on_open=on_open) == OPEN
+
+async def _probe_ports(ip: str, ports: List[int], timeout: float, sem: asyncio.Semaphore,
+                       session: Optional[ScanSession] = None,
+                       on_open: Optional[Dict[int, PayloadHandler]] = None) -> List[str]:
+    handlers = on_open or {}
+
+    async def probe_one(port):
+        async with sem:
+            return await probe_port(ip, port, timeout, session=session, on_open=handlers.get(port))
+
+    return await asyncio.gather(*[probe_one(port) for port in ports])
+
+async def check_ports(ip: str, ports: Iterable[int], timeout: float = 1.0,
+                      max_concurrent: int = PER_HOST_CONCURRENCY,
+                      session: Optional[ScanSession] = None,
+                      on_open: Optional[Dict[int, PayloadHandler]] = None) -> List[int]:
+    """Параллельно проверяет порты хоста, возвращает открытые в исходном порядке портов.
+    on_open — обработчики по номеру порта, вызываются на соединении, доказавшем открытость."""
+    ports = list(ports)
+    states = await _probe_ports(ip, ports, timeout, asyncio.Semaphore(max_concurrent), session, on_open)
+    return [port for port, state in zip(ports, states) if state == OPEN]
+
+async def probe_host(ip: str, ports: Iterable[int], timeout: float = 1.0,
+                     max_concurrent: int = PER_HOST_CONCURRENCY,
+                     sentinel_count: int = SENTINEL_PORTS,
+                     session: Optional[ScanSession] = None,
+                     on_open: Optional[Dict[int, PayloadHandler]] = None) -> Tuple[List[int], bool]:
+    """Проверяет порты хоста с досрочным отказом от «мёртвых» хостов.
+    Сначала пробуются первые sentinel_count портов: если ни один не ответил (ни SYN/ACK, ни RST),
+    хост считается недоступным и остальные порты не проверяются. sentinel_count=0 — все порты сразу.
+    on_open — обработчики по номеру порта, вызываются на соединении, доказавшем открытость.
+    Возвращает (открытые порты в исходном порядке, признак «хост жив»)."""
+    ports = list(ports)
+    sem = asyncio.Semaphore(max_concurrent)
+    sentinel_count = max(0, sentinel_count)
+    head, tail = ports[:sentinel_count], ports[sentinel_count:]
+    head_states = await _probe_ports(ip, head, timeout, sem, session, on_open) if head else []
+    if head and tail and all(state == NO_RESPONSE for state in head_states):
+        stats.hosts_skipped += 1
+        return [], False
+    tail_states = await _probe_ports(ip, tail, timeout, sem, session, on_open) if tail else []
+    states = head_states + tail_states
+    open_ports = [port for port, state in zip(ports, states) if state == OPEN]
+    alive = any(state in (OPEN, CLOSED) for state in states)
+    return open_ports, alive
@@ -0,0 +1,462 @@
+"""
+Конвейер параллельного сканирования хостов с ограничением числа воркеров
+"""
+
+import asyncio
+import importlib
+import ipaddress
+import logging
+import os
+import pickle
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from typing import List, Dict, Optional, Callable, Awaitable, AsyncIterator, Iterable, Iterator
+from telegram_bot.utils import probe
+from telegram_bot.utils.scan_results import ip_to_int
+
+# Число воркеров по умолчанию (потолок параллельности), если не задано в настройках
+DEFAULT_MAX_WORKERS = 256
+
+class HostRange:
+    """Ленивый диапазон адресов хостов IPv4-сети (как net.hosts()).
+    Адреса не хранятся в памяти: длина известна сразу, обход можно повторять."""
+
+    __slots__ = ('first', 'last')
+
+    def __init__(self, network):
+        net = ipaddress.IPv4Network(network, strict=False)
+        first = int(net.network_address)
+        last = int(net.broadcast_address)
+        if net.prefixlen < 31:
+            first, last = first + 1, last - 1
+        self.first = first
+        self.last = last
+
+    @classmethod
+    def from_bounds(cls, first: int, last: int) -> 'HostRange':
+        hosts = cls.__new__(cls)
+        hosts.first = first
+        hosts.last = last
+        return hosts
+
+    def split(self, parts: int) -> List['HostRange']:
+        """Делит диапазон на parts непрерывных частей почти равного размера"""
+        size = len(self)
+        parts = max(1, min(parts, size))
+        step, extra = divmod(size, parts)
+        result = []
+        first = self.first
+        for i in range(parts):
+            count = step + (1 if i < extra else 0)
+            result.append(HostRange.from_bounds(first, first + count - 1))
+            first += count
+        return result
+
+    def __len__(self):
+        return max(0, self.last - self.first + 1)
+
+    def __contains__(self, ip: str) -> bool:
+        try:
+            return self.first <= ip_to_int(ip) <= self.last
+        except OSError:
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        for value in range(self.first, self.last + 1):
+            yield socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+    def __repr__(self):
+        return f"HostRange({socket.inet_ntoa(self.first.to_bytes(4, 'big'))}, {len(self)} хостов)"
+
+class PrioritizedHosts:
+    """Цели инкрементального скана: сначала известные по прошлому результату хосты диапазона,
+    затем остальные адреса. Воркеры iter_scan_hosts забирают адреса по порядку, поэтому
+    изменения среди известных хостов видны в начале скана, а пустое пространство идёт следом."""
+
+    __slots__ = ('known', 'rest')
+
+    def __init__(self, known: Iterable[int], rest: HostRange):
+        self.rest = rest
+        self.known = sorted({value for value in known if rest.first <= value <= rest.last})
+
+    def split(self, parts: int) -> List['PrioritizedHosts']:
+        """Делит на части по диапазону, у каждой части — свои известные хосты впереди"""
+        return [PrioritizedHosts(self.known, shard) for shard in self.rest.split(parts)]
+
+    def __len__(self):
+        return len(self.rest)
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self.rest
+
+    def __iter__(self) -> Iterator[str]:
+        for value in self.known:
+            yield socket.inet_ntoa(value.to_bytes(4, 'big'))
+        known = set(self.known)
+        for value in range(self.rest.first, self.rest.last + 1):
+            if value not in known:
+                yield socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+    def __repr__(self):
+        return f"PrioritizedHosts({self.rest!r}, известных: {len(self.known)})"
+
+def targets(network) -> Iterable[str]:
+    """Цели скана: CIDR-строка или сеть превращается в HostRange, готовый диапазон
+    или список адресов (шард от iter_sharded) возвращается как есть"""
+    if isinstance(network, (HostRange, PrioritizedHosts, list)):
+        return network
+    return HostRange(network)
+
+def prioritize(hosts: Iterable[str], known: Optional[Iterable[str]]) -> Iterable[str]:
+    """Ставит известные хосты (IP из прошлого результата) в начало целей скана.
+    Без известных хостов цели возвращаются как есть."""
+    if not known:
+        return hosts
+    if isinstance(hosts, HostRange):
+        return PrioritizedHosts((ip_to_int(ip) for ip in known), hosts)
+    if isinstance(hosts, list):
+        known = set(known)
+        return [ip for ip in hosts if ip in known] + [ip for ip in hosts if ip not in known]
+    return hosts
+
+class AimdController:
+    """AIMD-регулятор параллельности скана.
+    Каждые window проб сравнивает долю ответивших (SYN/ACK или RST) с её сглаженным базовым уровнем:
+    при всплеске таймаутов (доля ответов упала на tolerance или вдвое) или ошибках ресурсов
+    (EMFILE, EADDRNOTAVAIL) лимит делится пополам, иначе растёт на increase. Базовый уровень нужен,
+    чтобы «пустые» сети с естественно высокой долей таймаутов не душили параллельность.
+    Если доля ответов держится ниже базовой shift_windows окон подряд без ошибок ресурсов, это не всплеск,
+    а смена плотности сети (плотные известные хосты в начале, дальше пустые адреса): базовый уровень
+    переносится на новую долю, а лимит возвращается к значению до серии снижений."""
+
+    def __init__(self, max_limit: int, initial: Optional[int] = None, min_limit: int = 4,
+                 window: int = 64, increase: int = 4, tolerance: float = 0.15, shift_windows: int = 3):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = min(min_limit, self.max_limit)
+        self.limit = initial or max(self.min_limit, self.max_limit // 4)
+        self.window = window
+        self.increase = increase
+        self.tolerance = tolerance
+        self.shift_windows = shift_windows
+        self.baseline = None
+        self.increases = 0
+        self.decreases = 0
+        self.shifts = 0
+        self._streak = 0
+        self._streak_limit = None
+        self._samples = 0
+        self._timeouts = 0
+        self._resource_errors = 0
+        self._active = 0
+        self._waiters = deque()
+
+    def record(self, state: str, resource_error: bool = False):
+        """Учитывает исход одной пробы"""
+        self._samples += 1
+        if state == probe.NO_RESPONSE:
+            self._timeouts += 1
+        if resource_error:
+            self._resource_errors += 1
+        # На ошибки ресурсов реагируем сразу, но не чаще, чем раз в 1/8 окна
+        if (self._resource_errors and self._samples >= self.window // 8) or self._samples >= self.window:
+            self._adjust()
+
+    def _adjust(self):
+        ratio = 1 - self._timeouts / self._samples if self._samples else 1.0
+        congested = self._resource_errors > 0 or (
+            self.baseline is not None
+            and ratio < max(self.baseline / 2, self.baseline - self.tolerance))
+        if congested and not self._resource_errors:
+            if not self._streak:
+                self._streak_limit = self.limit
+            self._streak += 1
+        else:
+            self._streak = 0
+        if congested and self._streak >= self.shift_windows:
+            # Устойчиво низкая доля ответов — новая норма сети, а не перегрузка
+            self.baseline = ratio
+            self.limit = max(self.limit, self._streak_limit)
+            self.shifts += 1
+            self._streak = 0
+            self._wake()
+        elif congested:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self.decreases += 1
+        else:
+            self.limit = min(self.max_limit, self.limit + self.increase)
+            self.increases += 1
+            self._wake()
+            # Базовый уровень сглаживаем только по «спокойным» окнам
+            self.baseline = ratio if self.baseline is None else 0.8 * self.baseline + 0.2 * ratio
+        self._samples = self._timeouts = self._resource_errors = 0
+
+    async def acquire(self):
+        """Ждёт, пока число активных хостов станет меньше текущего лимита"""
+        while self._active >= self.limit:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+                raise
+        self._active += 1
+
+    def release(self):
+        self._active -= 1
+        self._wake()
+
+    def _wake(self):
+        free = self.limit - self._active
+        while self._waiters and free > 0:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                free -= 1
+
+    def __repr__(self):
+        return (f"AimdController(limit={self.limit}/{self.max_limit}, "
+                f"+{self.increases}/-{self.decreases}, сдвигов базы {self.shifts})")
+
+async def iter_scan_hosts(hosts: Iterable[str], scan_one: Callable[[str], Awaitable[Optional[Dict]]],
+                          max_workers: int = DEFAULT_MAX_WORKERS, on_progress=None,
+                          tag: str = 'SCAN', session: Optional[probe.ScanSession] = None,
+                          total: Optional[int] = None) -> AsyncIterator[Dict]:
+    """Сканирует хосты пулом воркеров и отдаёт найденные устройства по мере обнаружения.
+    Хосты читаются лениво: воркеры по одному забирают адреса из общего итератора, поэтому
+    в памяти одновременно не больше max_workers адресов (удобно передавать HostRange).
+    Если передана сессия, число одновременно сканируемых хостов подбирает AIMD-регулятор
+    (max_workers — его потолок). При досрочном выходе из цикла воркеры отменяются."""
+    if total is None:
+        total = len(hosts)
+    # В процессе-шарде воркеры делятся между процессами так же, как лимиты проб
+    max_workers = max(1, int(max_workers * probe.limiter.share))
+    pending = iter(hosts)
+    found = asyncio.Queue()
+    finished = object()
+    progress = {'done': 0, 'reported': 0, 'found': 0}
+    progress_lock = asyncio.Lock()
+    step = max(1, total // 20)
+    start_time = time.time()
+    workers = max(1, min(max_workers, total))
+    controller = None
+    if session is not None:
+        controller = AimdController(max_limit=workers)
+        session.controller = controller
+
+    async def report_progress():
+        async with progress_lock:
+            done = progress['done']
+            if done <= progress['reported']:
+                return
+            progress['reported'] = done
+            await on_progress(done, total)
+
+    async def worker():
+        while True:
+            ip = next(pending, None)
+            if ip is None:
+                return
+            if controller is not None:
+                await controller.acquire()
+            try:
+                res = await scan_one(ip)
+            except Exception as e:
+                logging.warning(f"[{tag}] Ошибка сканирования {ip}: {e}")
+                res = None
+            finally:
+                if controller is not None:
+                    controller.release()
+            if res:
+                progress['found'] += 1
+                found.put_nowait(res)
+                logging.info(f"[{tag}] Найдено устройство: {ip} - {res.get('type', 'unknown')}")
+            progress['done'] += 1
+            done = progress['done']
+            if on_progress and (done % step == 0 or done == total):
+                await report_progress()
+
+    async def run_workers():
+        try:
+            await asyncio.gather(*[worker() for _ in range(workers)])
+        finally:
+            found.put_nowait(finished)
+
+    runner = asyncio.ensure_future(run_workers())
+    try:
+        while True:
+            item = await found.get()
+            if item is finished:
+                break
+            yield item
+        # Пробрасываем исключения воркеров (например, из on_progress)
+        await runner
+    finally:
+        if not runner.done():
+            runner.cancel()
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
+        total_time = time.time() - start_time
+        rate = progress['done'] / total_time if total_time > 0 else float(progress['done'])
+        logging.info(f"[{tag}] Сканирование завершено за {total_time:.1f}с, хостов: {progress['done']}/{total}, "
+                     f"найдено: {progress['found']}, скорость: {rate:.1f} хостов/с")
+        if controller is not None:
+            logging.info(f"[{tag}] {controller}")
+
+def _ip_key(device: Dict) -> int:
+    try:
+        return int(ipaddress.ip_address(device.get('ip', '')))
+    except ValueError:
+        return 0
+
+def sort_by_ip(results: List[Dict]) -> List[Dict]:
+    """Упорядочивает найденные устройства по IP (на месте) и возвращает список"""
+    results.sort(key=_ip_key)
+    return results
+
+async def collect(stream: AsyncIterator[Dict]) -> List[Dict]:
+    """Собирает потоковый результат в список, упорядоченный по IP"""
+    return sort_by_ip([device async for device in stream])
+
+async def scan_hosts(hosts: Iterable[str], scan_one: Callable[[str], Awaitable[Optional[Dict]]],
+                     max_workers: int = DEFAULT_MAX_WORKERS, on_progress=None,
+                     tag: str = 'SCAN', session: Optional[probe.ScanSession] = None,
+                     total: Optional[int] = None) -> List[Dict]:
+    """Сканирует хосты пулом воркеров, возвращает найденные устройства в порядке IP"""
+    return await collect(iter_scan_hosts(hosts, scan_one, max_workers=max_workers, on_progress=on_progress,
+                                         tag=tag, session=session, total=total))
+
+# Шардирование по процессам (scanning.workers): меньше этого числа хостов сканируем в одном процессе
+SHARD_MIN_HOSTS = 4096
+# Признак того, что код выполняется внутри процесса-шарда (вложенное шардирование запрещено)
+_in_shard = False
+# Заголовок кадра протокола шарда: длина pickle-записи (kind, payload)
+SHARD_FRAME_HEADER = struct.Struct('>I')
+
+def in_shard() -> bool:
+    """Выполняется ли код в процессе-шарде (этапы, уже выполненные родителем, там пропускаются)"""
+    return _in_shard
+
+def shard_count(settings_manager, hosts_count: int) -> int:
+    """Число процессов для скана: scanning.workers, но не больше числа ядер и не для малых сетей"""
+    if _in_shard or hosts_count < SHARD_MIN_HOSTS:
+        return 1
+    workers = settings_manager.get_setting('scanning.workers', 1) or 1
+    return max(1, min(workers, os.cpu_count() or 1, hosts_count // (SHARD_MIN_HOSTS // 2)))
+
+def _split_hosts(hosts: Iterable[str], parts: int) -> List:
+    if isinstance(hosts, (HostRange, PrioritizedHosts)):
+        return hosts.split(parts)
+    hosts = list(hosts)
+    step = -(-len(hosts) // parts)
+    return [hosts[i:i + step] for i in range(0, len(hosts), step)]
+
+def run_shard(module_name: str, func_name: str, hosts, share: float, options: Dict, send: Callable):
+    """Тело процесса-шарда: свой цикл событий, устройства и прогресс передаются через send(kind, payload)"""
+    global _in_shard
+    _in_shard = True
+    probe.limiter.share = share
+
+    async def on_progress(done, total):
+        send('progress', done)
+
+    async def run():
+        scan = getattr(importlib.import_module(module_name), func_name)
+        async for device in scan(hosts, on_progress=on_progress, use_ping=False, **options):
+            send('device', device)
+
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        send('error', f"{type(e).__name__}: {e}")
+    else:
+        send('done', None)
+
+def _shard_env() -> Dict[str, str]:
+    """Окружение процесса-шарда: корень проекта в PYTHONPATH, чтобы импортировался пакет telegram_bot"""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    return env
+
+async def _read_shard(index: int, process, events: asyncio.Queue):
+    """Читает кадры шарда из его stdout в общую очередь; по закрытию канала сообщает код выхода"""
+    try:
+        while True:
+            header = await process.stdout.readexactly(SHARD_FRAME_HEADER.size)
+            kind, payload = pickle.loads(await process.stdout.readexactly(SHARD_FRAME_HEADER.unpack(header)[0]))
+            await events.put((kind, index, payload))
+    except asyncio.IncompleteReadError:
+        await events.put(('exit', index, await process.wait()))
+
+async def iter_sharded(hosts: Iterable[str], module_name: str, func_name: str, processes: int,
+                       on_progress=None, tag: str = 'SCAN', options: Optional[Dict] = None) -> AsyncIterator[Dict]:
+    """Делит цели на шарды и сканирует их в отдельных процессах, по циклу событий на процесс.
+    func_name — потоковый сканер модуля module_name, принимающий шард вместо сети.
+    Шард запускается через python -m telegram_bot.utils.scan_shard и не импортирует бота;
+    задание передаётся в stdin, устройства и прогресс возвращаются кадрами через stdout.
+    Устройства отдаются по мере обнаружения, прогресс шардов сводится в один счётчик.
+    options — дополнительные именованные аргументы сканера (профиль скана, число воркеров)."""
+    shards = _split_hosts(hosts, processes)
+    total = sum(len(shard) for shard in shards)
+    share = 1.0 / len(shards)
+    logging.info(f"[{tag}] Шардирование: {total} хостов на {len(shards)} процессов")
+    start_time = time.time()
+    events = asyncio.Queue()
+    workers = []
+    readers = []
+    shard_done = [0] * len(shards)
+    running = set(range(len(shards)))
+    reported = 0
+    step = max(1, total // 20)
+    found = 0
+    try:
+        env = _shard_env()
+        for index, shard in enumerate(shards):
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, '-m', 'telegram_bot.utils.scan_shard',
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, env=env)
+            workers.append(process)
+            process.stdin.write(pickle.dumps((module_name, func_name, shard, share, options or {})))
+            process.stdin.close()
+            readers.append(asyncio.ensure_future(_read_shard(index, process, events)))
+        while running:
+            kind, index, payload = await events.get()
+            if kind == 'device':
+                found += 1
+                yield payload
+            elif kind == 'progress':
+                shard_done[index] = max(shard_done[index], payload)
+            elif kind == 'done':
+                shard_done[index] = len(shards[index])
+                running.discard(index)
+            elif kind == 'error':
+                raise RuntimeError(f"Ошибка в процессе-шарде {index}: {payload}")
+            elif kind == 'exit' and index in running:
+                raise RuntimeError(f"Процесс-шард {index} завершился с кодом {payload}")
+            done = sum(shard_done)
+            if on_progress and done > reported and (done - reported >= step or done == total):
+                reported = done
+                await on_progress(done, total)
+    finally:
+        for process in workers:
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+        for process in workers:
+            await process.wait()
+        for reader in readers:
+            reader.cancel()
+        total_time = time.time() - start_time
+        done = sum(shard_done)
+        rate = done / total_time if total_time > 0 else float(done)
+        logging.info(f"[{tag}] Шардированный скан завершён за {total_time:.1f}с, хостов: {done}/{total}, "
+                     f"найдено: {found}, скорость: {rate:.1f} хостов/с")
@@ -0,0 +1,115 @@
+"""
+Объединение одинаковых одновременных сканирований (singleflight).
+Запросы с тем же типом скана и той же сетью подключаются к уже идущему скану:
+получают общий результат и те же обновления прогресса.
+"""
+
+import asyncio
+import ipaddress
+import logging
+from typing import Callable, Dict, Optional, Tuple
+from telegram_bot.utils.scan_engine import sort_by_ip
+
+def normalize_network(network: str) -> str:
+    """'10.1.0.5/21' -> '10.1.0.0/21'"""
+    return str(ipaddress.IPv4Network(network.strip(), strict=False))
+
+class ScanJob:
+    """Один идущий скан: общий контейнер результатов, подписчики прогресса и итог"""
+
+    def __init__(self, scan_type: str, network: str, results, force: bool = False):
+        self.scan_type = scan_type
+        self.network = network
+        self.results = results
+        # Принудительный скан (без кэша результатов и кэша отрицательных проб)
+        self.force = force
+        self.subscribers = 0
+        self._listeners = []
+        self._progress = None
+        self._future = asyncio.get_running_loop().create_future()
+        self._task = None
+
+    async def _report(self, done: int, total: int):
+        self._progress = (done, total)
+        for listener in list(self._listeners):
+            try:
+                await listener(done, total)
+            except Exception as e:
+                # Ошибка отображения у одного оператора не должна останавливать общий скан
+                logging.warning(f"[SCAN_JOBS] Ошибка обработчика прогресса {self.scan_type} {self.network}: {e}")
+
+    async def _run(self, scan: Callable, on_complete: Optional[Callable]):
+        try:
+            async for device in scan(self._report):
+                self.results.append(device)
+            if isinstance(self.results, list):
+                sort_by_ip(self.results)
+            else:
+                self.results.sort()
+            if on_complete is not None:
+                on_complete(self.results)
+        except asyncio.CancelledError:
+            if not self._future.done():
+                self._future.cancel()
+            raise
+        except Exception as e:
+            if not self._future.done():
+                self._future.set_exception(e)
+        else:
+            if not self._future.done():
+                self._future.set_result(self.results)
+
+    async def wait(self, on_progress: Optional[Callable] = None):
+        """Ждёт завершения скана, передавая прогресс в on_progress; возвращает общий результат"""
+        if on_progress is not None:
+            self._listeners.append(on_progress)
+            if self._progress is not None:
+                await on_progress(*self._progress)
+        try:
+            # shield: уход одного подписчика не отменяет скан для остальных
+            return await asyncio.shield(self._future)
+        finally:
+            if on_progress is not None and on_progress in self._listeners:
+                self._listeners.remove(on_progress)
+
+    def done(self) -> bool:
+        return self._future.done()
+
+class ScanJobRegistry:
+    """Реестр идущих сканов по ключу (тип скана, нормализованная сеть)"""
+
+    def __init__(self):
+        self._jobs: Dict[Tuple[str, str], ScanJob] = {}
+
+    def join(self, scan_type: str, network: str, scan: Callable, results,
+             on_complete: Optional[Callable] = None, force: bool = False) -> Tuple[ScanJob, bool]:
+        """Подключается к идущему скану или запускает новый.
+        scan(on_progress) — потоковый сканер (async-генератор устройств),
+        results — контейнер для найденных устройств (list или ResultSet), по окончании сортируется по IP,
+        on_complete(results) — вызывается один раз после скана (например, сохранение файла),
+        force — принудительный скан: к обычному скану не подключается, а запускает новый
+        (обычные запросы при этом подключаются к принудительному).
+        Возвращает (job, True), если скан запущен этим вызовом, и (job, False) при подключении."""
+        key = (scan_type, normalize_network(network))
+        job = self._jobs.get(key)
+        if job is not None and not job.done() and (job.force or not force):
+            job.subscribers += 1
+            logging.info(f"[SCAN_JOBS] Подключение к идущему скану {scan_type} {key[1]} "
+                         f"(подписчиков: {job.subscribers})")
+            return job, False
+        if job is not None and not job.done():
+            # Идущий обычный скан доработает для своих подписчиков, новые запросы — к принудительному
+            logging.info(f"[SCAN_JOBS] Принудительный скан {scan_type} {key[1]} не подключается к обычному")
+        job = ScanJob(scan_type, key[1], results, force=force)
+        job.subscribers = 1
+        self._jobs[key] = job
+        job._task = asyncio.ensure_future(job._run(scan, on_complete))
+        job._task.add_done_callback(lambda _: self._forget(key, job))
+        return job, True
+
+    def _forget(self, key, job: ScanJob):
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
+
+    def active(self) -> int:
+        return len(self._jobs)
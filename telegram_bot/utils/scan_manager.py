@@ -4,6 +4,7 @@ import threading
 import csv
 import json
 import re
+from telegram_bot.utils.scan_results import ResultSet, unpack
 
 class ScanManager:
     def __init__(self, ttl=3600, results_dir=None):
@@ -42,6 +43,7 @@ class ScanManager:
         self.cleanup_old_scan_results_for_network(scan_type, network)
         base = self._network_to_filename(scan_type, network)
         json_path = os.path.join(self._results_dir, f'{base}.json')
+        data = {k: unpack(v) for k, v in data.items()}
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         if as_csv:
@@ -58,6 +60,37 @@ class ScanManager:
                     for d in items:
                         writer.writerow(d)
 
+    def get_fresh_scan_result(self, scan_type, network, max_age):
+        """Возвращает сохранённый результат скана этого типа и сети, если он моложе max_age секунд."""
+        if not max_age:
+            return None
+        path = self.get_scan_result_file(scan_type, network, ext='json')
+        if not path:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        timestamp = data.get('timestamp') or os.path.getmtime(path)
+        if time.time() - timestamp > max_age:
+            return None
+        data['timestamp'] = timestamp
+        return data
+
+    def get_known_hosts(self, scan_type, network):
+        """Возвращает IP устройств из последнего сохранённого результата скана (любой давности)."""
+        path = self.get_scan_result_file(scan_type, network, ext='json')
+        if not path:
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return []
+        items = data.get('devices') or data.get('miners') or []
+        return [d['ip'] for d in items if d.get('ip')]
+
     def get_scan_result_file(self, scan_type, network, ext='csv'):
         base = self._network_to_filename(scan_type, network)
         path = os.path.join(self._results_dir, f'{base}.{ext}')
@@ -81,6 +114,11 @@ class ScanManager:
 
     def add_result(self, msg_id, data):
         with self._lock:
+            data = dict(data)
+            # Списки устройств храним в компактном виде, словари собираются только при чтении
+            for key in ('devices', 'miners', 'fast_scan'):
+                if key in data:
+                    data[key] = ResultSet.pack(data[key])
             self._results[msg_id] = {**data, 'timestamp': time.time()}
             # Сохраняем соответствие msg_id → file_path
             file_path = os.path.join(self._results_dir, f'result_{msg_id}.csv')
@@ -0,0 +1,130 @@
+"""
+Профили сканирования: набор портов, таймаут, параллельность и дополнительные этапы (ping, SNMP, бэкенд).
+Профиль из настроек (scanning.profiles) поверх встроенного компилируется в ProbePlan один раз
+и переиспользуется всеми сканерами, пока настройки профиля не изменятся.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from telegram_bot.utils.snmp_sweep import SNMP_PORT
+
+# Порты для определения типа устройства (скан устройств сети)
+DEVICE_PORTS = {
+    'router': [80, 8080, 443, 23, 22],
+    'switch': [161, 23, 22],
+    'miner': [4028],
+    'camera': [554, 80, 8080],
+    'phone': [62078, 5555],
+}
+
+# Встроенные профили. None — значение берётся из общих настроек scanning.*:
+# ports -> default_ports, timeout -> default_timeout,
+# max_workers/ping_sweep/snmp_sweep/backend/sentinel_ports -> одноимённые.
+# sentinel_ports — сколько первых портов профиля решают, жив ли хост (0 — проверять все порты)
+BUILTIN_PROFILES = {
+    'fast': {
+        'ports': [80, 8080, 22, 161, 443, 554, 4028, 62078, 5555],
+        'timeout': 0.5,
+        # Быстрый скан не ждёт UDP-ответов: 161 проверяется по TCP
+        'snmp_sweep': False,
+    },
+    'full': {
+        'ports': sorted({port for ports in DEVICE_PORTS.values() for port in ports}),
+        'timeout': 1.5,
+    },
+    'miners': {
+        'ports': [4028],
+        'timeout': 1.5,
+    },
+    'cameras': {
+        # 8000 — SDK Hikvision, 37777 — протокол Dahua
+        'ports': [554, 80, 8080, 443, 8000, 37777],
+        'timeout': 1.0,
+        'snmp_sweep': False,
+    },
+    'custom': {
+        'ports': None,
+        'timeout': None,
+    },
+}
+
+# Какой профиль использует каждый скан бота (scanning.scan_profile переопределяет)
+DEFAULT_SCAN_PROFILES = {
+    'fast_scan': 'fast',
+    'scan': 'full',
+    'miners': 'miners',
+}
+
+PROFILE_FIELDS = ('ports', 'timeout', 'max_workers', 'ping_sweep', 'snmp_sweep', 'backend', 'sentinel_ports')
+
+class ProbePlan:
+    """Скомпилированный профиль: порты без повторов в порядке проб, порты TCP-проб при включённом
+    SNMP-свипе (без 161), таймаут, параллельность, этапы, бэкенд и число портов-«часовых»
+    (sentinel_ports) — всё уже разрешено из настроек."""
+
+    __slots__ = ('name', 'ports', 'tcp_ports', 'timeout', 'max_workers', 'ping_sweep', 'snmp_sweep', 'backend',
+                 'sentinel_ports')
+
+    def __init__(self, name: str, ports: Iterable[int], timeout: float, max_workers: int,
+                 ping_sweep: bool, snmp_sweep: bool, backend: str, sentinel_ports: int = 0):
+        self.name = name
+        self.ports: Tuple[int, ...] = tuple(dict.fromkeys(int(port) for port in ports))
+        self.tcp_ports: Tuple[int, ...] = tuple(port for port in self.ports if port != SNMP_PORT)
+        self.timeout = float(timeout)
+        self.max_workers = int(max_workers)
+        self.ping_sweep = bool(ping_sweep)
+        self.snmp_sweep = bool(snmp_sweep) and SNMP_PORT in self.ports
+        self.backend = backend
+        self.sentinel_ports = max(0, int(sentinel_ports))
+
+    def probe_ports(self, snmp_done: bool) -> Tuple[int, ...]:
+        """Порты TCP-проб: 161 пропускается, если SNMP уже проверен UDP-свипом"""
+        return self.tcp_ports if snmp_done else self.ports
+
+    def __repr__(self):
+        return (f"ProbePlan({self.name}: портов {len(self.ports)}, таймаут {self.timeout}с, "
+                f"воркеров {self.max_workers}, ping={self.ping_sweep}, snmp={self.snmp_sweep}, "
+                f"бэкенд {self.backend}, часовых портов {self.sentinel_ports})")
+
+_plans: Dict[Tuple, ProbePlan] = {}
+
+def _resolve(settings_manager, name: str) -> Dict:
+    profiles = settings_manager.get_setting('scanning.profiles', {}) or {}
+    if name not in BUILTIN_PROFILES and name not in profiles:
+        logging.warning(f"[PROFILES] Неизвестный профиль {name}, используется full")
+        name = 'full'
+    profile = {field: None for field in PROFILE_FIELDS}
+    profile.update(BUILTIN_PROFILES.get(name, {}))
+    profile.update({k: v for k, v in (profiles.get(name) or {}).items() if k in PROFILE_FIELDS})
+    defaults = {
+        'ports': settings_manager.get_setting('scanning.default_ports', []),
+        'timeout': settings_manager.get_setting('scanning.default_timeout', 5),
+        'max_workers': settings_manager.get_setting('scanning.max_workers', 256),
+        'ping_sweep': settings_manager.get_setting('scanning.ping_sweep', False),
+        'snmp_sweep': settings_manager.get_setting('scanning.snmp_sweep', True),
+        'backend': settings_manager.get_setting('scanning.backend', 'asyncio'),
+        'sentinel_ports': settings_manager.get_setting('scanning.sentinel_ports', 0),
+    }
+    for field, value in defaults.items():
+        if profile[field] is None:
+            profile[field] = value
+    profile['name'] = name
+    return profile
+
+def get_plan(settings_manager, name: str) -> ProbePlan:
+    """План проб профиля name; повторные вызовы с теми же настройками возвращают готовый план"""
+    profile = _resolve(settings_manager, name)
+    key = tuple((field, tuple(value) if isinstance(value, list) else value) for field, value in sorted(profile.items()))
+    plan = _plans.get(key)
+    if plan is None:
+        plan = _plans[key] = ProbePlan(**profile)
+        logging.info(f"[PROFILES] {plan}")
+    return plan
+
+def plan_for(settings_manager, scan_type: str, profile: Optional[str] = None) -> ProbePlan:
+    """План для скана бота (fast_scan, scan, miners): явный profile или scanning.scan_profile"""
+    if profile is None:
+        mapping = settings_manager.get_setting('scanning.scan_profile', {}) or {}
+        profile = mapping.get(scan_type) or DEFAULT_SCAN_PROFILES[scan_type]
+    return get_plan(settings_manager, profile)
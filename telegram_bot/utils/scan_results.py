@@ -0,0 +1,152 @@
+"""
+Компактное хранение результатов сканирования.
+IP хранятся как 32-битные числа, открытые порты — битовой маской по профилю портов,
+типы устройств — индексами в таблице строк. Словари собираются только на выдаче
+(текст, CSV/JSON), поэтому большие результаты и ScanManager._results занимают мало памяти.
+"""
+
+import socket
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Признаки наличия полей в исходном словаре (у майнеров нет open_ports/type)
+_HAS_PORTS = 1
+_HAS_TYPE = 2
+
+# До 64 портов маска помещается в array('Q'), дальше — обычный список int
+_MASK_BITS = 64
+
+def ip_to_int(ip: str) -> int:
+    return int.from_bytes(socket.inet_aton(ip), 'big')
+
+def int_to_ip(value: int) -> str:
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+class ResultSet:
+    """Колоночное хранилище найденных устройств.
+    Принимает и отдаёт словари в прежнем формате ({'ip', 'open_ports', 'type', ...}),
+    внутри хранит по одной строке в нескольких массивах. Поля, кроме ip/open_ports/type
+    (hashrate, uptime, status майнеров), хранятся отдельно и только для строк, где они есть."""
+
+    __slots__ = ('_ports', '_port_index', '_ips', '_masks', '_flags', '_types', '_type_names',
+                 '_type_index', '_extras')
+
+    def __init__(self, ports: Iterable[int] = (), devices: Iterable[Dict] = ()):
+        self._ports = []
+        self._port_index = {}
+        self._ips = array('I')
+        self._masks = array('Q')
+        self._flags = array('B')
+        self._types = array('H')
+        self._type_names = []
+        self._type_index = {}
+        self._extras = {}
+        for port in ports:
+            self._port_bit(port)
+        for device in devices:
+            self.add(device)
+
+    @classmethod
+    def pack(cls, devices, ports: Iterable[int] = ()) -> 'ResultSet':
+        """Возвращает ResultSet: готовый — как есть, список словарей — упакованным"""
+        if isinstance(devices, cls):
+            return devices
+        return cls(ports, devices or ())
+
+    def _port_bit(self, port: int) -> int:
+        bit = self._port_index.get(port)
+        if bit is None:
+            bit = len(self._ports)
+            self._ports.append(port)
+            self._port_index[port] = bit
+            if bit == _MASK_BITS and isinstance(self._masks, array):
+                self._masks = list(self._masks)
+        return bit
+
+    def _type_id(self, name: str) -> int:
+        idx = self._type_index.get(name)
+        if idx is None:
+            idx = len(self._type_names)
+            self._type_names.append(name)
+            self._type_index[name] = idx
+        return idx
+
+    def add(self, device: Dict):
+        """Добавляет устройство в формате словаря сканера"""
+        row = len(self._ips)
+        flags = 0
+        mask = 0
+        if 'open_ports' in device:
+            flags |= _HAS_PORTS
+            for port in device['open_ports'] or ():
+                mask |= 1 << self._port_bit(port)
+        type_id = 0
+        if 'type' in device:
+            flags |= _HAS_TYPE
+            type_id = self._type_id(device['type'])
+        self._ips.append(ip_to_int(device['ip']))
+        self._masks.append(mask)
+        self._flags.append(flags)
+        self._types.append(type_id)
+        extra = {k: v for k, v in device.items() if k not in ('ip', 'open_ports', 'type')}
+        if extra:
+            self._extras[row] = extra
+
+    append = add
+
+    def _row(self, row: int) -> Dict:
+        device = {'ip': int_to_ip(self._ips[row])}
+        flags = self._flags[row]
+        if flags & _HAS_PORTS:
+            mask = self._masks[row]
+            device['open_ports'] = [port for bit, port in enumerate(self._ports) if mask >> bit & 1]
+        if flags & _HAS_TYPE:
+            device['type'] = self._type_names[self._types[row]]
+        extra = self._extras.get(row)
+        if extra:
+            device.update(extra)
+        return device
+
+    def sort(self):
+        """Упорядочивает строки по IP (на месте)"""
+        order = sorted(range(len(self._ips)), key=self._ips.__getitem__)
+        self._ips = array('I', (self._ips[i] for i in order))
+        masks = [self._masks[i] for i in order]
+        self._masks = array('Q', masks) if isinstance(self._masks, array) else masks
+        self._flags = array('B', (self._flags[i] for i in order))
+        self._types = array('H', (self._types[i] for i in order))
+        position = {old: new for new, old in enumerate(order)}
+        self._extras = {position[row]: extra for row, extra in self._extras.items()}
+        return self
+
+    def ips(self) -> Iterator[str]:
+        return (int_to_ip(value) for value in self._ips)
+
+    def to_dicts(self) -> List[Dict]:
+        return list(self)
+
+    def __len__(self):
+        return len(self._ips)
+
+    def __bool__(self):
+        return len(self._ips) > 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self._ips)):
+            yield self._row(row)
+
+    def __getitem__(self, row: int) -> Dict:
+        if row < 0:
+            row += len(self._ips)
+        if not 0 <= row < len(self._ips):
+            raise IndexError(row)
+        return self._row(row)
+
+    def __repr__(self):
+        return f"ResultSet({len(self)} устройств, портов в профиле: {len(self._ports)})"
+
+def unpack(devices) -> Optional[List[Dict]]:
+    """Преобразует ResultSet в список словарей для JSON/CSV, остальное возвращает как есть"""
+    if isinstance(devices, ResultSet):
+        return devices.to_dicts()
+    return devices
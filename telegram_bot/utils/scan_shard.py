@@ -0,0 +1,27 @@
+"""
+Точка входа процесса-шарда сканирования (python -m telegram_bot.utils.scan_shard).
+Импортирует только движок скана, но не бота: задание читается из stdin,
+устройства и прогресс пишутся кадрами в stdout (см. scan_engine.iter_sharded).
+"""
+
+import os
+import pickle
+import sys
+from telegram_bot.utils import scan_engine
+
+def main():
+    module_name, func_name, hosts, share, options = pickle.load(sys.stdin.buffer)
+    # Канал результатов — исходный stdout; случайный print сканера уходит в stderr и не ломает кадры
+    out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def send(kind, payload):
+        frame = pickle.dumps((kind, payload))
+        out.write(scan_engine.SHARD_FRAME_HEADER.pack(len(frame)) + frame)
+        out.flush()
+
+    scan_engine.run_shard(module_name, func_name, hosts, share, options, send)
+    out.close()
+
+if __name__ == '__main__':
+    main()
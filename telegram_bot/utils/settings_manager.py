@@ -31,7 +31,38 @@ class SettingsManager:
         'scanning': {
             'default_ports': [80, 443, 22, 21, 23, 53, 8080],
             'default_timeout': 5,
+            'min_timeout': 0.5,
             'max_concurrent_scans': 3,
+            'max_workers': 256,
+            'workers': 1,
+            'fingerprint': False,
+            'fingerprint_budget': 1.0,
+            'negative_cache_ttl': 120,
+            'ping_sweep': False,
+            'ping_timeout': 1.0,
+            'ping_blocked': [],
+            'snmp_sweep': True,
+            'snmp_community': 'public',
+            'snmp_timeout': 1.0,
+            'snmp_rate': 2000,
+            'neighbors': True,
+            'arp_prime': False,
+            'oui_file': '',
+            'backend': 'asyncio',
+            'nmap_args': ['-T4', '--max-retries', '1'],
+            'sentinel_ports': 0,
+            'profiles': {},
+            'scan_profile': {
+                'fast_scan': 'fast',
+                'scan': 'full',
+                'miners': 'miners'
+            },
+            'rate_limit': {
+                'probes_per_second': 2000,
+                'max_in_flight': 1024
+            },
+            'cache_freshness': 300,
+            'incremental': True,
             'results_ttl': 3600
         },
         'routers': {
@@ -171,8 +202,60 @@ class SettingsManager:
             return isinstance(value, int) and 10 <= value <= 3600
         elif path == 'scanning.default_timeout':
             return isinstance(value, int) and 1 <= value <= 60
+        elif path == 'scanning.min_timeout':
+            return isinstance(value, (int, float)) and 0.05 <= value <= 5
         elif path == 'scanning.max_concurrent_scans':
             return isinstance(value, int) and 1 <= value <= 10
+        elif path == 'scanning.max_workers':
+            return isinstance(value, int) and 1 <= value <= 1024
+        elif path == 'scanning.workers':
+            return isinstance(value, int) and 1 <= value <= 64
+        elif path == 'scanning.fingerprint':
+            return isinstance(value, bool)
+        elif path == 'scanning.fingerprint_budget':
+            return isinstance(value, (int, float)) and 0.1 <= value <= 10
+        elif path == 'scanning.negative_cache_ttl':
+            return isinstance(value, int) and 0 <= value <= 3600
+        elif path == 'scanning.ping_sweep':
+            return isinstance(value, bool)
+        elif path == 'scanning.ping_timeout':
+            return isinstance(value, (int, float)) and 0.1 <= value <= 10
+        elif path == 'scanning.ping_blocked':
+            return isinstance(value, list) and all(isinstance(item, str) for item in value)
+        elif path == 'scanning.rate_limit.probes_per_second':
+            return isinstance(value, int) and 0 <= value <= 100000
+        elif path == 'scanning.rate_limit.max_in_flight':
+            return isinstance(value, int) and 1 <= value <= 65535
+        elif path == 'scanning.snmp_sweep':
+            return isinstance(value, bool)
+        elif path == 'scanning.snmp_community':
+            return isinstance(value, str) and 0 < len(value) <= 64
+        elif path == 'scanning.snmp_timeout':
+            return isinstance(value, (int, float)) and 0.1 <= value <= 10
+        elif path == 'scanning.snmp_rate':
+            return isinstance(value, int) and 10 <= value <= 100000
+        elif path in ('scanning.neighbors', 'scanning.arp_prime'):
+            return isinstance(value, bool)
+        elif path == 'scanning.oui_file':
+            return isinstance(value, str)
+        elif path == 'scanning.backend':
+            return value in ('asyncio', 'nmap', 'auto')
+        elif path == 'scanning.nmap_args':
+            return isinstance(value, list) and all(isinstance(arg, str) for arg in value)
+        elif path == 'scanning.sentinel_ports':
+            return isinstance(value, int) and 0 <= value <= 16
+        elif path == 'scanning.profiles':
+            fields = ('ports', 'timeout', 'max_workers', 'ping_sweep', 'snmp_sweep', 'backend', 'sentinel_ports')
+            return isinstance(value, dict) and all(
+                isinstance(name, str) and isinstance(profile, dict) and all(field in fields for field in profile)
+                for name, profile in value.items())
+        elif path == 'scanning.scan_profile':
+            return isinstance(value, dict) and all(
+                scan in ('fast_scan', 'scan', 'miners') and isinstance(name, str) for scan, name in value.items())
+        elif path == 'scanning.cache_freshness':
+            return isinstance(value, int) and 0 <= value <= 86400
+        elif path == 'scanning.incremental':
+            return isinstance(value, bool)
         elif path == 'scanning.results_ttl':
             return isinstance(value, int) and 60 <= value <= 86400
         elif path.endswith('.enabled'):
@@ -260,6 +343,8 @@ class SettingsManager:
         summary += f"• Активных результатов: `{results_count}`\n"
         summary += f"• Таймаут: `{scanning.get('default_timeout', 5)}` сек\n"
         summary += f"• Макс. сканирований: `{scanning.get('max_concurrent_scans', 3)}`\n"
+        summary += f"• Воркеров сканирования: `{scanning.get('max_workers', 256)}`\n"
+        summary += f"• Процессов сканирования: `{scanning.get('workers', 1)}`\n"
         summary += f"• TTL результатов: `{scanning.get('results_ttl', 3600)}` сек\n\n"
 
         # Роутеры
@@ -395,3 +480,15 @@ class SettingsManager:
             return True
         except (ValueError, TypeError):
             return False
+
+# Каталог данных бота (telegram_bot/data): сюда docker-compose монтирует settings.json
+BOT_DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+
+_shared_settings_manager: Optional[SettingsManager] = None
+
+def get_settings_manager() -> SettingsManager:
+    """Общий экземпляр настроек бота: изменения из интерфейса сразу видят сканеры и мониторы"""
+    global _shared_settings_manager
+    if _shared_settings_manager is None:
+        _shared_settings_manager = SettingsManager(base_dir=BOT_DATA_DIR)
+    return _shared_settings_manager
@@ -0,0 +1,318 @@
+"""
+SNMPv2c по UDP: GET sysDescr/sysObjectID с одного неблокирующего сокета на весь скан.
+request-id запроса выводится из адреса хоста, поэтому ответ проверяется по адресу отправителя
+без таблицы отправленных запросов, а сокет на каждый хост не нужен. Запросы идут через общий
+лимит проб (probe.limiter), как и TCP-пробы.
+SnmpProber опрашивает хосты по одному вместе с их TCP-пробами (потоковая выдача результатов),
+snmp_sweep рассылает запросы всей сети пачками (для бэкенда nmap).
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import socket
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from telegram_bot.utils import probe
+from telegram_bot.utils.fingerprint import device_hint
+from telegram_bot.utils.scan_results import ip_to_int
+
+SNMP_PORT = 161
+
+# Пакетов в секунду по умолчанию и пауза между пачками
+DEFAULT_RATE = 2000
+BATCH_INTERVAL = 0.02
+# sysDescr в результате обрезается до этой длины
+DESCR_LIMIT = 200
+
+SYS_DESCR = '1.3.6.1.2.1.1.1.0'
+SYS_OBJECT_ID = '1.3.6.1.2.1.1.2.0'
+
+# Тип устройства по номеру предприятия в sysObjectID (1.3.6.1.4.1.<номер>...)
+ENTERPRISE_TYPES = {
+    9: 'switch',        # Cisco
+    11: 'switch',       # HP
+    2011: 'switch',     # Huawei
+    2636: 'router',     # Juniper
+    4526: 'switch',     # Netgear
+    14988: 'router',    # MikroTik
+    11863: 'router',    # TP-Link
+    890: 'router',      # Zyxel
+    171: 'switch',      # D-Link
+    41112: 'router',    # Ubiquiti
+    39165: 'camera',    # Hikvision
+    1004849: 'camera',  # Dahua
+}
+
+_ENTERPRISES = (1, 3, 6, 1, 4, 1)
+
+_INTEGER = 0x02
+_OCTET_STRING = 0x04
+_NULL = 0x05
+_OID = 0x06
+_SEQUENCE = 0x30
+_GET_REQUEST = 0xa0
+_GET_RESPONSE = 0xa2
+
+def _encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    raw = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(raw)]) + raw
+
+def _tlv(tag: int, value: bytes) -> bytes:
+    return bytes([tag]) + _encode_length(len(value)) + value
+
+def _encode_int(value: int) -> bytes:
+    return _tlv(_INTEGER, value.to_bytes(max(1, (value.bit_length() + 8) // 8), 'big', signed=True))
+
+def _encode_oid(oid: str) -> bytes:
+    parts = [int(p) for p in oid.split('.')]
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7f]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7f))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return _tlv(_OID, bytes(body))
+
+def build_get(request_id: int, community: str, oids: Iterable[str] = (SYS_DESCR, SYS_OBJECT_ID)) -> bytes:
+    """Собирает SNMPv2c GetRequest с запрошенными OID"""
+    varbinds = b''.join(_tlv(_SEQUENCE, _encode_oid(oid) + _tlv(_NULL, b'')) for oid in oids)
+    pdu = _tlv(_GET_REQUEST, _encode_int(request_id) + _encode_int(0) + _encode_int(0) + _tlv(_SEQUENCE, varbinds))
+    return _tlv(_SEQUENCE, _encode_int(1) + _tlv(_OCTET_STRING, community.encode()) + pdu)
+
+def _read_tlv(data: bytes, pos: int) -> Tuple[int, bytes, int]:
+    """Читает TLV с позиции pos: (тег, значение, позиция следующего TLV)"""
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[pos:pos + size], 'big')
+        pos += size
+    end = pos + length
+    if end > len(data):
+        raise ValueError('обрезанный пакет')
+    return tag, data[pos:end], end
+
+def _read_all(data: bytes) -> List[Tuple[int, bytes]]:
+    items = []
+    pos = 0
+    while pos < len(data):
+        tag, value, pos = _read_tlv(data, pos)
+        items.append((tag, value))
+    return items
+
+def _decode_oid(raw: bytes) -> str:
+    if not raw:
+        return ''
+    parts = list(divmod(raw[0], 40)) if raw[0] < 80 else [2, raw[0] - 80]
+    value = 0
+    for byte in raw[1:]:
+        value = (value << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return '.'.join(str(p) for p in parts)
+
+def parse_response(data: bytes) -> Optional[Tuple[int, Dict[str, object]]]:
+    """Разбирает GetResponse: (request-id, {OID: значение}) или None для посторонних пакетов.
+    OCTET STRING отдаётся строкой, OID — строкой с точками, исключения (noSuchObject) пропускаются."""
+    try:
+        tag, message, _ = _read_tlv(data, 0)
+        if tag != _SEQUENCE:
+            return None
+        fields = _read_all(message)
+        if len(fields) < 3 or fields[2][0] != _GET_RESPONSE:
+            return None
+        pdu = _read_all(fields[2][1])
+        request_id = int.from_bytes(pdu[0][1], 'big', signed=True)
+        if int.from_bytes(pdu[1][1], 'big'):
+            # error-status: агент ответил, но значения не отдал
+            return request_id, {}
+        values = {}
+        for _, varbind in _read_all(pdu[3][1]):
+            (_, oid), (value_tag, value) = _read_all(varbind)[:2]
+            if value_tag == _OCTET_STRING:
+                values[_decode_oid(oid)] = value.decode(errors='ignore').strip()
+            elif value_tag == _OID:
+                values[_decode_oid(oid)] = _decode_oid(value)
+        return request_id, values
+    except (IndexError, ValueError):
+        return None
+
+def snmp_type(descr: str, object_id: str) -> Optional[str]:
+    """Тип устройства по sysDescr и номеру предприятия в sysObjectID (None — не определён)"""
+    hint = device_hint(descr) if descr else None
+    if hint:
+        return hint
+    parts = tuple(int(p) for p in object_id.split('.') if p.isdigit()) if object_id else ()
+    if parts[:len(_ENTERPRISES)] == _ENTERPRISES and len(parts) > len(_ENTERPRISES):
+        return ENTERPRISE_TYPES.get(parts[len(_ENTERPRISES)])
+    return None
+
+def _request_id(base_id: int, ip: str) -> int:
+    """request-id запроса к ip: неотрицательный INT32, свой у каждого адреса в пределах скана"""
+    return (base_id ^ ip_to_int(ip)) & 0x7fffffff
+
+def _agent(values: Dict[str, object]) -> Dict:
+    descr = str(values.get(SYS_DESCR, ''))[:DESCR_LIMIT]
+    object_id = str(values.get(SYS_OBJECT_ID, ''))
+    return {'descr': descr, 'object_id': object_id, 'type': snmp_type(descr, object_id)}
+
+def _send(sock: socket.socket, packet: bytes, ip: str, port: int) -> bool:
+    try:
+        sock.sendto(packet, (ip, port))
+        return True
+    except OSError as e:
+        logging.debug(f"[SNMP] {ip}: не удалось отправить запрос ({e})")
+        return False
+
+async def _acquire(key: Hashable = None):
+    """Разрешение общего лимита проб на один UDP-запрос (слот соединения не занимается)"""
+    await probe.limiter.acquire(key)
+    probe.limiter.release()
+
+class SnmpProber:
+    """SNMP-опрос отдельных хостов с общего сокета: воркер скана вызывает query(ip) вместе с TCP-пробами
+    и ждёт ответа только своего хоста. В памяти только ожидающие ответа хосты (не больше воркеров)."""
+
+    def __init__(self, community: str = 'public', timeout: float = 1.0, port: int = SNMP_PORT):
+        self.community = community
+        self.timeout = timeout
+        self.port = port
+        self.found = 0
+        self._base_id = random.randint(1, 0x7fffffff)
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._sock = None
+
+    def _open(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, addr = self._sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            fut = self._waiters.get(addr[0])
+            if fut is None or fut.done():
+                continue
+            parsed = parse_response(data)
+            if parsed is None or parsed[0] != _request_id(self._base_id, addr[0]):
+                continue
+            fut.set_result(_agent(parsed[1]))
+
+    async def query(self, ip: str, key: Hashable = None, timeout: Optional[float] = None) -> Optional[Dict]:
+        """{'descr', 'object_id', 'type'} агента на ip или None, если за timeout ответа нет.
+        timeout — предел ожидания для этого хоста (таймаут TCP-проб), не больше self.timeout:
+        воркер не держит хост дольше, чем его TCP-пробы"""
+        await _acquire(key)
+        if self._sock is None:
+            self._open()
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[ip] = fut
+        try:
+            if not _send(self._sock, build_get(_request_id(self._base_id, ip), self.community), ip, self.port):
+                return None
+            wait = self.timeout if timeout is None else min(self.timeout, timeout)
+            agent = await asyncio.wait_for(fut, wait)
+            self.found += 1
+            return agent
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if self._waiters.get(ip) is fut:
+                del self._waiters[ip]
+
+    def close(self):
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+
+async def snmp_sweep(hosts: Iterable[str], community: str = 'public', timeout: float = 1.0,
+                     rate: int = DEFAULT_RATE, port: int = SNMP_PORT) -> Dict[str, Dict]:
+    """Рассылает GET sysDescr/sysObjectID всем хостам и возвращает ответившие агенты:
+    {ip: {'descr', 'object_id', 'type'}}. Хосты читаются лениво, скорость — не выше rate пакетов/с
+    (в процессе-шарде — его доля) и в рамках общего лимита проб.
+    Ответ засчитывается, только если его request-id совпадает с выведенным из адреса отправителя."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    loop = asyncio.get_running_loop()
+    base_id = random.randint(1, 0x7fffffff)
+    found = {}
+
+    def on_readable():
+        while True:
+            try:
+                data, addr = sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            ip = addr[0]
+            if ip in found:
+                continue
+            parsed = parse_response(data)
+            if parsed is None or parsed[0] != _request_id(base_id, ip):
+                continue
+            found[ip] = _agent(parsed[1])
+
+    batch_size = max(1, int(rate * probe.limiter.share * BATCH_INTERVAL))
+    loop.add_reader(sock.fileno(), on_readable)
+    try:
+        targets = iter(hosts)
+        while True:
+            batch = list(itertools.islice(targets, batch_size))
+            if not batch:
+                break
+            for ip in batch:
+                await _acquire()
+                packet = build_get(_request_id(base_id, ip), community)
+                try:
+                    sock.sendto(packet, (ip, port))
+                except BlockingIOError:
+                    await asyncio.sleep(BATCH_INTERVAL)
+                    _send(sock, packet, ip, port)
+                except OSError as e:
+                    logging.debug(f"[SNMP] {ip}: не удалось отправить запрос ({e})")
+            await asyncio.sleep(BATCH_INTERVAL)
+        await asyncio.sleep(timeout)
+    finally:
+        loop.remove_reader(sock.fileno())
+        sock.close()
+    return found
+
+def prober(settings_manager, enabled: Optional[bool] = None) -> Optional[SnmpProber]:
+    """SNMP-этап скана своим движком по настройкам scanning.snmp_* (enabled — из профиля скана).
+    None — этап выключен."""
+    if enabled is None:
+        enabled = settings_manager.get_setting('scanning.snmp_sweep', True)
+    if not enabled:
+        return None
+    return SnmpProber(community=settings_manager.get_setting('scanning.snmp_community', 'public'),
+                      timeout=settings_manager.get_setting('scanning.snmp_timeout', 1.0))
+
+async def discover(hosts: Iterable[str], settings_manager, enabled: Optional[bool] = None,
+                   tag: str = 'SNMP') -> Optional[Dict[str, Dict]]:
+    """SNMP-свип всей сети по настройкам scanning.snmp_* (enabled — из профиля скана). None — этап выключен."""
+    if enabled is None:
+        enabled = settings_manager.get_setting('scanning.snmp_sweep', True)
+    if not enabled or not len(hosts):
+        return None
+    probe.limiter.configure_from_settings(settings_manager)
+    found = await snmp_sweep(hosts,
+                             community=settings_manager.get_setting('scanning.snmp_community', 'public'),
+                             timeout=settings_manager.get_setting('scanning.snmp_timeout', 1.0),
+                             rate=settings_manager.get_setting('scanning.snmp_rate', DEFAULT_RATE))
+    logging.info(f"[{tag}] SNMP-свип: ответили {len(found)} из {len(hosts)}")
+    return found